@@ -16,6 +16,13 @@ class SettingsApi(BaseSettings):
     app_port: int
 
     ml_svc_url: str
+    # Shared mlservice client: timeouts, pooled connections, requests in
+    # flight and symbols per /metrics/batch call
+    ml_svc_timeout_seconds: float = 10.0
+    ml_svc_connect_timeout_seconds: float = 3.0
+    ml_svc_max_connections: int = 20
+    ml_svc_max_concurrency: int = 10
+    ml_svc_batch_size: int = 50
     # class Config:
     #     env_file = ".env.backend"
 
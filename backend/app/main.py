@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -16,8 +18,17 @@ from .routers import (
 from .scripts.comp_init import init_companies
 from .scripts.country_init import init_countries
 from .scripts.market_init import init_markets
+from .services.ml_service_client import ml_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Pooled connections to the mlservice live as long as the app
+    await ml_client.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 Base.metadata.create_all(bind=engine)
 
 
@@ -2,7 +2,6 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import date, datetime
 from typing import Optional, List
-import requests
 
 from ..database import get_db
 from ..models import User, Divestment, Investment
@@ -10,6 +9,7 @@ from .auth import get_current_user
 from ..config import settings_api
 from ..schemas.company_analytics_schema import CompanyMetrics, CompanyAnalyticsResponse
 from ..services.company_analytics_service import get_company_metrics_service
+from ..services.ml_service_client import ml_client
 
 router = APIRouter(prefix="/company_analytics", tags=["company_analytics"])
 
@@ -28,7 +28,7 @@ async def get_company_metrics(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication Failed!")
 
     try:
-        response = get_company_metrics_service(db, user, start_from)
+        response = await get_company_metrics_service(db, user, start_from, ml_client)
         return response
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -1,13 +1,17 @@
+import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import distinct
-import requests
+from typing import List
 
 from ..models import Investment
-from ..config import settings_api
 from ..schemas.company_analytics_schema import CompanyMetrics, CompanyAnalyticsResponse
+from .ml_service_client import MLServiceClient, MLServiceError
 
+logger = logging.getLogger(__name__)
 
-def get_company_metrics_service(db: Session, user: dict, start_from: str) -> CompanyAnalyticsResponse:
+
+async def get_company_metrics_service(db: Session, user: dict, start_from: str,
+                                      ml_client: MLServiceClient) -> CompanyAnalyticsResponse:
     # Get distinct companies associated with the user's investments after the start date
     comp_query = db.query(distinct(Investment.company)).filter(
         #Investment.is_active == True,
@@ -17,28 +21,17 @@ def get_company_metrics_service(db: Session, user: dict, start_from: str) -> Com
 
     companies = [company[0] for company in comp_query]
 
-    company_metrics_list: List[CompanyMetrics] = []
-
-    for symbol in companies:
-        url = f'{settings_api.ml_svc_url}metrics/'
-        params = {
-            'symbol': symbol,
-            'start_date': start_from,
-        }
-
-        try:
-            res = requests.get(url, params=params)
-            res.raise_for_status()
-
-            data = res.json()  # Assuming the response is JSON
-            print(data)
-
-            metrics = CompanyMetrics(**data)
-            company_metrics_list.append(metrics)
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending request to {url}: {e}")
-            raise Exception(f"Error fetching metrics for {symbol}")
+    # Metrics of every company are fetched concurrently, in batches when possible
+    try:
+        metrics_by_symbol = await ml_client.get_metrics_many(companies, str(start_from))
+    except MLServiceError as e:
+        logger.error(f"Error fetching metrics for {companies}: {e}")
+        raise Exception(f"Error fetching metrics for {companies}") from e
+
+    company_metrics_list: List[CompanyMetrics] = [
+        CompanyMetrics(**metrics_by_symbol[symbol])
+        for symbol in companies if symbol in metrics_by_symbol
+    ]
 
     # Return the response object with company metrics
     response = CompanyAnalyticsResponse(
@@ -0,0 +1,128 @@
+import asyncio
+from typing import Dict, List, Optional
+
+import httpx
+
+from ..config import settings_api
+
+
+class MLServiceError(Exception):
+    """
+    A request to the mlservice failed or returned an error status.
+    """
+
+
+class MLServiceClient:
+    """
+    Async client of the mlservice, shared for the lifetime of the app.
+
+    Keeps a pool of keep-alive connections, applies a timeout to every call
+    and bounds the number of requests in flight, so fanning out over many
+    symbols costs about the slowest call rather than the sum of all calls.
+    """
+
+    def __init__(self, base_url: str = settings_api.ml_svc_url,
+                 timeout: float = settings_api.ml_svc_timeout_seconds,
+                 connect_timeout: float = settings_api.ml_svc_connect_timeout_seconds,
+                 max_connections: int = settings_api.ml_svc_max_connections,
+                 max_concurrency: int = settings_api.ml_svc_max_concurrency,
+                 batch_size: int = settings_api.ml_svc_batch_size) -> None:
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Set once the mlservice answered 404 for /metrics/batch
+        self._batch_missing = False
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, path: str, params) -> httpx.Response:
+        client = self.client
+        async with self._slots:
+            try:
+                return await client.get(path, params=params)
+            except httpx.HTTPError as e:
+                raise MLServiceError(f"Error sending request to {path}: {e!r}") from e
+
+    @staticmethod
+    def _json(response: httpx.Response):
+        if response.is_error:
+            raise MLServiceError(
+                f"{response.request.url} returned {response.status_code}: {response.text}")
+        try:
+            return response.json()
+        except ValueError as e:
+            raise MLServiceError(
+                f"{response.request.url} returned a body that is not JSON: {response.text[:200]}") from e
+
+    @staticmethod
+    def _detail(response: httpx.Response):
+        """
+        Returns the FastAPI error detail of a response, None when the body
+        is not a FastAPI error, e.g. the error page of a proxy.
+        """
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        return body.get("detail") if isinstance(body, dict) else None
+
+    async def get_metrics(self, symbol: str, start_date: str) -> dict:
+        """
+        Returns the metrics of one company, empty when it has no data.
+        """
+        return self._json(await self._get(
+            "metrics/", {"symbol": symbol, "start_date": start_date}))
+
+    async def _get_metrics_chunk(self, symbols: List[str], start_date: str) -> Optional[List[dict]]:
+        response = await self._get(
+            "metrics/batch", [("symbols", symbol) for symbol in symbols]
+            + [("start_date", start_date)])
+        if response.status_code == 404 and self._detail(response) == "Not Found":
+            # The route does not exist, as opposed to unknown tickers
+            self._batch_missing = True
+            return None
+        return self._json(response)
+
+    async def get_metrics_many(self, symbols: List[str], start_date: str) -> Dict[str, dict]:
+        """
+        Returns the metrics of many companies, keyed by symbol. Companies
+        without data are left out.
+
+        Symbols are sent to /metrics/batch in chunks of ``batch_size``,
+        chunks in parallel. Against an mlservice without the batch route
+        the symbols are requested one by one, ``max_concurrency`` at a time.
+        """
+        if not symbols:
+            return {}
+
+        results: Optional[List[dict]] = None
+        if not self._batch_missing:
+            chunks = await asyncio.gather(*[
+                self._get_metrics_chunk(symbols[i:i + self.batch_size], start_date)
+                for i in range(0, len(symbols), self.batch_size)])
+            if all(chunk is not None for chunk in chunks):
+                results = [metrics for chunk in chunks for metrics in chunk]
+
+        if results is None:
+            results = await asyncio.gather(*[
+                self.get_metrics(symbol, start_date) for symbol in symbols])
+        return {metrics["symbol"]: metrics for metrics in results if metrics}
+
+
+ml_client = MLServiceClient()
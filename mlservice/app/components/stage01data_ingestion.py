@@ -1,16 +1,20 @@
-from numpy import where
 from pymongo import MongoClient
 import pandas as pd
-from datetime import date, datetime, timedelta
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from ..config import settings_api
 from ..utils.exception import CustomException
 from ..utils.logger import logging
-from ..utils.utils import get_data_from_yfinance
+from ..utils.price_providers import PriceProvider, get_price_provider
+from ..utils.manifest import BackfillCheckpoints, IngestionManifest
+from ..utils.cache import chart_cache, metrics_cache
+from ..utils.indicator_engine import IndicatorEngine
+from ..utils.storage import get_storage
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import os.path as path
 import sys
-from datetime import date
-from typing import Optional
 
 
 @dataclass
@@ -21,6 +25,13 @@ class StockIngestionConfig:
     """
     path_to_file: str = path.abspath(
         path.join(__file__, "../../../artifacts/base_data/bist_data.csv"))
+    # Upper bound on batches ingested at the same time
+    max_workers: int = settings_api.ingestion_workers
+    # Symbols fetched with a single provider request
+    batch_size: int = settings_api.provider_batch_size
+    # First date of symbols without any bars, fetched in chunks of chunk_days
+    history_start: str = settings_api.history_start
+    chunk_days: int = settings_api.backfill_chunk_days
     # Use init=False to exclude from __init__
     symbols_list: List[str] = field(init=False)
 
@@ -45,36 +56,78 @@ class StockIngestionConfig:
             raise CustomException(f"Error reading symbols list: {e}", sys)
 
 
+@dataclass
+class IngestionSummary:
+    """
+    Outcome of an ingestion run, grouped by symbol status.
+    """
+    ok: List[str] = field(default_factory=list)
+    empty: List[str] = field(default_factory=list)
+    # symbol -> error message
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    def add(self, symbol: str, result) -> None:
+        """
+        Records the result of a symbol, "ok", "empty" or an exception.
+        """
+        if isinstance(result, Exception):
+            self.failed[symbol] = str(result)
+        elif result == "ok":
+            self.ok.append(symbol)
+        else:
+            self.empty.append(symbol)
+
+    def merge(self, other: "IngestionSummary") -> None:
+        self.ok.extend(other.ok)
+        self.empty.extend(other.empty)
+        self.failed.update(other.failed)
+
+    def __str__(self) -> str:
+        return (f"ok: {len(self.ok)}, empty: {len(self.empty)}, "
+                f"failed: {len(self.failed)}")
+
+
 class StockIngestion:
     """
     Class responsible for the ingestion of stock data.
     """
 
-    def __init__(self, mongo_uri:str):
-        self.mongo_uri = mongo_uri
-        self.client = MongoClient(self.mongo_uri)
+    def __init__(self, client: MongoClient, provider: Optional[PriceProvider] = None):
+        # Shared client, owned and closed by the caller
+        self.client = client
         self.stock_db = self.client.stockdata
+        self.storage = get_storage(self.stock_db)
+        self.manifest = IngestionManifest(self.stock_db)
+        self.indicators = IndicatorEngine(self.stock_db)
+        self.checkpoints = BackfillCheckpoints(self.stock_db)
         self.ingestion_config = StockIngestionConfig()
+        self.provider = provider or get_price_provider()
 
-    def get_date_range(self, collection):
+    def get_date_range(self, symbol: str, last_dates: Optional[Dict[str, Optional[str]]] = None):
         """
         Determine the date range for which data needs to be fetched.
         
         Parameters:
-            collection: MongoDB collection for the symbol.
+            symbol (str): The stock symbol.
+            last_dates (dict, optional): Last ingested date of each symbol read
+                from the manifest. Symbols missing from it are looked up in
+                the bar storage.
 
         Returns:
             tuple: Start and end dates for the data retrieval.
         """
         try:
-            most_recent_document = collection.find_one({}, sort=[('_id', -1)])
-            if most_recent_document:
+            if last_dates is not None and symbol in last_dates:
+                most_recent_id = last_dates[symbol]
+            else:
+                most_recent_id = self.storage.last_date(symbol)
+            if most_recent_id:
                 most_recent_date = datetime.strptime(
-                    most_recent_document["_id"], "%Y-%m-%d")
+                    most_recent_id, "%Y-%m-%d")
                 start_date = (most_recent_date + timedelta(days=1)
                               ).strftime("%Y-%m-%d")
             else:
-                start_date = "2015-01-01"
+                start_date = self.ingestion_config.history_start
 
             end_date = (datetime.now() + timedelta(days=1)
                         ).strftime("%Y-%m-%d")
@@ -83,65 +136,296 @@ class StockIngestion:
             logging.error(f"Error determining date range: {e}")
             raise CustomException(e, sys)
 
-    def ingest_data_for_symbol(self, symbol, collection):
+    def write_symbol_data(self, symbol, data: Optional[pd.DataFrame]) -> str:
+        """
+        Write fetched bars of a symbol into the bar storage.
+
+        Parameters:
+            symbol (str): The stock symbol.
+            data (pd.DataFrame): Bars with a "Date" column, may be None or empty.
+
+        Returns:
+            str: "ok" if bars were inserted or changed, "empty" if nothing was
+                retrieved or every bar was already stored.
         """
-        Ingest data for a given stock symbol into the corresponding MongoDB collection.
+        if data is None or data.empty:
+            logging.warning(f"No data retrieved for {symbol}")
+            return "empty"
+
+        written = self.storage.write(symbol, data)
+        logging.info(
+            f"Data ingestion completed for symbol: {symbol}, {written} bars written")
+        return "ok" if written else "empty"
+
+    def ingest_data_for_symbol(self, symbol) -> str:
+        """
+        Ingest data for a given stock symbol into the bar storage.
         
         Parameters:
             symbol (str): The stock symbol.
-            collection: MongoDB collection for the symbol.
+
+        Returns:
+            str: "ok" if new rows were written, "empty" if nothing was retrieved.
         """
+        logging.info(f"Starting data ingestion for symbol: {symbol}")
         try:
-            start_date, end_date = self.get_date_range(collection)
-            data = get_data_from_yfinance(symbol, start_date, end_date)
-
-            if not data.empty:
-                data['_id'] = pd.to_datetime(
-                    data['Date']).dt.strftime("%Y-%m-%d")
-                data.drop(columns=['Date'], inplace=True)
-                collection.insert_many(data.to_dict(orient='records'))
-                logging.info(f"Data ingestion completed for symbol: {symbol}")
-            else:
-                logging.warning(f"No data retrieved for {symbol}")
+            last_dates = self.manifest.last_dates()
+            start_date, end_date = self.get_date_range(symbol, last_dates)
+            result = self.ingest_batch([symbol], start_date, end_date,
+                                       last_dates)[symbol]
         except Exception as e:
-            logging.error(f"Error ingesting data for symbol {symbol}: {e}")
-            raise CustomException(e, sys)
+            result = e
+        if isinstance(result, Exception):
+            logging.error(f"Error ingesting data for symbol {symbol}: {result}")
+            raise CustomException(result, sys)
+        return result
 
-    def initiate_stock_ingestion(self):
+    def ingest_batch(self, symbols: List[str], start_date: str, end_date: str,
+                     last_dates: Optional[Dict[str, Optional[str]]] = None,
+                     record_status: bool = True) -> Dict[str, object]:
+        """
+        Ingest symbols sharing a date range with a single provider request
+        and record the outcome of every symbol in the manifest.
+
+        Parameters:
+            symbols (List[str]): Stock symbols of the batch.
+            start_date (str): First date to fetch, inclusive.
+            end_date (str): Last date to fetch, exclusive.
+            last_dates (dict, optional): Last ingested date of each symbol.
+            record_status (bool): Record the outcome as the symbols' last
+                ingestion run, False for gap re-fetches.
+
+        Returns:
+            dict: Symbol -> "ok", "empty" or the exception raised for it.
+        """
+        logging.info(
+            f"Starting data ingestion for {len(symbols)} symbols from {start_date}")
+        last_dates = last_dates or {}
+        try:
+            frames = self.provider.fetch(symbols, start_date, end_date)
+        except Exception as e:
+            logging.error(f"Error fetching batch from {start_date}: {e}")
+            frames, fetch_error = {}, e
+        else:
+            fetch_error = None
+
+        results = {}
+        operations = []
+        for symbol in symbols:
+            data = frames.get(symbol)
+            try:
+                if fetch_error:
+                    raise fetch_error
+                results[symbol] = self.write_symbol_data(symbol, data)
+                if results[symbol] == "ok":
+                    metrics_cache.invalidate(symbol)
+                    chart_cache.invalidate(symbol)
+                operations.append(self.manifest.update_operation(
+                    symbol, results[symbol], data, last_dates.get(symbol),
+                    record_status=record_status))
+            except Exception as e:
+                logging.error(f"Error ingesting data for symbol {symbol}: {e}")
+                results[symbol] = e
+                if record_status:
+                    operations.append(self.manifest.update_operation(
+                        symbol, "failed", error=str(e)))
+
+        try:
+            self.manifest.write(operations)
+        except Exception as e:
+            # The bars are stored but the manifest is behind them, the next
+            # run fetches the same range again and the upserts are no-ops
+            logging.error(f"Error updating the manifest of {len(symbols)} symbols: {e}")
+            results = {symbol: e for symbol in symbols}
+
+        # Append the indicator rows of the new bars, one step per bar
+        ingested = {symbol: frames[symbol] for symbol, result
+                    in results.items() if result == "ok"}
+        try:
+            self.indicators.advance(ingested)
+        except Exception as e:
+            # Rebuilt from the stored history by the materialization stage
+            logging.error(f"Error advancing indicators: {e}")
+            self.indicators.invalidate(list(ingested))
+        return results
+
+    def _plan_batches(self) -> Tuple[List[Tuple[List[str], str, str, Dict[str, Optional[str]]]], List[str]]:
+        """
+        Groups symbols by the date range they need into provider sized batches.
+
+        Returns:
+            tuple: The batches, and the symbols without any stored bars which
+                are left to the chunked backfill. Symbols the provider had no
+                bars for are skipped until ``empty_recheck_days`` passed.
+        """
+        last_dates = self.manifest.last_dates()
+        if not last_dates:
+            # First run with a manifest, record what is already stored
+            self.manifest.rebuild(self.storage)
+            last_dates = self.manifest.last_dates()
+
+        # Symbols without any data at the provider wait until they are due
+        unavailable = self.manifest.unavailable_symbols()
+        new_symbols = []
+        groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for symbol in self.ingestion_config.symbols_list:
+            if symbol in unavailable:
+                continue
+            start_date, end_date = self.get_date_range(symbol, last_dates)
+            if start_date == self.ingestion_config.history_start:
+                new_symbols.append(symbol)
+            else:
+                groups[(start_date, end_date)].append(symbol)
+
+        size = self.ingestion_config.batch_size
+        batches = [
+            (group[i:i + size], start_date, end_date, last_dates)
+            for (start_date, end_date), group in groups.items()
+            for i in range(0, len(group), size)
+        ]
+        return batches, new_symbols
+
+    def initiate_stock_ingestion(self, max_workers: Optional[int] = None) -> IngestionSummary:
         """
         Initiates the data ingestion process for all stock symbols.
+
+        Symbols needing the same date range are fetched together in batches,
+        batches run concurrently on a bounded thread pool and every symbol
+        fails independently of the others. Symbols without any stored bars
+        are backfilled from ``history_start`` in checkpointed chunks.
+
+        Parameters:
+            max_workers (int, optional): Number of batches ingested at the same
+                time. Defaults to the configured ``ingestion_workers``;
+                1 ingests sequentially.
+
+        Returns:
+            IngestionSummary: Symbols grouped into ok, empty and failed.
         """
-        # If time is not between 18.15 and 18.20 cant initiate stock ingestion
+        workers = max_workers or self.ingestion_config.max_workers
+        summary = IngestionSummary()
         try:
-            for symbol in self.ingestion_config.symbols_list:
-                logging.info(f"Starting data ingestion for symbol: {symbol}")
-                collection = self.stock_db[symbol]
-                self.ingest_data_for_symbol(symbol, collection)
+            batches, new_symbols = self._plan_batches()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self.ingest_batch, *batch): batch[0]
+                    for batch in batches
+                }
+                for future in as_completed(futures):
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        logging.error(f"Error fetching batch: {e}")
+                        results = {symbol: e for symbol in futures[future]}
+
+                    for symbol, result in results.items():
+                        summary.add(symbol, result)
+
+            if new_symbols:
+                backfill = self.ingest_all_data(
+                    self.ingestion_config.history_start, new_symbols, max_workers=workers)
+                summary.merge(backfill)
+
+            logging.info(f"Stock ingestion finished. {summary}")
+            if summary.failed:
+                logging.warning(
+                    f"Failed symbols: {sorted(summary.failed)}")
+            return summary
 
         except Exception as e:
             logging.error(f"Unexpected error during ingestion: {e}")
             raise CustomException(e, sys)
-        finally:
-            self.client.close()
-            logging.info("MongoDB client closed.")
-    
 
-    #TODO: add data ingestion independent from symbols list
+    @staticmethod
+    def split_date_range(start_date: str, end_date: str, chunk_days: int) -> List[Tuple[str, str]]:
+        """
+        Splits [start_date, end_date) into consecutive chunks of chunk_days.
 
-    def ingest_all_data(self,start_from: str)-> None:
+        Chunk boundaries only depend on start_date, so the same chunks are
+        produced again when a backfill is resumed.
+        """
+        starts = pd.date_range(start_date, end_date, freq=f"{chunk_days}D",
+                               inclusive="left")
+        ends = list(starts[1:]) + [pd.Timestamp(end_date)]
+        return [(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+                for start, end in zip(starts, ends)]
 
-        symbols_list = self.ingestion_config.symbols_list
-        #all_data = pd.DataFrame()
+    def ingest_all_data(self, start_from: str, symbols: Optional[List[str]] = None,
+                        chunk_days: Optional[int] = None,
+                        max_workers: Optional[int] = None) -> IngestionSummary:
+        """
+        Backfills history from ``start_from`` until today in date chunks.
 
-        for symbol in symbols_list:
-            collection = self.stock_db[symbol]
-            
-            query = { "_id": { "$gt": start_from } }
-            data = collection.find(query)
-            print(data)
-            #all_data.append(data)
+        Chunks of every symbol are fetched in provider sized batches and run
+        in parallel, in any order: every layout stores the dates of a chunk
+        whatever the dates already stored. Each chunk that wrote bars is
+        checkpointed, running the backfill again only fetches the others.
 
+        Parameters:
+            start_from (str): First date of the backfill ("%Y-%m-%d").
+            symbols (List[str], optional): Symbols to backfill, defaults to
+                the symbols list.
+            chunk_days (int, optional): Days per chunk, defaults to the
+                configured ``backfill_chunk_days``.
+            max_workers (int, optional): Number of batches ingested at the
+                same time, defaults to ``ingestion_workers``.
 
-        return None
-        
+        Returns:
+            IngestionSummary: Symbols grouped into ok, empty and failed.
+        """
+        symbols = symbols or self.ingestion_config.symbols_list
+        end_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        chunks = self.split_date_range(
+            start_from, end_date, chunk_days or self.ingestion_config.chunk_days)
+        done = self.checkpoints.completed(symbols)
+
+        size = self.ingestion_config.batch_size
+        batches = []
+        for chunk_start, chunk_end in chunks:
+            pending = [symbol for symbol in symbols
+                       if (symbol, chunk_start, chunk_end) not in done]
+            batches.extend((pending[i:i + size], chunk_start, chunk_end)
+                           for i in range(0, len(pending), size))
+        logging.info(
+            f"Backfill from {start_from}: {len(batches)} batches in {len(chunks)} chunks")
+
+        results: Dict[str, list] = defaultdict(list)
+        workers = max_workers or self.ingestion_config.max_workers
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.ingest_batch, *batch): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch, chunk_start, chunk_end = futures[future]
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    logging.error(f"Error fetching backfill batch: {e}")
+                    batch_results = {symbol: e for symbol in batch}
+
+                # Only chunks whose bars were written are done, an empty
+                # response may be a throttled download and is fetched again
+                self.checkpoints.mark_done(
+                    [symbol for symbol, result in batch_results.items()
+                     if result == "ok"],
+                    chunk_start, chunk_end)
+                for symbol, result in batch_results.items():
+                    results[symbol].append(result)
+
+        summary = IngestionSummary()
+        for symbol, symbol_results in results.items():
+            errors = [r for r in symbol_results if isinstance(r, Exception)]
+            if errors:
+                summary.add(symbol, errors[0])
+            else:
+                summary.add(symbol, "ok" if "ok" in symbol_results else "empty")
 
+        # Chunks finish out of order, recount stored bars and re-flag failures
+        self.manifest.rebuild(self.storage, list(results))
+        self.manifest.write([
+            self.manifest.update_operation(symbol, "failed", error=error)
+            for symbol, error in summary.failed.items()
+        ])
+        logging.info(f"Backfill finished. {summary}")
+        return summary
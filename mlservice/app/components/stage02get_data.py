@@ -1,18 +1,99 @@
 import os.path as path
 import sys
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from pymongo import MongoClient
 
+from ..utils.cache import metrics_cache
 from ..utils.exception import CustomException
+from ..utils.indicator_store import IndicatorStore
+from ..utils.indicators import IndicatorPlan
 from ..utils.logger import logging
-from ..utils.utils import get_historical_data
+from ..utils.manifest import IngestionManifest
+from ..utils.storage import get_storage
+from ..utils.utils import get_historical_data, load_price_columns
+
+
+def compute_matrix_metrics(prices: Dict[str, np.ndarray], symbols: List[str], start_date: str,
+                           indicators: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Calculates indicators column-wise for bar x symbol price matrices.
+
+    Args:
+        prices (dict): Price field -> bars x symbols array. Every column
+            holds the bars of its symbol in ascending date order, NaN before
+            the symbol's first bar, see ``CompanyMetrics.load_price_arrays``.
+        symbols (List[str]): Symbol of every column.
+        start_date (str): Date the prices start from, reported as "from_date".
+        indicators (List[str], optional): Indicators to calculate, the
+            default metrics when None.
+
+    Returns:
+        Dict[str, dict]: Metrics of every symbol with at least one close.
+    """
+    closes = prices["Close"]
+    if closes.size == 0:
+        return {}
+    plan = IndicatorPlan(indicators)
+    return format_metrics(plan.compute(prices), (~np.isnan(closes)).sum(axis=0),
+                          symbols, start_date)
+
+
+def format_metrics(values: Dict[str, np.ndarray], counts: np.ndarray,
+                   symbols: List[str], start_date: str) -> Dict[str, dict]:
+    """
+    Builds the metrics dictionaries of symbols with at least one close.
+
+    Args:
+        values (dict): Indicator name -> one value per symbol.
+        counts (np.ndarray): Number of closes of every symbol.
+        symbols (List[str]): Symbols, in the order of the values.
+        start_date (str): Reported as "from_date".
+    """
+    metrics = {}
+    for i, symbol in enumerate(symbols):
+        if not counts[i] > 0:
+            continue
+        metrics[symbol] = {"symbol": symbol, "from_date": start_date}
+        metrics[symbol].update({name: round(float(value[i]), 3)
+                                for name, value in values.items()})
+    return metrics
+
+
+def compute_metrics(symbol: str, start_date: str, prices: Dict[str, np.ndarray],
+                    indicators: Optional[List[str]] = None) -> dict:
+    """
+    Calculates the metrics of a company from its prices.
+
+    Args:
+        symbol (str): Stock symbol.
+        start_date (str): Date the prices start from, reported as "from_date".
+        prices (dict): Price field -> prices in ascending date order.
+        indicators (List[str], optional): Indicators to calculate, the
+            default metrics when None.
+
+    Returns:
+        dict: Calculated metrics.
+    """
+    columns = {field: np.asarray(values, dtype=np.float64).reshape(-1, 1)
+               for field, values in prices.items()}
+    return compute_matrix_metrics(columns, [symbol], start_date, indicators).get(symbol, {})
+
+
+def matrix_metrics_job(arrays: Dict[str, np.ndarray], symbols: List[str],
+                       start_date: str, indicators: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Compute pool job of ``compute_matrix_metrics``, arrays are price fields.
+    """
+    return compute_matrix_metrics(arrays, symbols, start_date, indicators)
 
 
 class CompanyMetrics:
 
-    def __init__(self, mongo_uri) -> None:
-        self.uri = mongo_uri
+    def __init__(self, client: MongoClient) -> None:
+        self.client = client
         self.symbols_list = list(
             pd.read_csv(
                 path.abspath(
@@ -31,20 +112,27 @@ class CompanyMetrics:
             _type_: _description_
         """
 
-        data_frame = get_historical_data(self.uri, symbol, start_date)
+        data_frame = get_historical_data(self.client, symbol, start_date)
 
         return data_frame
 
     # TODO: Metric calculations should be updated correctly some of them can be eliminated
 
     def calculate_company_metrics(
-        self, symbol: str, start_date: str, return_data: bool = False
+        self, symbol: str, start_date: str, return_data: bool = False,
+        indicators: Optional[List[str]] = None,
     ) -> dict:
         """
         Calculate various metrics for each company's stock based on historical data.
 
+        Metrics are cached per (symbol, start_date) until bars of the symbol
+        are written, keyed on its data version. Start dates of the standard windows are read from
+        the metrics materialized after ingestion.
+
         Args:
             last_n_days (int): Number of days of historical data to consider.
+            indicators (List[str], optional): Registered indicators to
+                calculate, the default metrics when None.
 
         Returns:
             dict: Dictionary containing calculated metrics for each company.
@@ -52,85 +140,161 @@ class CompanyMetrics:
         metrics_dict = {}
 
         try:
-            # Fetch historical data for the last 'last_n_days' days
-            df = get_historical_data(self.uri, symbol, start_date)
-
-            if df.empty:
-                return metrics_dict
-
-            closing_prices = df["Close"].ffill(limit=1)
-
-            # Calculate metric
-
-            max_value = closing_prices.max()
-            min_value = closing_prices.min()
-            std_dev = closing_prices.std()
-            price_interval = max_value - min_value
-            percentage_change = (
-                (closing_prices.iloc[-1] - closing_prices.iloc[0])
-                / closing_prices.iloc[0]
-            ) * 100
-
-            daily_returns = closing_prices.pct_change().dropna()
-            volatility = daily_returns.std() * np.sqrt(len(closing_prices))
-
-            delta = closing_prices.diff()
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where(delta < 0, 0)
-            avg_gain = gain.rolling(window=14, min_periods=1).mean()
-            avg_loss = loss.rolling(window=14, min_periods=1).mean()
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs)).iloc[-1]
-
-            sma_20_bb = (
-                closing_prices.rolling(window=20).mean()
-                if len(closing_prices) >= 20
-                else np.nan
-            )
-            rolling_std_20 = (
-                closing_prices.rolling(window=20).std()
-                if len(closing_prices) >= 20
-                else np.nan
-            )
-            upper_band = (
-                sma_20_bb + (rolling_std_20 * 2) if sma_20_bb is not np.nan else np.nan
-            )
-            lower_band = (
-                sma_20_bb - (rolling_std_20 * 2) if sma_20_bb is not np.nan else np.nan
-            )
-            latest_upper_band = (
-                upper_band.iloc[-1] if upper_band is not np.nan else np.nan
-            )
-            latest_lower_band = (
-                lower_band.iloc[-1] if lower_band is not np.nan else np.nan
-            )
-
-            sharpe_ratio = (
-                (daily_returns.mean() / daily_returns.std()) * np.sqrt(252)
-                if daily_returns.std() != 0
-                else np.nan
-            )
-
-            # Store the metrics in the dictionary
-            metrics_dict = {
-                "symbol": symbol,
-                "from_date": start_date,
-                "max_value": round(max_value, 3),
-                "min_value": round(min_value, 3),
-                "standard_deviation": round(std_dev, 3),
-                "price_interval": round(price_interval, 3),
-                "percentage_change": round(percentage_change, 3),
-                "volatility": round(volatility, 3),
-                "rsi": round(rsi, 3),
-                "bollinger_up": round(np.nan_to_num(latest_upper_band, nan=0), 3),
-                "bollinger_low": round(np.nan_to_num(latest_lower_band, nan=0), 3),
-                "sharpe_ratio": round(sharpe_ratio, 3),
-            }
+            plan = IndicatorPlan(indicators)
+            if not return_data:
+                # Changes with every write of the symbol's bars, in any process
+                version = IngestionManifest(self.client.stockdata).data_version(symbol)
+                key = (symbol, version, start_date, tuple(indicators or ()))
+                cached = metrics_cache.get(key)
+                if cached is not None:
+                    return dict(cached)
+
+                if not indicators:
+                    materialized = IndicatorStore(self.client.stockdata).lookup(
+                        symbol, start_date, version)
+                    if materialized is not None:
+                        metrics_cache.set(key, materialized)
+                        return dict(materialized)
+
+            if plan.pushdown and not return_data:
+                # Range statistics are computed by MongoDB
+                metrics_dict = self.aggregate_metrics([symbol], start_date, plan).get(symbol, {})
+                metrics_cache.set(key, metrics_dict)
+                return dict(metrics_dict)
+
+            # Fetch only the price fields the indicators need, oldest first
+            fields = ["Close"] if return_data else plan.fields
+            prices = load_price_columns(self.client, symbol, start_date, fields)
+
+            if len(prices) == 0:
+                return prices.to_frame() if return_data else metrics_dict
+
+            if not return_data:
+                metrics_dict = compute_metrics(
+                    symbol, start_date, prices.values, plan.indicators)
 
         except Exception as e:
             logging.error(f"Error processing {symbol}: {e}")
             raise CustomException(f"Error processing {symbol}: {e}", sys)
         if return_data == True:
-            return df
+            return prices.to_frame()
         else:
-            return metrics_dict
+            metrics_cache.set(key, metrics_dict)
+            return dict(metrics_dict)
+
+    def aggregate_metrics(self, symbols: List[str], start_date: str,
+                          plan: IndicatorPlan) -> Dict[str, dict]:
+        """
+        Calculates indicators that only need range statistics with a single
+        MongoDB aggregation, no bars are transferred.
+
+        Args:
+            symbols (List[str]): Stock symbols.
+            start_date (str): Statistics are calculated starting from this date.
+            plan (IndicatorPlan): Plan whose indicators all support pushdown.
+
+        Returns:
+            Dict[str, dict]: Metrics of every symbol with data, keyed by symbol.
+        """
+        stats = get_storage(self.client.stockdata).aggregate_stats(symbols, start_date)
+        counts = stats["count"].reindex(symbols).fillna(0).to_numpy()
+        return format_metrics(plan.compute_aggregates(stats, symbols), counts,
+                              symbols, start_date)
+
+    def load_price_arrays(self, symbols: List[str], start_date: str,
+                          fields: Optional[List[str]] = None) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        """
+        Loads the prices of many symbols with a single query as float64
+        arrays, the input of ``compute_matrix_metrics``.
+
+        Every symbol keeps only its own bars: the last bar of every symbol is
+        on the last row and shorter histories are padded with NaN before
+        their first bar. Aligning symbols on shared dates would insert rows a
+        symbol has no bar on, and its metrics would depend on the other
+        symbols of the request.
+
+        Args:
+            symbols (List[str]): Stock symbols to load.
+            start_date (str): Prices are loaded starting from this date.
+            fields (List[str], optional): Price fields, "Close" by default.
+
+        Returns:
+            tuple: (field -> bars x symbols array, symbol of every column).
+        """
+        fields = fields or ["Close"]
+        bars = get_storage(self.client.stockdata).read(symbols, start_date, fields=fields)
+        if bars.empty:
+            return {field: np.empty((0, 0)) for field in fields}, []
+
+        # Bars are sorted by symbol and date, count rows back from the last bar
+        from_last = bars.groupby("symbol", sort=False).cumcount(ascending=False)
+        rows = int(from_last.max()) + 1
+        bars = bars.assign(row=rows - 1 - from_last)
+        stored = set(bars["symbol"])
+        columns = [symbol for symbol in dict.fromkeys(symbols) if symbol in stored]
+        arrays = {
+            field: np.ascontiguousarray(
+                bars.pivot(index="row", columns="symbol", values=field)
+                .reindex(index=range(rows), columns=columns).to_numpy(dtype=np.float64))
+            for field in fields
+        }
+        return arrays, columns
+
+    def calculate_batch_metrics(self, symbols: List[str], start_date: str,
+                                indicators: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        Calculates the metrics of ``calculate_company_metrics`` for many symbols
+        in one column-wise pass over a date x symbol price matrix.
+
+        Every symbol is calculated over its own bars only, so its metrics
+        equal those of ``calculate_company_metrics`` whatever other symbols
+        are requested. Indicators that only need range statistics are
+        calculated by a MongoDB aggregation instead.
+
+        Args:
+            symbols (List[str]): Stock symbols to calculate metrics for.
+            start_date (str): Metrics are calculated starting from this date.
+            indicators (List[str], optional): Registered indicators to
+                calculate, the default metrics when None.
+
+        Returns:
+            Dict[str, dict]: Metrics of every symbol that has data since
+                ``start_date``, keyed by symbol.
+        """
+        try:
+            plan = IndicatorPlan(indicators)
+            if plan.pushdown:
+                return self.aggregate_metrics(symbols, start_date, plan)
+            prices, columns = self.load_price_arrays(symbols, start_date, plan.fields)
+            return compute_matrix_metrics(prices, columns, start_date, plan.indicators)
+
+        except Exception as e:
+            logging.error(f"Error processing batch metrics: {e}")
+            raise CustomException(f"Error processing batch metrics: {e}", sys)
+
+    def verify_batch_metrics(self, symbols: List[str], start_date: str,
+                             indicators: Optional[List[str]] = None) -> List[str]:
+        """
+        Compares the metrics of ``calculate_batch_metrics`` with those of
+        every symbol calculated alone from its own price columns.
+
+        Returns:
+            List[str]: Symbols whose batch and single symbol metrics differ.
+        """
+        try:
+            plan = IndicatorPlan(indicators)
+            batch = self.calculate_batch_metrics(symbols, start_date, plan.indicators)
+            mismatched = []
+            for symbol in symbols:
+                prices = load_price_columns(self.client, symbol, start_date, plan.fields)
+                single = compute_metrics(symbol, start_date, prices.values, plan.indicators)
+                batched = batch.get(symbol, {})
+                # NaN never equals itself, both NaN is a match
+                if single.keys() != batched.keys() or any(
+                        value != batched[name] and not (value != value and batched[name] != batched[name])
+                        for name, value in single.items()):
+                    mismatched.append(symbol)
+            return mismatched
+        except Exception as e:
+            logging.error(f"Error verifying batch metrics: {e}")
+            raise CustomException(f"Error verifying batch metrics: {e}", sys)
@@ -0,0 +1,208 @@
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from ..config import settings_api
+from ..utils.exception import CustomException
+from ..utils.logger import logging
+from ..utils.manifest import UnavailableRanges
+from ..utils.price_providers import PriceProvider
+from ..utils.trading_calendar import TradingCalendar, get_trading_calendar
+from ..utils.utils import expected_last_date
+from .stage01data_ingestion import IngestionSummary, StockIngestion
+
+
+@dataclass
+class DataValidationConfig:
+    """
+    Configuration of the stored data validation.
+    """
+    # Absolute daily return above which a bar is flagged as an outlier
+    outlier_return: float = settings_api.outlier_return
+    # Trading days window validated after every scheduled ingestion
+    lookback_days: int = settings_api.validation_lookback_days
+
+
+@dataclass
+class ValidationReport:
+    """
+    Result of a validation run.
+
+    missing: "symbol", "start_date", "end_date" (exclusive) and "days" of every
+        run of consecutive trading days without a stored bar.
+    flags: "symbol", "_id" (date) and "flag" ("nan_close", "zero_volume",
+        "outlier") of every suspicious stored bar.
+    """
+    missing: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(
+        columns=["symbol", "start_date", "end_date", "days"]))
+    flags: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(
+        columns=["symbol", "_id", "flag"]))
+
+    def __str__(self) -> str:
+        return (f"missing ranges: {len(self.missing)} "
+                f"({int(self.missing['days'].sum())} days), "
+                f"flagged bars: {len(self.flags)}")
+
+
+class DataValidation:
+    """
+    Compares stored bars of every symbol with the exchange calendar, flags
+    suspicious bars and re-fetches only the missing trading days.
+    """
+
+    def __init__(self, client: MongoClient, provider: Optional[PriceProvider] = None,
+                 calendar: Optional[TradingCalendar] = None) -> None:
+        self.ingestion = StockIngestion(client, provider)
+        self.storage = self.ingestion.storage
+        self.unavailable_ranges = UnavailableRanges(client.stockdata)
+        self.calendar = calendar or get_trading_calendar()
+        self.validation_config = DataValidationConfig()
+
+    @staticmethod
+    def _missing_ranges(missing: np.ndarray, days: pd.DatetimeIndex,
+                        symbols: pd.Index) -> pd.DataFrame:
+        """
+        Turns a (symbol x day) missing mask into runs of consecutive days.
+        """
+        padded = np.pad(missing.astype(np.int8), ((0, 0), (1, 1)))
+        edges = np.diff(padded, axis=1)
+        # argwhere walks row by row, so starts and ends of a symbol pair up
+        starts = np.argwhere(edges == 1)
+        ends = np.argwhere(edges == -1)
+
+        return pd.DataFrame({
+            "symbol": symbols[starts[:, 0]],
+            "start_date": days[starts[:, 1]].strftime("%Y-%m-%d"),
+            "end_date": (days[ends[:, 1] - 1] + timedelta(days=1)).strftime("%Y-%m-%d"),
+            "days": ends[:, 1] - starts[:, 1],
+        })
+
+    def _flag_bars(self, bars: pd.DataFrame) -> pd.DataFrame:
+        flags = pd.DataFrame({"nan_close": bars["Close"].isna()})
+        if "Volume" in bars:
+            flags["zero_volume"] = bars["Volume"] == 0
+        returns = bars.groupby("symbol")["Close"].pct_change(fill_method=None)
+        flags["outlier"] = returns.abs() > self.validation_config.outlier_return
+
+        flags = pd.concat([bars[["symbol", "_id"]], flags], axis=1).melt(
+            id_vars=["symbol", "_id"], var_name="flag")
+        return flags[flags["value"]].drop(columns=["value"]).reset_index(drop=True)
+
+    def validate(self, symbols: Optional[List[str]] = None,
+                 start_date: Optional[str] = None) -> ValidationReport:
+        """
+        Validates stored bars in one vectorized pass over the universe.
+
+        Each symbol is checked from its first stored date (or ``start_date``)
+        until the last session that should already be ingested.
+
+        Parameters:
+            symbols (List[str], optional): Symbols to validate, all when None.
+            start_date (str, optional): First date to validate ("%Y-%m-%d").
+
+        Returns:
+            ValidationReport: Missing trading day ranges and flagged bars.
+        """
+        try:
+            bars = self.storage.read(symbols, start_date, fields=["Close", "Volume"])
+            if bars.empty:
+                return ValidationReport()
+
+            dates = pd.to_datetime(bars["_id"])
+            days = self.calendar.trading_days(dates.min(), expected_last_date())
+
+            # date x symbol presence matrix on the exchange calendar
+            counts = pd.crosstab(dates, bars["symbol"]).reindex(days, fill_value=0)
+            present = counts.to_numpy() > 0
+            first_dates = dates.groupby(bars["symbol"]).min().reindex(counts.columns)
+            listed = days.to_numpy()[:, None] >= first_dates.to_numpy()[None, :]
+            missing = (listed & ~present).T
+
+            report = ValidationReport(
+                missing=self._missing_ranges(missing, days, first_dates.index),
+                flags=self._flag_bars(bars),
+            )
+            logging.info(f"Data validation finished. {report}")
+            return report
+        except Exception as e:
+            logging.error(f"Error validating stock data: {e}")
+            raise CustomException(e, sys)
+
+    def refetch_missing(self, report: ValidationReport) -> IngestionSummary:
+        """
+        Re-fetches the missing ranges of a report, symbols missing the same
+        range are fetched together in provider sized batches.
+
+        Ranges the provider returned no bars for are recorded and skipped
+        until ``empty_recheck_days`` passed. The re-fetch does not change the
+        ingestion status of the symbols in the manifest.
+
+        Returns:
+            IngestionSummary: A symbol is ok when bars were written into its
+                gaps, empty when the provider had none of the missing bars.
+        """
+        unavailable = self.unavailable_ranges.recent()
+        groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        skipped = 0
+        for symbol, start_date, end_date in report.missing[
+                ["symbol", "start_date", "end_date"]].itertuples(index=False):
+            if (symbol, start_date, end_date) in unavailable:
+                skipped += 1
+            else:
+                groups[(start_date, end_date)].append(symbol)
+
+        last_dates = self.ingestion.manifest.last_dates()
+        size = self.ingestion.ingestion_config.batch_size
+        results: Dict[str, list] = defaultdict(list)
+        unfilled, empty = [], []
+        for (start_date, end_date), symbols in groups.items():
+            for i in range(0, len(symbols), size):
+                batch_results = self.ingestion.ingest_batch(
+                    symbols[i:i + size], start_date, end_date, last_dates,
+                    record_status=False)
+                for symbol, result in batch_results.items():
+                    results[symbol].append(result)
+                    if result == "empty":
+                        empty.append((symbol, start_date, end_date))
+                    if result != "ok":
+                        unfilled.append(f"{symbol} {start_date}..{end_date}")
+        self.unavailable_ranges.record(empty)
+
+        summary = IngestionSummary()
+        for symbol, symbol_results in results.items():
+            errors = [r for r in symbol_results if isinstance(r, Exception)]
+            if errors:
+                summary.add(symbol, errors[0])
+            else:
+                summary.add(symbol, "ok" if "ok" in symbol_results else "empty")
+
+        # Bars were inserted before the last date, recount the stored bars
+        self.ingestion.manifest.rebuild(self.storage, summary.ok)
+        logging.info(f"Missing ranges re-fetched. {summary}")
+        if unfilled:
+            logging.warning(f"{len(unfilled)} missing ranges not filled: {unfilled}")
+        if skipped:
+            logging.info(f"{skipped} missing ranges without provider bars skipped")
+        return summary
+
+    def validate_recent(self, refetch: bool = True) -> ValidationReport:
+        """
+        Validates the last ``lookback_days`` trading days of the universe and
+        optionally re-fetches what is missing.
+        """
+        lookback = self.validation_config.lookback_days
+        last_date = expected_last_date()
+        days = self.calendar.trading_days(
+            pd.Timestamp(last_date) - timedelta(days=lookback * 2), last_date)
+        start_date = days[max(len(days) - lookback, 0)].strftime("%Y-%m-%d")
+
+        report = self.validate(start_date=start_date)
+        if refetch and not report.missing.empty:
+            self.refetch_missing(report)
+        return report
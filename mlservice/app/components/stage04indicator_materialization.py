@@ -0,0 +1,220 @@
+import sys
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from ..config import settings_api
+from ..utils.exception import CustomException
+from ..utils.indicator_engine import IndicatorEngine
+from ..utils.indicator_store import STANDARD_WINDOWS, IndicatorStore, window_start_date
+from ..utils.logger import logging
+from ..utils.manifest import IngestionManifest
+from ..utils.storage import get_storage
+from ..utils.utils import expected_last_date
+from .stage02get_data import compute_metrics
+
+
+@dataclass
+class IndicatorMaterializationConfig:
+    """
+    Configuration of the post-ingestion indicator materialization.
+    """
+    # Standard windows whose summary metrics are stored
+    windows: List[str] = field(default_factory=lambda: list(STANDARD_WINDOWS))
+    # Symbols whose history is loaded and processed together
+    batch_size: int = settings_api.provider_batch_size
+
+
+def rolling_indicators(bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes the daily rolling indicators of many symbols at once.
+
+    Args:
+        bars (pd.DataFrame): "symbol", "_id" (date) and "Close" columns,
+            sorted by symbol and date.
+
+    Returns:
+        pd.DataFrame: "symbol", "date", "close", "rsi_14", "sma_20",
+            "bollinger_up", "bollinger_low", "volatility_20", "high_252",
+            "low_252", "rsi_wilder_14" and "cumulative_return" (percent since
+            the first stored close).
+    """
+    symbols = bars["symbol"]
+    close = bars["Close"].groupby(symbols).ffill(limit=1)
+    grouped = close.groupby(symbols)
+
+    delta = grouped.diff()
+    gain = delta.where(delta > 0, 0).groupby(symbols)
+    loss = (-delta.where(delta < 0, 0)).groupby(symbols)
+    avg_gain = gain.rolling(window=14, min_periods=1).mean().droplevel(0)
+    avg_loss = loss.rolling(window=14, min_periods=1).mean().droplevel(0)
+
+    sma_20 = grouped.rolling(window=20).mean().droplevel(0)
+    std_20 = grouped.rolling(window=20).std().droplevel(0)
+    returns = grouped.pct_change(fill_method=None)
+    volatility_20 = returns.groupby(symbols).rolling(
+        window=20).std().droplevel(0) * np.sqrt(252)
+    wilder_gain = gain.transform(lambda x: x.ewm(alpha=1 / 14, adjust=False).mean())
+    wilder_loss = loss.transform(lambda x: x.ewm(alpha=1 / 14, adjust=False).mean())
+
+    return pd.DataFrame({
+        "symbol": symbols,
+        "date": bars["_id"],
+        "close": close,
+        "rsi_14": 100 - 100 / (1 + avg_gain / avg_loss),
+        "sma_20": sma_20,
+        "bollinger_up": sma_20 + 2 * std_20,
+        "bollinger_low": sma_20 - 2 * std_20,
+        "volatility_20": volatility_20,
+        "high_252": grouped.rolling(window=252, min_periods=1).max().droplevel(0),
+        "low_252": grouped.rolling(window=252, min_periods=1).min().droplevel(0),
+        "rsi_wilder_14": 100 - 100 / (1 + wilder_gain / wilder_loss),
+        "cumulative_return": (close / grouped.transform("first") - 1) * 100,
+    })
+
+
+class IndicatorMaterialization:
+    """
+    Stores the daily rolling indicators and the standard window metrics of
+    every symbol after ingestion, so the common look-backs of /metrics are a
+    single indexed lookup.
+
+    Daily rows of new bars are appended by the incremental indicator engine
+    during ingestion, this stage only rebuilds symbols the engine has no
+    state for.
+    """
+
+    def __init__(self, client: MongoClient) -> None:
+        self.storage = get_storage(client.stockdata)
+        self.manifest = IngestionManifest(client.stockdata)
+        self.store = IndicatorStore(client.stockdata)
+        self.engine = IndicatorEngine(client.stockdata)
+        self.materialization_config = IndicatorMaterializationConfig()
+
+    def rebuild_series(self, symbols: List[str]) -> int:
+        """
+        Rewrites the daily series and engine state of symbols from their full
+        stored history.
+
+        Returns:
+            int: Number of symbols rebuilt.
+        """
+        bars = self.storage.read(symbols, fields=["Close"])
+        if bars.empty:
+            return 0
+        rows, states = self.engine.rebuild(bars)
+        self.store.write_series(rows)
+        self.engine.save(states)
+        return len(states)
+
+    def _materialize_windows(self, symbols: List[str], anchor_date: str,
+                             versions: dict) -> int:
+        windows = self.materialization_config.windows
+        first_start = min(window_start_date(window, anchor_date) for window in windows)
+        bars = self.storage.read(symbols, first_start, fields=["Close"])
+
+        for symbol, group in bars.groupby("symbol"):
+            metrics = {}
+            for window in windows:
+                start_date = window_start_date(window, anchor_date)
+                closes = group.loc[group["_id"] >= start_date, "Close"]
+                if closes.empty:
+                    continue
+                metrics[window] = (start_date, compute_metrics(
+                    symbol, start_date, {"Close": closes.to_numpy()}))
+            self.store.write_windows(symbol, anchor_date, versions.get(symbol), metrics)
+        return bars["symbol"].nunique()
+
+    def materialize(self, symbols: Optional[List[str]] = None, force: bool = False) -> int:
+        """
+        Rebuilds the daily series of symbols without engine state and
+        materializes symbols whose windows are older than their stored bars,
+        including bars re-fetched or backfilled before the last date, or than
+        the current anchor date.
+
+        Parameters:
+            symbols (List[str], optional): Symbols to materialize, every
+                symbol of the manifest when None.
+            force (bool): Rebuild the whole daily series and every window.
+
+        Returns:
+            int: Number of symbols whose windows were materialized.
+        """
+        try:
+            anchor_date = expected_last_date()
+            versions = self.manifest.data_versions()
+            if symbols is None:
+                symbols = [symbol for symbol, version in versions.items() if version]
+            size = self.materialization_config.batch_size
+
+            with_state = set() if force else set(self.engine.load(symbols))
+            rebuild = [symbol for symbol in symbols if symbol not in with_state]
+            rebuilt = 0
+            for i in range(0, len(rebuild), size):
+                rebuilt += self.rebuild_series(rebuild[i:i + size])
+
+            materialized = self.store.window_versions()
+            pending = [
+                symbol for symbol in symbols
+                if force or materialized.get(symbol) != (anchor_date, versions.get(symbol))
+            ]
+            count = 0
+            for i in range(0, len(pending), size):
+                count += self._materialize_windows(
+                    pending[i:i + size], anchor_date, versions)
+
+            logging.info(
+                f"Indicator series rebuilt for {rebuilt} symbols, windows "
+                f"materialized for {count} symbols, anchored at {anchor_date}")
+            return count
+        except Exception as e:
+            logging.error(f"Error materializing indicators: {e}")
+            raise CustomException(e, sys)
+
+    def verify(self, symbols: Optional[List[str]] = None, repair: bool = False,
+               rtol: float = 1e-6) -> List[str]:
+        """
+        Recomputes the daily series of symbols from their full history and
+        compares it with the incrementally maintained one.
+
+        Parameters:
+            symbols (List[str], optional): Symbols to verify, all when None.
+            repair (bool): Rebuild the series of symbols that differ.
+            rtol (float): Relative tolerance of the comparison.
+
+        Returns:
+            List[str]: Symbols whose stored series differs from a full
+                recomputation.
+        """
+        try:
+            symbols = symbols or self.storage.symbols()
+            size = self.materialization_config.batch_size
+            mismatched = []
+            for i in range(0, len(symbols), size):
+                bars = self.storage.read(symbols[i:i + size], fields=["Close"])
+                if bars.empty:
+                    continue
+                expected = rolling_indicators(bars)
+                for symbol, group in expected.groupby("symbol"):
+                    stored = self.store.read_series(symbol)
+                    columns = [column for column in group.columns
+                               if column not in ("symbol", "date")]
+                    if (len(stored) != len(group)
+                            or list(stored.get("date", [])) != list(group["date"])
+                            or not np.allclose(stored[columns].to_numpy(dtype=np.float64),
+                                               group[columns].to_numpy(dtype=np.float64),
+                                               rtol=rtol, equal_nan=True)):
+                        mismatched.append(symbol)
+
+            logging.info(
+                f"Indicator verification: {len(mismatched)} of {len(symbols)} symbols differ")
+            if repair:
+                for i in range(0, len(mismatched), size):
+                    self.rebuild_series(mismatched[i:i + size])
+            return mismatched
+        except Exception as e:
+            logging.error(f"Error verifying indicators: {e}")
+            raise CustomException(e, sys)
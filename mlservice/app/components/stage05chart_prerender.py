@@ -0,0 +1,68 @@
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from pymongo import MongoClient
+
+from ..config import settings_api
+from ..utils.cache import chart_cache
+from ..utils.charting import chart_demand, chart_key, render_close_chart
+from ..utils.exception import CustomException
+from ..utils.logger import logging
+from ..utils.manifest import IngestionManifest
+from ..utils.utils import load_price_columns
+
+
+@dataclass
+class ChartPrerenderConfig:
+    """
+    Configuration of the post-ingestion chart pre-rendering.
+    """
+    # Number of most requested charts rendered after every ingestion
+    count: int = settings_api.chart_prerender_count
+
+
+class ChartPrerender:
+    """
+    Renders the most requested charts for the newly ingested data into the
+    chart cache, so the first dashboard refresh after ingestion is served
+    from memory instead of paying for a render.
+    """
+
+    def __init__(self, client: MongoClient) -> None:
+        self.client = client
+        self.manifest = IngestionManifest(client.stockdata)
+        self.prerender_config = ChartPrerenderConfig()
+
+    def prerender(self, charts: Optional[List[Tuple[str, str]]] = None) -> int:
+        """
+        Renders charts missing from the cache for their current data version.
+
+        Parameters:
+            charts (List[Tuple[str, str]], optional): (symbol, start_date) of
+                the charts to render, the most requested ones when None.
+
+        Returns:
+            int: Number of charts rendered.
+        """
+        try:
+            if charts is None:
+                charts = chart_demand.most_common(self.prerender_config.count)
+            versions = self.manifest.data_versions()
+
+            rendered = 0
+            for symbol, start_date in charts:
+                version = versions.get(symbol)
+                key = chart_key(symbol, version, start_date)
+                if version is None or chart_cache.get(key) is not None:
+                    continue
+                prices = load_price_columns(self.client, symbol, start_date, ["Close"])
+                chart_cache.set(key, render_close_chart(
+                    {"dates": prices.dates, "Close": prices["Close"]}, symbol, start_date))
+                rendered += 1
+
+            logging.info(f"Pre-rendered {rendered} of {len(charts)} requested charts")
+            return rendered
+        except Exception as e:
+            logging.error(f"Error pre-rendering charts: {e}")
+            raise CustomException(e, sys)
@@ -0,0 +1,152 @@
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from ..utils.clustering import impute_and_scale, select_k, squared_distances
+from ..utils.exception import CustomException
+from ..utils.indicators import IndicatorPlan
+from ..utils.logger import logging
+from ..utils.manifest import IngestionManifest
+from ..utils.recommendation_model import (RecommendationModel, RecommendationModelStore,
+                                          active_model)
+from ..utils.storage import get_storage
+from ..utils.utils import expected_last_date, load_price_panel
+
+
+@dataclass
+class RecommendationConfig:
+    """
+    Configuration of the clustering behind /recommendation.
+    """
+    # Registered indicators describing every symbol, all scale free
+    features: List[str] = field(default_factory=lambda: [
+        "percentage_change", "volatility", "sharpe_ratio", "rsi", "max_drawdown",
+        "macd_histogram",
+    ])
+    # Calendar days of closes the features are calculated from
+    lookback_days: int = 365
+    # Symbols with fewer closes in the look-back are not clustered
+    min_bars: int = 60
+    # Candidate numbers of clusters, the best silhouette score wins
+    k_min: int = 2
+    k_max: int = 12
+    n_init: int = 5
+    max_iter: int = 100
+    seed: int = 42
+    # Nearest peers stored per symbol
+    peer_count: int = 10
+
+
+def nearest_peers(points: np.ndarray, labels: np.ndarray, symbols: List[str],
+                  count: int) -> Dict[str, List[str]]:
+    """
+    Returns the ``count`` nearest symbols of the same cluster of every symbol.
+    """
+    distances = squared_distances(points, points)
+    # Other clusters and the symbol itself are never peers
+    distances[labels[:, None] != labels[None, :]] = np.inf
+    np.fill_diagonal(distances, np.inf)
+    peers = {}
+    for i, symbol in enumerate(symbols):
+        candidates = np.flatnonzero(np.isfinite(distances[i]))
+        nearest = candidates[np.argsort(distances[i, candidates], kind="stable")[:count]]
+        peers[symbol] = [symbols[j] for j in nearest]
+    return peers
+
+
+class RecommendationTraining:
+    """
+    Clusters the symbol universe on indicator features after ingestion and
+    stores the model, so /recommendation answers from memory instead of
+    recomputing the metrics of every symbol per request.
+    """
+
+    def __init__(self, client: MongoClient) -> None:
+        self.client = client
+        self.storage = get_storage(client.stockdata)
+        self.manifest = IngestionManifest(client.stockdata)
+        self.store = RecommendationModelStore(client.stockdata)
+        self.recommendation_config = RecommendationConfig()
+
+    def build_features(self, anchor_date: str) -> Tuple[np.ndarray, List[str], str]:
+        """
+        Calculates the feature matrix of every stored symbol from one batched
+        load of its closes.
+
+        Args:
+            anchor_date (str): Last date of the look-back ("%Y-%m-%d").
+
+        Returns:
+            tuple: (symbols x features array, NaN where undefined, symbol of
+                every row, first date of the look-back).
+        """
+        config = self.recommendation_config
+        start_date = (pd.Timestamp(anchor_date)
+                      - pd.Timedelta(days=config.lookback_days)).strftime("%Y-%m-%d")
+        prices, symbols = load_price_panel(self.client, self.storage.symbols(), start_date)
+        closes = prices["Close"]
+
+        enough = (~np.isnan(closes)).sum(axis=0) >= config.min_bars
+        symbols = [symbol for symbol, keep in zip(symbols, enough) if keep]
+        if not symbols:
+            return np.empty((0, len(config.features))), [], start_date
+
+        values = IndicatorPlan(config.features).compute({"Close": closes[:, enough]})
+        features = np.column_stack([values[name] for name in config.features])
+        return features.astype(np.float64), symbols, start_date
+
+    def train(self) -> Optional[RecommendationModel]:
+        """
+        Fits the clustering, stores it and makes it the active model.
+
+        Returns:
+            RecommendationModel: The fitted model, None when too few symbols
+                have enough history to cluster.
+        """
+        try:
+            config = self.recommendation_config
+            anchor_date = expected_last_date()
+            features, symbols, start_date = self.build_features(anchor_date)
+            if len(symbols) <= config.k_min:
+                logging.warning(
+                    f"Only {len(symbols)} symbols have {config.min_bars} closes, "
+                    f"recommendation model not trained")
+                return None
+
+            points, medians, means, stds = impute_and_scale(features)
+            k, centers, labels, silhouette = select_k(
+                points, range(config.k_min, config.k_max + 1),
+                config.n_init, config.max_iter, config.seed)
+
+            now = datetime.now()
+            model = RecommendationModel(
+                features=list(config.features),
+                symbols=symbols,
+                labels=labels.tolist(),
+                centers=centers,
+                medians=medians,
+                means=means,
+                stds=stds,
+                peers=nearest_peers(points, labels, symbols, config.peer_count),
+                k=k,
+                silhouette=round(silhouette, 4),
+                start_date=start_date,
+                data_version=self.manifest.latest_date(),
+                # MongoDB keeps milliseconds, the stored and active model compare equal
+                trained_at=now.replace(microsecond=now.microsecond // 1000 * 1000),
+            )
+            self.store.save(model)
+            active_model.set(model)
+
+            logging.info(
+                f"Recommendation model trained on {len(symbols)} symbols, "
+                f"{k} clusters, silhouette {model.silhouette}")
+            return model
+        except Exception as e:
+            logging.error(f"Error training the recommendation model: {e}")
+            raise CustomException(e, sys)
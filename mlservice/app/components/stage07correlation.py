@@ -0,0 +1,143 @@
+import sys
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from ..config import settings_api
+from ..utils.correlation import RollingCorrelation, resolve_directory, write_matrix
+from ..utils.exception import CustomException
+from ..utils.logger import logging
+from ..utils.manifest import IngestionManifest
+from ..utils.storage import get_storage
+from ..utils.utils import expected_last_date, load_price_panel
+
+
+@dataclass
+class CorrelationConfig:
+    """
+    Configuration of the universe correlation matrix.
+    """
+    directory: str = resolve_directory(settings_api.correlation_dir)
+    # Daily returns per pair, and the fewest shared ones giving a correlation
+    window: int = settings_api.correlation_window
+    min_periods: int = settings_api.correlation_min_periods
+    # Incremental updates between rebuilds, bounding floating point drift
+    rebuild_every: int = settings_api.correlation_rebuild_every
+
+
+class CorrelationUpdate:
+    """
+    Keeps the rolling return correlation matrix of every stored symbol
+    current after ingestion, by pushing only the new dates through the
+    running sums of the persisted state.
+    """
+
+    def __init__(self, client: MongoClient) -> None:
+        self.client = client
+        self.storage = get_storage(client.stockdata)
+        self.manifest = IngestionManifest(client.stockdata)
+        self.correlation_config = CorrelationConfig()
+
+    def rebuild(self) -> RollingCorrelation:
+        """
+        Builds the state from the closes of the last ``window + 1`` dates.
+
+        Every stored symbol gets a column, NaN for symbols without bars in
+        the window, so the state only goes stale when symbols are added to
+        or removed from the storage.
+        """
+        config = self.correlation_config
+        # Calendar days comfortably covering the window's trading days
+        start_date = (pd.Timestamp(expected_last_date())
+                      - pd.Timedelta(days=config.window * 2 + 30)).strftime("%Y-%m-%d")
+        symbols = self.storage.symbols()
+        prices, found = load_price_panel(self.client, symbols, start_date)
+        dates = pd.DatetimeIndex(prices["dates"]).strftime("%Y-%m-%d").tolist()
+        columns = {symbol: i for i, symbol in enumerate(symbols)}
+        closes = np.full((len(dates), len(symbols)), np.nan)
+        closes[:, [columns[symbol] for symbol in found]] = prices["Close"]
+        return RollingCorrelation.from_closes(symbols, dates, closes, config.window)
+
+    @staticmethod
+    def _revised(state: RollingCorrelation, versions: Dict[str, Optional[str]]) -> bool:
+        """
+        Whether bars were written before the last date of a symbol since the
+        state was built, by a gap re-fetch or a backfill: its data version
+        changed but its last date did not advance.
+        """
+        if state.data_versions is None:
+            return True
+        for symbol in state.symbols:
+            before, after = state.data_versions.get(symbol), versions.get(symbol)
+            if before == after:
+                continue
+            if before is None or after is None:
+                return True
+            # Versions are "<last date>.<revision>"
+            if after.rsplit(".", 1)[0] <= before.rsplit(".", 1)[0]:
+                return True
+        return False
+
+    def _advance(self, state: RollingCorrelation) -> Optional[int]:
+        """
+        Pushes the dates after the state's last date, None when the stored
+        bars no longer match the state and it has to be rebuilt.
+        """
+        prices, found = load_price_panel(self.client, state.symbols, state.last_date)
+        dates = pd.DatetimeIndex(prices["dates"]).strftime("%Y-%m-%d").tolist()
+        if not dates or dates[0] != state.last_date:
+            return None
+        closes = np.full((len(dates), len(state.symbols)), np.nan)
+        columns = [state.symbols.index(symbol) for symbol in found]
+        closes[:, columns] = prices["Close"]
+        # Bars of the last date were revised, the running sums are stale
+        if not np.allclose(closes[0], state.last_closes, equal_nan=True):
+            return None
+        for date, row in zip(dates[1:], closes[1:]):
+            state.push(date, row)
+        return len(dates) - 1
+
+    def update(self, force: bool = False) -> int:
+        """
+        Advances the persisted state by the newly ingested dates and writes
+        the correlation matrix.
+
+        The state is rebuilt when missing, when the stored universe changed,
+        when revised bars invalidate it, when bars were written before the
+        last date of a symbol or every ``rebuild_every`` updates.
+
+        Parameters:
+            force (bool): Rebuild the state from the stored closes.
+
+        Returns:
+            int: Number of symbols in the matrix.
+        """
+        try:
+            config = self.correlation_config
+            # Read before the bars, writes racing the update show up next time
+            versions = self.manifest.data_versions()
+            state = None if force else RollingCorrelation.load(config.directory)
+            if state is not None and (state.window != config.window
+                                      or state.updates >= config.rebuild_every
+                                      or state.symbols != self.storage.symbols()
+                                      or self._revised(state, versions)):
+                state = None
+
+            pushed = self._advance(state) if state is not None else None
+            if pushed is None:
+                state = self.rebuild()
+                logging.info(f"Correlation state rebuilt for {len(state.symbols)} symbols")
+            else:
+                logging.info(f"Correlation state advanced by {pushed} dates")
+
+            state.data_versions = {symbol: versions.get(symbol) for symbol in state.symbols}
+            state.save(config.directory)
+            write_matrix(config.directory, state.symbols,
+                         state.correlation(config.min_periods), state.last_date)
+            return len(state.symbols)
+        except Exception as e:
+            logging.error(f"Error updating the correlation matrix: {e}")
+            raise CustomException(e, sys)
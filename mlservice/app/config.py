@@ -6,6 +6,101 @@ class SettingsApi(BaseSettings):
     app_host: str
     app_port: int
 
+    # Application wide MongoClient pool
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 0
+    mongo_connect_timeout_ms: int = 5000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: int = 30000
+    mongo_read_preference: str = "primary"
+
+    # Batches ingested concurrently by StockIngestion. yf.download runs one
+    # batch at a time, so with yfinance the workers overlap bar writes with
+    # the next download, and downloads run in parallel inside a batch.
+    ingestion_workers: int = 4
+    # "yfinance" or "file" (replays fixtures from price_fixtures_dir)
+    price_provider: str = "yfinance"
+    price_fixtures_dir: str = ""
+    # Tickers fetched per provider request, and yfinance download threads
+    provider_batch_size: int = 50
+    provider_threads: int = 16
+    # Bars per bulk write and its write concern ("1", "majority", ...)
+    write_batch_size: int = 1000
+    write_concern: str = "1"
+    # Layout of the bars: "per_symbol" (one collection per symbol),
+    # "unified" or "timeseries" (single bars_collection keyed by symbol, date)
+    storage_layout: str = "per_symbol"
+    bars_collection: str = "_bars"
+    # Per symbol ingestion state (last date, row count, last run status)
+    manifest_collection: str = "_manifest"
+    # Symbols the provider never returned any bars for, and missing ranges a
+    # re-fetch returned no bars for, are tried again after this many days
+    # and skipped by ingestion, freshness and gap re-fetches until then
+    empty_recheck_days: int = 7
+    # Symbols without any bars are backfilled from history_start in
+    # checkpointed chunks of backfill_chunk_days
+    history_start: str = "2015-01-01"
+    backfill_chunk_days: int = 365
+    backfill_collection: str = "_backfill"
+    # Missing ranges the provider had no bars for, e.g. trading halts
+    unavailable_ranges_collection: str = "_unavailable_ranges"
+    # Derived collections of daily indicators and standard window metrics
+    indicators_collection: str = "_indicators"
+    window_metrics_collection: str = "_window_metrics"
+    # Per symbol state of the incremental indicator engine
+    indicator_state_collection: str = "_indicator_state"
+    # Fitted clustering of the universe serving /recommendation, retrained
+    # after ingestion and reloaded by other workers this often
+    recommendation_collection: str = "_recommendation_model"
+    recommendation_refresh_seconds: int = 300
+    # Rolling return correlations of the universe, written as a float32
+    # matrix. A relative correlation_dir is inside the mlservice directory.
+    correlation_dir: str = "artifacts/correlation"
+    correlation_window: int = 60
+    correlation_min_periods: int = 20
+    # Incremental updates between rebuilds, bounding floating point drift
+    correlation_rebuild_every: int = 250
+    # Bars moving more than this fraction in a day are flagged as outliers
+    outlier_return: float = 0.25
+    # Trading days re-validated for gaps after every scheduled ingestion
+    validation_lookback_days: int = 30
+
+    # In-process cache of metrics results, keyed on the symbol's data version
+    metrics_cache_size: int = 4096
+    metrics_cache_ttl_seconds: int = 6 * 3600
+    # Rendered chart images kept in memory, and the number of most requested
+    # charts rendered again right after ingestion (0 disables pre-rendering)
+    chart_cache_bytes: int = 64 * 1024 * 1024
+    chart_cache_ttl_seconds: int = 24 * 3600
+    chart_prerender_count: int = 50
+
+    # Threads running blocking Mongo reads and CPU bound work of async routes
+    data_executor_workers: int = 16
+    compute_executor_workers: int = 4
+    # "thread" or "process" pool for CPU heavy jobs, 0 processes uses every core
+    compute_backend: str = "thread"
+    compute_processes: int = 0
+    compute_timeout_seconds: float = 60.0
+    compute_start_method: str = "spawn"
+    # Charts rendered in parallel, on threads or processes per compute_backend
+    render_workers: int = 4
+    # Default chart size in inches, resolution and image format (png, svg, webp)
+    chart_width: float = 10.0
+    chart_height: float = 5.0
+    chart_dpi: int = 100
+    chart_format: str = "png"
+
+    # Market whose calendar and timezone drive the ingestion schedule
+    market_name: str = "Borsa Istanbul"
+    # Run incremental ingestion inside the service, this long after the close
+    scheduler_enabled: bool = True
+    ingestion_delay_minutes: int = 20
+    # Retry interval when symbols failed in the last run
+    scheduler_retry_minutes: int = 30
+    # Only the holder of this lease ingests, across workers and replicas
+    lease_collection: str = "_locks"
+    ingestion_lease_seconds: int = 1800
+
     # class Config:
     #     env_file = "../.env.mlservice"
 
@@ -1,4 +1,7 @@
-from pymongo import MongoClient
+import threading
+from typing import Optional
+
+from pymongo import MongoClient, monitoring
 
 from .config import settings_api
 
@@ -6,3 +9,109 @@ from .config import settings_api
 
 
 mongo_uri = f"{settings_api.mongo_url}"
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Counts connection pool events of the application client.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failed = 0
+        self.pool_cleared = 0
+
+    def _inc(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open_connections": self.created - self.closed,
+                "in_use": self.checked_out - self.checked_in,
+                "created": self.created,
+                "closed": self.closed,
+                "checked_out": self.checked_out,
+                "checkout_failed": self.checkout_failed,
+                "pool_cleared": self.pool_cleared,
+                "max_pool_size": settings_api.mongo_max_pool_size,
+            }
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        self._inc("pool_cleared")
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        self._inc("created")
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self._inc("closed")
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        self._inc("checkout_failed")
+
+    def connection_checked_out(self, event) -> None:
+        self._inc("checked_out")
+
+    def connection_checked_in(self, event) -> None:
+        self._inc("checked_in")
+
+
+pool_stats = PoolStats()
+
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """
+    Returns the application wide MongoClient, created on first use.
+
+    MongoClient is thread safe and pools its connections, every component and
+    request shares this one instead of opening its own.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    mongo_uri,
+                    maxPoolSize=settings_api.mongo_max_pool_size,
+                    minPoolSize=settings_api.mongo_min_pool_size,
+                    connectTimeoutMS=settings_api.mongo_connect_timeout_ms,
+                    serverSelectionTimeoutMS=settings_api.mongo_server_selection_timeout_ms,
+                    socketTimeoutMS=settings_api.mongo_socket_timeout_ms,
+                    readPreference=settings_api.mongo_read_preference,
+                    event_listeners=[pool_stats],
+                )
+    return _client
+
+
+def close_client() -> None:
+    """
+    Closes the application wide MongoClient.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
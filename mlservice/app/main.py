@@ -1,9 +1,41 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from .routers import metrics,charts,recommendation
+from .routers import metrics,charts,recommendation,health,correlation
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings_api
+from .database import close_client, get_client
+from .scheduler import IngestionScheduler
+from .utils.compute_pool import compute_pool, render_pool
+from .utils.executor import compute_executor, data_executor, render_executor
+from .utils.logger import logging
+from .utils.recommendation_model import active_model
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled MongoClient shared by every request and component
+    client = get_client()
+    # Recommendations are served from the stored clustering
+    try:
+        active_model.refresh(client.stockdata)
+    except Exception as e:
+        logging.warning(f"Recommendation model not loaded: {e}")
+    # Keeps stock data fresh after every market close
+    scheduler = IngestionScheduler(client)
+    if settings_api.scheduler_enabled:
+        scheduler.start()
+    yield
+    scheduler.stop(timeout=5)
+    compute_pool.shutdown()
+    render_pool.shutdown()
+    data_executor.shutdown()
+    compute_executor.shutdown()
+    render_executor.shutdown()
+    close_client()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 # About CORS
 # list of URLs api can talk. if all origins = ["*"]
 origins = ["*"]
@@ -19,8 +51,10 @@ app.add_middleware(
 app.include_router(metrics.router)
 app.include_router(charts.router)
 app.include_router(recommendation.router)
+app.include_router(health.router)
+app.include_router(correlation.router)
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app,host=f"{settings_api.app_host}",port=settings_api.app_port)
\ No newline at end of file
+    uvicorn.run(app,host=f"{settings_api.app_host}",port=settings_api.app_port)
@@ -1,17 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
 from datetime import datetime
 from typing import Optional
-from ..components.stage02get_data import CompanyMetrics
-from ..database import mongo_uri
-from fastapi.responses import StreamingResponse
-import matplotlib.pyplot as plt
-import pandas as pd
-import io
+from ..database import get_client
+from ..utils.cache import chart_cache
+from ..config import settings_api
+from ..utils.charting import (ChartStyle, chart_demand, chart_etag, chart_key, render_close_chart,
+                              render_overlay_chart, render_sparkline_sheet)
+from ..utils.compute_pool import render_pool
+from ..utils.executor import compute_executor, data_executor
+from ..utils.manifest import IngestionManifest
+from ..utils.series import encode_series
+from ..utils.utils import load_price_columns, load_price_panel
+from fastapi.responses import Response
+from pymongo import MongoClient
+import asyncio
 
 # This API is responsible for returning a chart related to customer's company shares for a period of time.
 
 router = APIRouter(prefix="/charts", tags=["charts"])
 
+# Price fields a client can request from /charts/series
+SERIES_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+# Symbols drawn by one /charts/portfolio request
+PORTFOLIO_MAX_SYMBOLS = 100
+# Default size of one /charts/portfolio sparkline, in inches
+SPARKLINE_WIDTH = 2.0
+SPARKLINE_HEIGHT = 0.6
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
 
 @router.get("/", status_code=status.HTTP_200_OK)
 async def get_company_charts(
@@ -20,15 +42,48 @@ async def get_company_charts(
     start_date: Optional[str] = Query(datetime.today().strftime("%Y-%m-%d"),
                                       lt=datetime.today().strftime("%Y-%m-%d"),
                                       description="Stock symbol of the company"),
+    chart_format: str = Query(default=settings_api.chart_format,
+                              description="Image format: png, svg or webp"),
+    width: float = Query(default=settings_api.chart_width, gt=0, le=20,
+                         description="Width in inches"),
+    height: float = Query(default=settings_api.chart_height, gt=0, le=20,
+                          description="Height in inches"),
+    dpi: int = Query(default=settings_api.chart_dpi, gt=0, le=300,
+                     description="Resolution in dots per inch"),
+    if_none_match: Optional[str] = Header(default=None),
+    client: MongoClient = Depends(get_client),
 ):
+    """
+    Closing price chart of a company as a PNG, SVG or WebP image.
+
+    Charts are cached per data version of the symbol. Responses carry a
+    strong ETag, a request whose If-None-Match holds it gets 304 Not
+    Modified until bars of the symbol are written again.
+    """
+    try:
+        style = ChartStyle(width, height, dpi, chart_format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Initialize the CompanyMetrics instance
-    cm = CompanyMetrics(mongo_uri)
+    if style == ChartStyle():
+        # Only charts in the default style are pre-rendered
+        chart_demand.record(symbol, start_date)
+    version = await data_executor.run(
+        IngestionManifest(client.stockdata).data_version, symbol)
+    key = chart_key(symbol, version, start_date, style)
+    # Symbols outside the manifest have no data version to validate against
+    headers = {"ETag": chart_etag(key), "Cache-Control": "no-cache"} if version else {}
+    if version and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-    # Attempt to calculate the company metrics
+    image = chart_cache.get(key) if version else None
+    if image is not None:
+        return Response(image, media_type=style.media_type, headers=headers)
+
+    # Attempt to load the closing prices, oldest first
     try:
-        data = cm.calculate_company_metrics(
-            symbol, start_date, return_data=True)
+        prices = await data_executor.run(
+            load_price_columns, client, symbol, start_date, ["Close"])
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -40,22 +95,143 @@ async def get_company_charts(
             detail="An error occurred while calculating data."
         )
 
-    data['_id'] = pd.to_datetime(data['_id'])
-
-    # Plotting the data
-    plt.figure(figsize=(10, 5))
-    plt.plot(data['_id'], data['Close'], marker='o')
-    plt.title(f'Closing Prices Since {start_date} for Company {symbol}')
-    plt.xlabel('Date')
-    plt.ylabel('Closing Price')
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    plt.tight_layout()
-
-    # Save the plot to a bytes buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close()
-
-    return StreamingResponse(buf, media_type="image/png")
+    # Rendering runs on the compute pool, prices are passed as arrays
+    try:
+        image = await render_pool.run(
+            render_close_chart, symbol, start_date, style,
+            arrays={"dates": prices.dates, "Close": prices["Close"]})
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Rendering the chart took too long.")
+
+    if version:
+        chart_cache.set(key, image)
+    return Response(image, media_type=style.media_type, headers=headers)
+
+
+@router.get("/series", status_code=status.HTTP_200_OK)
+async def get_company_series(
+    symbol: str = Query(default="ASELS.IS",
+                        description="Stock symbol of the company"),
+    start_date: str = Query(description="First date of the series (%Y-%m-%d)"),
+    fields: str = Query(default="Close",
+                        description="Comma separated price fields, the first drives downsampling"),
+    max_points: Optional[int] = Query(default=None, ge=3, le=10000,
+                                      description="Downsample to this many points with LTTB"),
+    delta: bool = Query(default=False,
+                        description="Delta encode dates and values"),
+    decimals: int = Query(default=4, ge=0, le=8,
+                          description="Values are rounded to this many decimals"),
+    client: MongoClient = Depends(get_client),
+):
+    """
+    Price series of a company as compact columns, for clients that render
+    charts themselves.
+
+    "dates" are days since 1970-01-01 and "values" holds one column per
+    field, null where a bar has no value. With ``delta`` every column starts
+    with its first value followed by the differences between consecutive
+    present values.
+    """
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in SERIES_FIELDS]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields {unknown}, expected any of {SERIES_FIELDS}")
+
+    try:
+        prices = await data_executor.run(
+            load_price_columns, client, symbol, start_date, requested)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while loading data."
+        )
+
+    series = await compute_executor.run(
+        encode_series, {"dates": prices.dates, **prices.values}, max_points, delta, decimals)
+    return {"symbol": symbol, "start_date": start_date, "fields": requested, **series}
+
+
+@router.get("/portfolio", status_code=status.HTTP_200_OK)
+async def get_portfolio_chart(
+    symbols: str = Query(description="Comma separated stock symbols"),
+    start_date: str = Query(description="First date (%Y-%m-%d)"),
+    end_date: Optional[str] = Query(default=None,
+                                    description="Last date, exclusive (%Y-%m-%d)"),
+    mode: str = Query(default="overlay",
+                      description="overlay: one rebased chart, sparklines: one sprite sheet"),
+    columns: int = Query(default=4, ge=1, le=20,
+                         description="Sparklines per row of the sprite sheet"),
+    chart_format: str = Query(default=settings_api.chart_format,
+                              description="Image format: png, svg or webp"),
+    width: Optional[float] = Query(default=None, gt=0, le=20,
+                                   description="Width in inches, of one cell for sparklines"),
+    height: Optional[float] = Query(default=None, gt=0, le=20,
+                                    description="Height in inches, of one cell for sparklines"),
+    dpi: int = Query(default=settings_api.chart_dpi, gt=0, le=300,
+                     description="Resolution in dots per inch"),
+    client: MongoClient = Depends(get_client),
+):
+    """
+    Chart of many companies from one batched history load and one render.
+
+    The "overlay" mode draws every close rebased to 100 at its first date.
+    The "sparklines" mode returns a sprite sheet of one small chart per
+    symbol. Cell ``i`` is at row ``i // columns`` and column ``i % columns``,
+    and the X-Sprite-* headers describe the grid.
+    """
+    requested = list(dict.fromkeys(symbol.strip() for symbol in symbols.split(",") if symbol.strip()))
+    if not requested or len(requested) > PORTFOLIO_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {PORTFOLIO_MAX_SYMBOLS} symbols are required.")
+    if mode not in ("overlay", "sparklines"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown mode {mode}, expected overlay or sparklines")
+
+    sparklines = mode == "sparklines"
+    try:
+        style = ChartStyle(
+            width or (SPARKLINE_WIDTH if sparklines else settings_api.chart_width),
+            height or (SPARKLINE_HEIGHT if sparklines else settings_api.chart_height),
+            dpi, chart_format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        prices, found = await data_executor.run(
+            load_price_panel, client, requested, start_date, end_date)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while loading data."
+        )
+    if not found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No data found for {requested} since {start_date}")
+
+    try:
+        if sparklines:
+            image = await render_pool.run(
+                render_sparkline_sheet, found, columns, style, arrays=prices)
+        else:
+            image = await render_pool.run(
+                render_overlay_chart, found, start_date, style, arrays=prices)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Rendering the chart took too long.")
+
+    headers = {}
+    if sparklines:
+        headers = {
+            "X-Sprite-Symbols": ",".join(found),
+            "X-Sprite-Columns": str(columns),
+            "X-Sprite-Cell": f"{round(style.width * style.dpi)}x{round(style.height * style.dpi)}",
+        }
+    return Response(image, media_type=style.media_type, headers=headers)
@@ -0,0 +1,63 @@
+from itertools import combinations
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, status
+
+from ..utils.correlation import correlation_matrix
+
+router = APIRouter(prefix="/correlation", tags=["correlation"])
+
+
+def _require_matrix() -> None:
+    if not correlation_matrix.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The correlation matrix is not built yet.")
+
+
+@router.get("/similar", status_code=status.HTTP_200_OK)
+async def get_similar_symbols(
+    symbol: str = Query(default="ASELS.IS", description="Stock symbol of the company"),
+    k: int = Query(default=10, ge=1, le=100, description="Number of symbols to return"),
+    lowest: bool = Query(default=False,
+                         description="Return the least correlated symbols instead"),
+):
+    """
+    Symbols whose daily returns move most like those of ``symbol`` over the
+    rolling correlation window, a lookup in the memory mapped matrix.
+    """
+    _require_matrix()
+    try:
+        similar = correlation_matrix.top_k(symbol, k, lowest)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No correlations found for {symbol}")
+    return {
+        "symbol": symbol,
+        "as_of": correlation_matrix.last_date,
+        "similar": [{"symbol": peer, "correlation": value} for peer, value in similar],
+    }
+
+
+@router.get("/diversification", status_code=status.HTTP_200_OK)
+async def get_diversification(
+    symbols: str = Query(description="Comma separated stock symbols of the holdings"),
+):
+    """
+    Pairwise return correlations of a set of holdings and their mean, lower
+    means a more diversified set.
+    """
+    _require_matrix()
+    requested = list(dict.fromkeys(symbol.strip() for symbol in symbols.split(",") if symbol.strip()))
+    known, matrix = correlation_matrix.submatrix(requested)
+    pairs = [matrix[i, j] for i, j in combinations(range(len(known)), 2)
+             if not np.isnan(matrix[i, j])]
+    return {
+        "symbols": known,
+        "unknown": [symbol for symbol in requested if symbol not in known],
+        "as_of": correlation_matrix.last_date,
+        "mean_correlation": round(float(np.mean(pairs)), 4) if pairs else None,
+        "matrix": [[None if np.isnan(value) else round(float(value), 4) for value in row]
+                   for row in matrix],
+    }
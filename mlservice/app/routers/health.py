@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, status
+from pymongo import MongoClient
+
+from ..database import get_client, pool_stats
+from ..utils.cache import chart_cache, metrics_cache
+from ..utils.compute_pool import compute_pool, render_pool
+from ..utils.executor import compute_executor, data_executor, render_executor
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/", status_code=status.HTTP_200_OK)
+async def get_health(client: MongoClient = Depends(get_client)):
+    """
+    Connection pool statistics of the shared MongoDB client, hit/miss
+    counters of the metrics and chart caches and load of the blocking work executors.
+    """
+    return {
+        "mongo_pool": pool_stats.snapshot(),
+        "metrics_cache": metrics_cache.stats(),
+        "chart_cache": chart_cache.stats(),
+        "executors": {"data": data_executor.stats(),
+                      "compute": compute_executor.stats(),
+                      "render": render_executor.stats()},
+        "compute_pool": compute_pool.stats(),
+        "render_pool": render_pool.stats(),
+        "mongo_nodes": [f"{host}:{port}" for host, port in client.nodes],
+    }
@@ -1,11 +1,18 @@
+import asyncio
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
-from ..components.stage02get_data import CompanyMetrics
-from ..database import mongo_uri
-from ..utils.utils import sanitize_for_json
+from ..components.stage02get_data import CompanyMetrics, matrix_metrics_job
+from ..database import get_client
+from ..utils.compute_pool import compute_pool
+from ..utils.executor import compute_executor, data_executor
+from ..utils.indicators import IndicatorPlan, available_indicators
+from ..utils.indicator_store import STANDARD_WINDOWS, window_start_date
+from ..utils.manifest import IngestionManifest
+from ..utils.utils import expected_last_date, sanitize_for_json
+from pymongo import MongoClient
 
 # Analytics calculations are based on transactions(both investment and divestment) made in specified date interval
 # if a divestment is included in specified interval; yet associated investment is before that date; such
@@ -21,20 +28,43 @@ async def get_company_metrics(
     symbol: str = Query(default="ASELS.IS",
                         description="Stock symbol of the company"),
     start_date: Optional[str] = Query(
-        datetime.today().strftime("%Y-%m-%d"),
+        None,
         lt=datetime.today().strftime("%Y-%m-%d"),
-        description="Will calculate metrics starting from this date",
+        description="Will calculate metrics starting from this date, today when neither start_date nor window is given",
+    ),
+    window: Optional[str] = Query(
+        None,
+        description=f"Standard window ({', '.join(STANDARD_WINDOWS)}) ending at the last session, overrides start_date",
     ),
+    indicators: List[str] = Query(
+        default=[], description="Indicators to calculate, the default metrics when empty"),
+    client: MongoClient = Depends(get_client),
 ):
 
+    if window is not None:
+        if window not in STANDARD_WINDOWS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Window must be one of {list(STANDARD_WINDOWS)}")
+        start_date = window_start_date(window, expected_last_date())
+    elif start_date is None:
+        # Default of the endpoint before windows existed
+        start_date = datetime.today().strftime("%Y-%m-%d")
+
     # if start_date >= datetime.today().strftime("%Y-%m-%d"):
     #     raise HTTPException(
     #         status_code=status.HTTP_400_BAD_REQUEST,
     #         detail="Start date cannot be in the future."
     #     )
 
+    try:
+        IndicatorPlan(indicators)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Initialize the CompanyMetrics instance
-    cm = CompanyMetrics(mongo_uri)
+    cm = await data_executor.run(CompanyMetrics, client)
 
     if symbol not in cm.symbols_list:
         raise HTTPException(
@@ -42,7 +72,9 @@ async def get_company_metrics(
 
     # Attempt to calculate the company metrics
     try:
-        metrics = cm.calculate_company_metrics(symbol, start_date)
+        # Mongo reads and pandas work run off the event loop
+        metrics = await compute_executor.run(
+            cm.calculate_company_metrics, symbol, start_date, indicators=indicators or None)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -54,3 +86,93 @@ async def get_company_metrics(
     response = sanitize_for_json(metrics)
 
     return response
+
+
+@router.get("/batch", status_code=status.HTTP_200_OK)
+async def get_batch_company_metrics(
+    symbols: List[str] = Query(
+        default=[], description="Stock symbols of the companies, every company when empty"),
+    start_date: Optional[str] = Query(
+        datetime.today().strftime("%Y-%m-%d"),
+        lt=datetime.today().strftime("%Y-%m-%d"),
+        description="Will calculate metrics starting from this date",
+    ),
+    indicators: List[str] = Query(
+        default=[], description="Indicators to calculate, the default metrics when empty"),
+    client: MongoClient = Depends(get_client),
+):
+    """
+    Returns the metrics of many companies, calculated with one query and one
+    pass over their prices. Symbols without data since ``start_date`` are
+    left out of the response.
+    """
+    cm = await data_executor.run(CompanyMetrics, client)
+
+    symbols = symbols or cm.symbols_list
+    unknown = sorted(set(symbols) - set(cm.symbols_list))
+    if unknown:
+        raise HTTPException(
+            status_code=404, detail=f"Tickers are not in company list: {unknown}")
+
+    try:
+        plan = IndicatorPlan(indicators)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        if plan.pushdown:
+            # Answered by a MongoDB aggregation, no bars leave the database
+            metrics = await data_executor.run(
+                cm.calculate_batch_metrics, symbols, start_date, plan.indicators)
+        else:
+            prices, columns = await data_executor.run(
+                cm.load_price_arrays, symbols, start_date, plan.fields)
+            metrics = await compute_pool.run(
+                matrix_metrics_job, columns, start_date, plan.indicators, arrays=prices)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Calculating metrics took too long.")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while calculating metrics.",
+        )
+
+    return sanitize_for_json([metrics[symbol] for symbol in symbols if symbol in metrics])
+
+
+@router.get("/indicators", status_code=status.HTTP_200_OK)
+async def get_indicators():
+    """
+    Lists the indicators that can be requested, with their descriptions.
+    """
+    return available_indicators()
+
+
+@router.get("/freshness", status_code=status.HTTP_200_OK)
+async def get_data_freshness(client: MongoClient = Depends(get_client)):
+    """
+    Lists symbols whose stored prices are behind the expected date or whose
+    last ingestion failed.
+    """
+    return await data_executor.run(_data_freshness, client)
+
+
+def _data_freshness(client: MongoClient) -> dict:
+    expected_date = expected_last_date()
+    manifest = IngestionManifest(client.stockdata)
+    latest_date = manifest.latest_date()
+    stale = manifest.stale_symbols(expected_date)
+
+    stale = stale.reset_index()[["symbol", "last_date", "status", "error"]]
+    return sanitize_for_json({
+        "expected_date": expected_date,
+        "latest_date": latest_date,
+        "stale_count": len(stale),
+        "stale": stale.astype(object).where(stale.notna(), None).to_dict(orient="records"),
+    })
@@ -1,11 +1,9 @@
-from datetime import date, datetime
-from typing import Optional
-
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pymongo import MongoClient
 
-from ..components.stage02get_data import CompanyMetrics
-from ..database import mongo_uri
-from ..utils.utils import get_data_as_data_frame, sanitize_for_json
+from ..database import get_client
+from ..utils.executor import data_executor
+from ..utils.recommendation_model import active_model
 
 router = APIRouter(prefix="/recommendation", tags=["recommendation"])
 
@@ -13,34 +11,35 @@ router = APIRouter(prefix="/recommendation", tags=["recommendation"])
 @router.get("/", status_code=status.HTTP_200_OK)
 async def get_company_data(
     symbol: str = Query(default="ASELS.IS", description="Stock symbol of the company"),
-    start_date: Optional[str] = Query(
-        datetime.today().strftime("%Y-%m-%d"),
-        lt=datetime.today().strftime("%Y-%m-%d"),
-        description="Will get company data starting from this date!",
-    ),
+    count: int = Query(default=3, ge=1, le=10,
+                       description="Number of companies to recommend"),
+    client: MongoClient = Depends(get_client),
 ):
-    cm = CompanyMetrics(mongo_uri)
-    company_data = []
-
-    for ticker in cm.symbols_list:
-        data = cm.calculate_company_metrics(ticker, start_date)
-        company_data.append(data)
-
-    print(company_data)
-    print(type(company_data))
-
-    # TODO: Fetch data for every company with close prices (Last 365 rows for each company)
-
-    # TODO: Calculate additional metrics for companies
-
-    # Some Metrics that are used in metrics.py can be used
-
-    # Todo: İmpute missing values etc (data cleaning)
-
-    # TODO: create clustering with optimal K clusters
-
-    # TODO: Randomly select 3 company where symbol is in same cluster
-
-    # TODO: Return selected 3 company symbols as recommendation
-
-    return None
+    """
+    Recommends the companies closest to ``symbol`` inside its cluster.
+
+    The universe is clustered on indicator features after every ingestion,
+    so this is a lookup in the model loaded at start up.
+    """
+    model = active_model.model
+    if active_model.needs_refresh():
+        # Another worker may have trained a newer model
+        model = await data_executor.run(active_model.refresh, client.stockdata)
+    if model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The recommendation model is not trained yet.")
+
+    recommendations = model.recommend(symbol, count)
+    if recommendations is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{symbol} has too little recent history to recommend peers for.")
+
+    return {
+        "symbol": symbol,
+        "cluster": model.cluster(symbol),
+        "recommendations": recommendations,
+        "clusters": model.k,
+        "trained_at": model.trained_at,
+    }
@@ -0,0 +1,122 @@
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from pymongo import MongoClient
+
+from .components.stage01data_ingestion import IngestionSummary, StockIngestion
+from .components.stage03data_validation import DataValidation
+from .components.stage04indicator_materialization import IndicatorMaterialization
+from .components.stage05chart_prerender import ChartPrerender
+from .components.stage06recommendation_model import RecommendationTraining
+from .components.stage07correlation import CorrelationUpdate
+from .config import settings_api
+from .utils.lease import MongoLease
+from .utils.correlation import correlation_matrix
+from .utils.logger import logging
+from .utils.recommendation_model import RecommendationModelStore
+from .utils.trading_calendar import TradingCalendar, get_trading_calendar
+from .utils.utils import is_up_to_date
+
+INGESTION_LEASE = "stock_ingestion"
+
+
+def run_incremental_ingestion(client: MongoClient) -> Optional[IngestionSummary]:
+    """
+    Ingests new bars unless the database is up to date or another worker
+    holds the ingestion lease.
+
+    Returns:
+        IngestionSummary: Summary of the run, None if nothing was ingested.
+    """
+    lease = MongoLease(client.stockdata, INGESTION_LEASE)
+    with lease as acquired:
+        if not acquired:
+            logging.info(
+                f"Ingestion lease is held by {lease.holder()}, skipping.")
+            return None
+        if is_up_to_date(client):
+            logging.info("Stock data is up to date, skipping ingestion.")
+            summary = None
+        else:
+            summary = StockIngestion(client).initiate_stock_ingestion()
+
+            # Fill trading days a partial provider response left out
+            DataValidation(client).validate_recent(refetch=True)
+
+        # No-op for symbols whose windows are already current
+        IndicatorMaterialization(client).materialize()
+        if summary is not None and settings_api.chart_prerender_count:
+            # Most requested charts are ready before the first refresh,
+            # best effort, a failure only costs a render on request
+            try:
+                ChartPrerender(client).prerender()
+            except Exception as e:
+                logging.warning(f"Chart pre-rendering failed: {e}")
+
+        if summary is not None or RecommendationModelStore(client.stockdata).trained_at() is None:
+            # Clusters follow the new closes, served models stay usable on failure
+            try:
+                RecommendationTraining(client).train()
+            except Exception as e:
+                logging.warning(f"Recommendation training failed: {e}")
+
+        if summary is not None or not correlation_matrix.available:
+            try:
+                CorrelationUpdate(client).update()
+            except Exception as e:
+                logging.warning(f"Correlation update failed: {e}")
+        return summary
+
+
+class IngestionScheduler:
+    """
+    Background thread running incremental ingestion shortly after every
+    session close of the market calendar, and once at start up.
+    """
+
+    def __init__(self, client: MongoClient, calendar: Optional[TradingCalendar] = None) -> None:
+        self.client = client
+        self.calendar = calendar or get_trading_calendar()
+        self.delay = timedelta(minutes=settings_api.ingestion_delay_minutes)
+        self.retry = timedelta(minutes=settings_api.scheduler_retry_minutes)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def seconds_until_next_run(self, retry: bool = False) -> float:
+        now = self.calendar.now()
+        next_run = self.calendar.next_close(now, self.delay) + self.delay
+        if retry:
+            next_run = min(next_run, now + self.retry)
+        return max((next_run - now).total_seconds(), 0)
+
+    def _run_once(self) -> bool:
+        """
+        Runs ingestion, returns True if some symbols failed and need a retry.
+        """
+        try:
+            summary = run_incremental_ingestion(self.client)
+            return bool(summary and summary.failed)
+        except Exception as e:
+            logging.error(f"Scheduled ingestion failed: {e}")
+            return True
+
+    def _loop(self) -> None:
+        retry = self._run_once()
+        while not self._stop.wait(self.seconds_until_next_run(retry)):
+            retry = self._run_once()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="ingestion-scheduler", daemon=True)
+        self._thread.start()
+        logging.info("Ingestion scheduler started.")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        logging.info("Ingestion scheduler stopped.")
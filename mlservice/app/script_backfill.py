@@ -0,0 +1,47 @@
+from .components.stage01data_ingestion import StockIngestion
+from .components.stage04indicator_materialization import IndicatorMaterialization
+from .config import settings_api
+from .database import close_client, get_client
+from .utils.exception import CustomException
+import pandas as pd
+import argparse
+import sys
+
+# Backfills price history in checkpointed date chunks. An interrupted run
+# continues with the chunks it has not completed when started again.
+#
+#   python3 -m app.script_backfill --start 2015-01-01
+#   python3 -m app.script_backfill --symbols-file new_market.csv --chunk-days 180
+
+
+parser = argparse.ArgumentParser(description="Backfill historical stock data")
+parser.add_argument("--start", default=settings_api.history_start,
+                    help="First date of the backfill (YYYY-MM-DD)")
+parser.add_argument("--symbols", nargs="*",
+                    help="Symbols to backfill, defaults to the symbols list")
+parser.add_argument("--symbols-file",
+                    help="CSV file with a Symbol column of symbols to backfill")
+parser.add_argument("--chunk-days", type=int,
+                    default=settings_api.backfill_chunk_days)
+parser.add_argument("--workers", type=int,
+                    default=settings_api.ingestion_workers)
+args = parser.parse_args()
+
+symbols = args.symbols
+if args.symbols_file:
+    symbols = (symbols or []) + list(pd.read_csv(args.symbols_file)["Symbol"])
+
+
+stock_ingestion = StockIngestion(get_client())
+try:
+    summary = stock_ingestion.ingest_all_data(
+        args.start, symbols, chunk_days=args.chunk_days, max_workers=args.workers)
+    print(summary)
+    # Older bars change cumulative returns, rewrite the derived series
+    IndicatorMaterialization(get_client()).materialize(symbols, force=True)
+    if summary.failed:
+        print(f"Failed symbols: {sorted(summary.failed)}")
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
@@ -1,7 +1,5 @@
-from .components.stage01data_ingestion import StockIngestion
-from .components.stage02get_data import CompanyMetrics
-from .database import mongo_uri
-from .utils.utils import is_up_to_date
+from .database import close_client, get_client
+from .scheduler import run_incremental_ingestion
 from .utils.exception import CustomException
 import sys
 
@@ -9,17 +7,17 @@ comp_filter = "ASELS.IS"
 start_date = "2024-05-05"
 
 
-if not is_up_to_date(mongo_uri):
-    try:
-        stock_ingestion = StockIngestion(mongo_uri)
-        #stock_ingestion.ingest_all_data("2024-06-06")
-        stock_ingestion.initiate_stock_ingestion()
-    except Exception as e:
-        raise CustomException(e, sys)
+try:
+    # Skips when up to date or when the service scheduler is ingesting
+    run_incremental_ingestion(get_client())
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
 
 
 # try:
-#     comp_metrics = CompanyMetrics(mongo_uri)
+#     comp_metrics = CompanyMetrics(get_client())
 #     metrics = comp_metrics.calculate_company_metrics(
 #         comp_filter, start_date)
 #     # data = metrics[comp_filter]
@@ -0,0 +1,40 @@
+import pandas as pd
+import argparse
+import sys
+
+from .database import close_client, get_client
+from .utils.exception import CustomException
+from .utils.logger import logging
+from .utils.storage import PerSymbolStorage, get_storage
+
+# Copies the bars of the one-collection-per-symbol layout into the unified
+# (symbol, date) layout. Safe to run again, stored bars are not duplicated.
+#
+#   python3 -m app.script_migrate_storage --layout timeseries
+
+
+parser = argparse.ArgumentParser(
+    description="Migrate per-symbol collections into the unified bar storage")
+parser.add_argument("--layout", choices=["unified", "timeseries"],
+                    default="unified")
+args = parser.parse_args()
+
+
+client = get_client()
+try:
+    source = PerSymbolStorage(client.stockdata)
+    target = get_storage(client.stockdata, args.layout)
+
+    for symbol in source.symbols():
+        data = source.read([symbol])
+        if data.empty:
+            continue
+        data = data.drop(columns=["symbol"])
+        data["Date"] = pd.to_datetime(data.pop("_id"))
+        written = target.write(symbol, data)
+        logging.info(f"Migrated {symbol}: {written} bars written")
+        print(f"{symbol}: {written} bars written")
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
@@ -0,0 +1,23 @@
+from .components.stage06recommendation_model import RecommendationTraining
+from .database import close_client, get_client
+from .utils.exception import CustomException
+import sys
+
+# Clusters the symbol universe and stores the model serving /recommendation,
+# normally done by the scheduler after every ingestion.
+#
+#   python3 -m app.script_train_recommendations
+
+
+training = RecommendationTraining(get_client())
+try:
+    model = training.train()
+    if model is None:
+        print("Too few symbols with enough history, no model trained")
+    else:
+        print(f"{len(model.symbols)} symbols in {model.k} clusters, "
+              f"silhouette {model.silhouette}")
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
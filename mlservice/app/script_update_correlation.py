@@ -0,0 +1,25 @@
+from .components.stage07correlation import CorrelationUpdate
+from .database import close_client, get_client
+from .utils.exception import CustomException
+import argparse
+import sys
+
+# Advances the rolling correlation matrix by the dates ingested since its
+# last update, normally done by the scheduler after every ingestion.
+#
+#   python3 -m app.script_update_correlation --force
+
+
+parser = argparse.ArgumentParser(description="Update the universe correlation matrix")
+parser.add_argument("--force", action="store_true",
+                    help="Rebuild the matrix from the stored closes")
+args = parser.parse_args()
+
+
+correlation = CorrelationUpdate(get_client())
+try:
+    print(f"Correlation matrix of {correlation.update(force=args.force)} symbols written")
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
@@ -0,0 +1,33 @@
+from .components.stage03data_validation import DataValidation
+from .database import close_client, get_client
+from .utils.exception import CustomException
+import argparse
+import sys
+
+# Checks stored bars against the exchange calendar and re-fetches only the
+# missing trading days.
+#
+#   python3 -m app.script_validation --start 2015-01-01 --refetch
+
+
+parser = argparse.ArgumentParser(description="Validate stored stock data")
+parser.add_argument("--start", help="First date to validate (YYYY-MM-DD)")
+parser.add_argument("--symbols", nargs="*",
+                    help="Symbols to validate, defaults to every stored symbol")
+parser.add_argument("--refetch", action="store_true",
+                    help="Re-fetch the missing trading days")
+args = parser.parse_args()
+
+
+data_validation = DataValidation(get_client())
+try:
+    report = data_validation.validate(args.symbols, args.start)
+    print(report)
+    print(report.missing.to_string(index=False))
+    print(report.flags.groupby("flag").size().to_string())
+    if args.refetch and not report.missing.empty:
+        print(data_validation.refetch_missing(report))
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
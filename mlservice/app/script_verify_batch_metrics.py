@@ -0,0 +1,33 @@
+from .components.stage02get_data import CompanyMetrics
+from .database import close_client, get_client
+from .utils.exception import CustomException
+from .utils.indicators import INDICATORS
+import argparse
+import sys
+
+# Calculates metrics of many symbols in one batch and compares them with the
+# metrics of every symbol calculated alone, they must not depend on the
+# other symbols of the batch.
+#
+#   python3 -m app.script_verify_batch_metrics --start 2024-01-01
+
+
+parser = argparse.ArgumentParser(description="Verify batch metrics against single symbol metrics")
+parser.add_argument("--start", required=True, help="First date of the metrics (YYYY-MM-DD)")
+parser.add_argument("--symbols", nargs="*",
+                    help="Symbols to verify, defaults to the company list")
+args = parser.parse_args()
+
+
+company_metrics = CompanyMetrics(get_client())
+try:
+    symbols = args.symbols or company_metrics.symbols_list
+    # Every registered indicator, so no indicator is left unchecked
+    mismatched = company_metrics.verify_batch_metrics(symbols, args.start, list(INDICATORS))
+    print(f"{len(mismatched)} of {len(symbols)} symbols differ")
+    if mismatched:
+        print(" ".join(mismatched))
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
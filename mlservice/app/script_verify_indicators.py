@@ -0,0 +1,30 @@
+from .components.stage04indicator_materialization import IndicatorMaterialization
+from .database import close_client, get_client
+from .utils.exception import CustomException
+import argparse
+import sys
+
+# Recomputes the daily indicator series from the full stored history and
+# compares it with the series the incremental engine maintains.
+#
+#   python3 -m app.script_verify_indicators --repair
+
+
+parser = argparse.ArgumentParser(description="Verify incrementally computed indicators")
+parser.add_argument("--symbols", nargs="*",
+                    help="Symbols to verify, defaults to every stored symbol")
+parser.add_argument("--repair", action="store_true",
+                    help="Rebuild the series of symbols that differ")
+args = parser.parse_args()
+
+
+materialization = IndicatorMaterialization(get_client())
+try:
+    mismatched = materialization.verify(args.symbols, repair=args.repair)
+    print(f"{len(mismatched)} symbols differ")
+    if mismatched:
+        print(" ".join(mismatched))
+except Exception as e:
+    raise CustomException(e, sys)
+finally:
+    close_client()
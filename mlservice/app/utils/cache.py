@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from ..config import settings_api
+
+
+class VersionedCache:
+    """
+    Bounded LRU cache with a time to live, for results derived from the bars
+    of a single symbol.
+
+    Keys are (symbol, version, *rest) tuples where version is the symbol's
+    data version (``IngestionManifest.data_version``). A result stored under a newer
+    version evicts the entries of older versions of the same symbol, and
+    ``invalidate`` drops every entry of a symbol when its bars change.
+
+    ``maxsize`` bounds the total ``sizeof`` of the values, by default the
+    number of entries.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float,
+                 sizeof: Callable[[Any], int] = lambda value: 1) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self.sizeof = sizeof
+        self.currsize = 0
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any, int]]" = OrderedDict()
+        self._versions: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        """
+        Returns the cached value of ``key``, None when missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._pop(key)
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        symbol, version = key[0], key[1]
+        size = self.sizeof(value)
+        if size > self.maxsize:
+            return
+        with self._lock:
+            if self._versions.get(symbol, version) != version:
+                self._drop_symbol(symbol)
+            self._versions[symbol] = version
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, size)
+            self.currsize += size
+            while self.currsize > self.maxsize:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _pop(self, key: Tuple[Hashable, ...]) -> None:
+        self.currsize -= self._entries.pop(key)[2]
+
+    def _drop_symbol(self, symbol: Hashable) -> None:
+        stale = [key for key in self._entries if key[0] == symbol]
+        for key in stale:
+            self._pop(key)
+        self.evictions += len(stale)
+        self._versions.pop(symbol, None)
+
+    def invalidate(self, symbol: Hashable) -> None:
+        """
+        Drops every cached entry of ``symbol``.
+        """
+        with self._lock:
+            self._drop_symbol(symbol)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.currsize = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size": self.currsize,
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+# Results of CompanyMetrics.calculate_company_metrics
+metrics_cache = VersionedCache(settings_api.metrics_cache_size,
+                               settings_api.metrics_cache_ttl_seconds)
+# Rendered chart images, bounded by their total size in bytes
+chart_cache = VersionedCache(settings_api.chart_cache_bytes,
+                             settings_api.chart_cache_ttl_seconds, sizeof=len)
@@ -0,0 +1,237 @@
+import hashlib
+import io
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from ..config import settings_api
+
+# Charts tracked per pre-rendered chart, so newly requested ones can climb
+_DEMAND_HEADROOM = 4
+
+
+# Media type of every supported image format
+CHART_FORMATS = {"png": "image/png", "svg": "image/svg+xml", "webp": "image/webp"}
+
+# Fixed SVG element ids, the same chart always renders to the same bytes
+matplotlib.rcParams["svg.hashsalt"] = "mlservice"
+
+
+@dataclass(frozen=True)
+class ChartStyle:
+    """
+    Size, resolution and image format of a rendered chart.
+    """
+    # Inches
+    width: float = settings_api.chart_width
+    height: float = settings_api.chart_height
+    dpi: int = settings_api.chart_dpi
+    # "png", "svg" or "webp"
+    chart_format: str = settings_api.chart_format
+
+    def __post_init__(self) -> None:
+        if self.chart_format not in CHART_FORMATS:
+            raise ValueError(f"Unknown chart format {self.chart_format}, "
+                             f"expected any of {sorted(CHART_FORMATS)}")
+
+    @property
+    def media_type(self) -> str:
+        return CHART_FORMATS[self.chart_format]
+
+
+def chart_key(symbol: str, version: Optional[str], start_date: str,
+              style: Optional[ChartStyle] = None) -> Tuple[Hashable, ...]:
+    """
+    Cache key of a rendered chart, (symbol, data version, *rest) as the
+    versioned cache expects.
+    """
+    return (symbol, version, start_date, style or ChartStyle())
+
+
+def chart_etag(key: Tuple[Hashable, ...]) -> str:
+    """
+    Strong ETag of a chart. Rendering is deterministic, so the same key
+    always yields the same bytes and the tag is known before rendering.
+    """
+    return '"' + hashlib.sha1(repr(key).encode()).hexdigest() + '"'
+
+
+class ChartDemand:
+    """
+    Counts requests per (symbol, start_date) chart, so the most requested
+    charts can be rendered ahead of time after ingestion. Only the most
+    requested ``capacity`` charts are tracked.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(capacity, 1)
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, symbol: str, start_date: str) -> None:
+        with self._lock:
+            self._counts[(symbol, start_date)] += 1
+            if len(self._counts) > 2 * self.capacity:
+                self._counts = Counter(dict(self._counts.most_common(self.capacity)))
+
+    def most_common(self, n: int) -> List[Tuple[str, str]]:
+        """
+        Returns the (symbol, start_date) of the ``n`` most requested charts.
+        """
+        with self._lock:
+            return [chart for chart, _ in self._counts.most_common(n)]
+
+
+chart_demand = ChartDemand(settings_api.chart_prerender_count * _DEMAND_HEADROOM)
+
+class ChartRenderer:
+    """
+    Renders charts on ``matplotlib.figure.Figure`` objects with the Agg
+    canvas directly. Nothing goes through pyplot's global figure manager,
+    so renders on many threads run in parallel safely and skip its
+    per-figure bookkeeping.
+
+    Args:
+        style (ChartStyle, optional): Size, resolution and format, the
+            configured defaults when None.
+    """
+
+    def __init__(self, style: Optional[ChartStyle] = None) -> None:
+        self.style = style or ChartStyle()
+
+    def figure(self) -> Figure:
+        figure = Figure(figsize=(self.style.width, self.style.height), dpi=self.style.dpi)
+        FigureCanvasAgg(figure)
+        return figure
+
+    def to_bytes(self, figure: Figure) -> bytes:
+        buf = io.BytesIO()
+        # No creation date in SVG metadata, so identical charts are identical bytes
+        metadata = {"Date": None} if self.style.chart_format == "svg" else None
+        figure.savefig(buf, format=self.style.chart_format, dpi=self.style.dpi,
+                       metadata=metadata)
+        return buf.getvalue()
+
+    def close_chart(self, dates: np.ndarray, closes: np.ndarray,
+                    symbol: str, start_date: str) -> bytes:
+        """
+        Renders the closing prices of a company as a line chart.
+        """
+        figure = self.figure()
+        ax = figure.add_subplot()
+        ax.plot(dates, closes, marker='o')
+        ax.set_title(f'Closing Prices Since {start_date} for Company {symbol}')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Closing Price')
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.grid(True)
+        figure.tight_layout()
+        return self.to_bytes(figure)
+
+    def overlay_chart(self, dates: np.ndarray, closes: np.ndarray,
+                      symbols: List[str], start_date: str) -> bytes:
+        """
+        Renders the closes of many companies on one chart, each rebased to
+        100 at its first close so their performance compares directly.
+        """
+        figure = self.figure()
+        ax = figure.add_subplot()
+        for i, symbol in enumerate(symbols):
+            valid = ~np.isnan(closes[:, i])
+            if not valid.any():
+                continue
+            series = closes[valid, i]
+            ax.plot(dates[valid], series / series[0] * 100, label=symbol, linewidth=1.2)
+        ax.axhline(100, color="grey", linewidth=0.8, linestyle="--")
+        ax.set_title(f'Performance Since {start_date} (first close = 100)')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Rebased Close')
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.grid(True)
+        ax.legend(loc="upper left", fontsize="small", ncol=max(1, len(symbols) // 10))
+        figure.tight_layout()
+        return self.to_bytes(figure)
+
+    def sparkline_sheet(self, dates: np.ndarray, closes: np.ndarray,
+                        symbols: List[str], columns: int) -> bytes:
+        """
+        Renders one sparkline per company into a single sprite sheet.
+
+        The style's width and height are the size of one cell. Cell ``i``
+        is at row ``i // columns`` and column ``i % columns``, so clients
+        crop every sparkline without a separate layout.
+        """
+        rows = max(-(-len(symbols) // columns), 1)
+        figure = Figure(figsize=(self.style.width * columns, self.style.height * rows),
+                        dpi=self.style.dpi)
+        FigureCanvasAgg(figure)
+        for i, symbol in enumerate(symbols):
+            row, column = divmod(i, columns)
+            # Exact cell rectangle in figure fractions, with a small margin
+            ax = figure.add_axes([(column + 0.04) / columns, 1 - (row + 0.96) / rows,
+                                  0.92 / columns, 0.72 / rows])
+            ax.set_axis_off()
+            valid = ~np.isnan(closes[:, i])
+            if valid.any():
+                series = closes[valid, i]
+                color = "tab:green" if series[-1] >= series[0] else "tab:red"
+                ax.plot(dates[valid], series, color=color, linewidth=1)
+                change = (series[-1] / series[0] - 1) * 100
+                label = f"{symbol} {change:+.1f}%"
+            else:
+                label = symbol
+            ax.text(0, 1.02, label, transform=ax.transAxes, fontsize=7, va="bottom")
+        return self.to_bytes(figure)
+
+
+def render_close_chart(arrays: Dict[str, np.ndarray], symbol: str, start_date: str,
+                       style: Optional[ChartStyle] = None) -> bytes:
+    """
+    Renders the closing prices of a company as a line chart, a compute pool
+    job.
+
+    Args:
+        arrays (dict): "dates" (datetime64[D]) and "Close" arrays.
+        symbol (str): Stock symbol shown in the title.
+        start_date (str): Start date shown in the title.
+        style (ChartStyle, optional): Size, resolution and format.
+
+    Returns:
+        bytes: Image in the format of the style.
+    """
+    return ChartRenderer(style).close_chart(arrays["dates"], arrays["Close"], symbol, start_date)
+
+
+def render_overlay_chart(arrays: Dict[str, np.ndarray], symbols: List[str], start_date: str,
+                         style: Optional[ChartStyle] = None) -> bytes:
+    """
+    Renders the rebased closes of many companies on one chart, a compute
+    pool job.
+
+    Args:
+        arrays (dict): "dates" (datetime64[D]) and "Close" (dates x symbols).
+        symbols (List[str]): Symbol of every column.
+        start_date (str): Start date shown in the title.
+        style (ChartStyle, optional): Size, resolution and format.
+    """
+    return ChartRenderer(style).overlay_chart(arrays["dates"], arrays["Close"], symbols, start_date)
+
+
+def render_sparkline_sheet(arrays: Dict[str, np.ndarray], symbols: List[str], columns: int,
+                           style: Optional[ChartStyle] = None) -> bytes:
+    """
+    Renders a sprite sheet of one sparkline per company, a compute pool job.
+
+    Args:
+        arrays (dict): "dates" (datetime64[D]) and "Close" (dates x symbols).
+        symbols (List[str]): Symbol of every column.
+        columns (int): Sparklines per row.
+        style (ChartStyle, optional): Size of one cell, resolution and format.
+    """
+    return ChartRenderer(style).sparkline_sheet(arrays["dates"], arrays["Close"], symbols, columns)
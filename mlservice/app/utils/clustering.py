@@ -0,0 +1,133 @@
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+
+def impute_and_scale(features: np.ndarray, clip: float = 5.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Replaces missing values with their column median and standardizes every
+    column, clipping outliers so a single extreme symbol cannot dominate a
+    distance.
+
+    Args:
+        features (np.ndarray): symbols x features, NaN where missing.
+        clip (float): Scaled values are clipped to [-clip, clip].
+
+    Returns:
+        tuple: (scaled features, column medians, column means, column
+            standard deviations), the parameters that scale new rows alike.
+    """
+    features = np.where(np.isfinite(features), features, np.nan)
+    with np.errstate(all="ignore"):
+        medians = np.nan_to_num(np.nanmedian(features, axis=0))
+    filled = np.where(np.isnan(features), medians, features)
+    means = filled.mean(axis=0)
+    stds = filled.std(axis=0)
+    stds[stds == 0] = 1.0
+    return np.clip((filled - means) / stds, -clip, clip), medians, means, stds
+
+
+def squared_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """
+    Squared euclidean distance of every point to every center.
+    """
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, one matrix product for every pair
+    distances = ((points ** 2).sum(axis=1)[:, None] - 2 * points @ centers.T
+                 + (centers ** 2).sum(axis=1)[None, :])
+    return np.maximum(distances, 0)
+
+
+def _kmeans_plus_plus(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centers = [points[rng.integers(len(points))]]
+    closest = squared_distances(points, centers[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(points), p=closest / total) if total > 0 else rng.integers(len(points))
+        centers.append(points[index])
+        closest = np.minimum(closest, squared_distances(points, points[index][None, :])[:, 0])
+    return np.array(centers)
+
+
+def kmeans(points: np.ndarray, k: int, n_init: int = 5, max_iter: int = 100,
+           tol: float = 1e-6, seed: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Clusters points with Lloyd's k-means, k-means++ seeding and ``n_init``
+    restarts.
+
+    Args:
+        points (np.ndarray): samples x features.
+        k (int): Number of clusters.
+        n_init (int): Restarts, the run with the lowest inertia is kept.
+        max_iter (int): Iterations per restart.
+        tol (float): A restart stops when no center moves more than this.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        tuple: (centers k x features, label of every point, inertia).
+    """
+    rng = np.random.default_rng(seed)
+    best: Optional[Tuple[np.ndarray, np.ndarray, float]] = None
+    for _ in range(n_init):
+        centers = _kmeans_plus_plus(points, k, rng)
+        for _ in range(max_iter):
+            labels = squared_distances(points, centers).argmin(axis=1)
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, points)
+            # An emptied cluster keeps its previous center
+            moved = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+            shift = np.abs(moved - centers).max()
+            centers = moved
+            if shift <= tol:
+                break
+        distances = squared_distances(points, centers)
+        labels = distances.argmin(axis=1)
+        inertia = float(distances[np.arange(len(points)), labels].sum())
+        if best is None or inertia < best[2]:
+            best = (centers, labels, inertia)
+    return best
+
+
+def silhouette_score(points: np.ndarray, labels: np.ndarray) -> float:
+    """
+    Mean silhouette coefficient of a clustering, from one pairwise distance
+    matrix. Points alone in their cluster score 0.
+    """
+    k = labels.max() + 1
+    distances = np.sqrt(squared_distances(points, points))
+    one_hot = np.eye(k)[labels]
+    sizes = one_hot.sum(axis=0)
+    # Mean distance of every point to every cluster
+    means = distances @ one_hot / np.maximum(sizes, 1)
+    own = np.arange(len(points)), labels
+    # The point's own distance, 0, is left out of its cluster's mean
+    intra = means[own] * sizes[labels] / np.maximum(sizes[labels] - 1, 1)
+    means[own] = np.inf
+    means[:, sizes == 0] = np.inf
+    nearest = means.min(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(sizes[labels] > 1,
+                          (nearest - intra) / np.maximum(nearest, intra), 0.0)
+    return float(np.nan_to_num(scores).mean())
+
+
+def select_k(points: np.ndarray, candidates: Iterable[int], n_init: int = 5,
+             max_iter: int = 100, seed: Optional[int] = None) -> Tuple[int, np.ndarray, np.ndarray, float]:
+    """
+    Clusters points for every candidate K and keeps the clustering with the
+    highest silhouette score.
+
+    Returns:
+        tuple: (K, centers, labels, silhouette score).
+    """
+    best = None
+    for k in candidates:
+        if not 2 <= k < len(points):
+            continue
+        centers, labels, _ = kmeans(points, k, n_init, max_iter, seed=seed)
+        score = silhouette_score(points, labels)
+        if best is None or score > best[3]:
+            best = (k, centers, labels, score)
+    if best is None:
+        raise ValueError(f"No candidate K fits {len(points)} points")
+    return best
@@ -0,0 +1,229 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..config import settings_api
+from .executor import BoundedExecutor, compute_executor, render_executor
+
+# (shared memory name, shape, dtype) of an array handed to a worker process
+ArrayRef = Tuple[str, Tuple[int, ...], str]
+
+
+def _attach(refs: Dict[str, ArrayRef]) -> Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]:
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in refs.items():
+        # Workers share the parent's resource tracker, the parent unlinks
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return arrays, blocks
+
+
+def _run_job(func: Callable[..., Any], refs: Dict[str, ArrayRef], args: tuple) -> Any:
+    """
+    Entry point of a job in a worker process, maps the shared arrays and
+    calls ``func(arrays, *args)``.
+    """
+    arrays, blocks = _attach(refs)
+    try:
+        return func(arrays, *args)
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+class ComputePool:
+    """
+    Runs CPU bound jobs ``func(arrays, *args)`` for the async routes.
+
+    With the "process" backend jobs run in a pool of worker processes, so
+    universe wide work uses every core instead of contending for the GIL.
+    Price arrays are copied once into shared memory and mapped by the
+    worker rather than pickled, only the small arguments and the result
+    cross the process boundary. The "thread" backend runs the same jobs on
+    the thread pool given as ``executor``, the compute pool by default.
+
+    A job running longer than the timeout fails with asyncio.TimeoutError.
+    A running thread cannot be stopped, with the thread backend the job
+    keeps its executor slot until it returns. A running process cannot be
+    cancelled either, so with the process backend new jobs go to a fresh
+    pool while the other jobs of the old pool finish, then the old workers,
+    the stuck one included, are stopped.
+    """
+
+    def __init__(self, backend: str = settings_api.compute_backend,
+                 processes: int = settings_api.compute_processes,
+                 timeout: float = settings_api.compute_timeout_seconds,
+                 start_method: str = settings_api.compute_start_method,
+                 executor: BoundedExecutor = compute_executor) -> None:
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown compute backend {backend}, expected thread or process")
+        self.backend = backend
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self.start_method = start_method
+        self.executor = executor
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Unfinished jobs of every pool, and those whose caller timed out
+        self._pending: Dict[ProcessPoolExecutor, Set[Future]] = {}
+        self._timed_out: Dict[ProcessPoolExecutor, Set[Future]] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.running = 0
+        self.busy_seconds = 0.0
+        self.shared_bytes = 0
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context(self.start_method))
+            return self._pool
+
+    def _track(self, pool: ProcessPoolExecutor, future: Future) -> None:
+        with self._lock:
+            self._pending.setdefault(pool, set()).add(future)
+        future.add_done_callback(lambda done: self._untrack(pool, done))
+
+    def _untrack(self, pool: ProcessPoolExecutor, future: Future) -> None:
+        with self._lock:
+            self._pending.get(pool, set()).discard(future)
+            self._timed_out.get(pool, set()).discard(future)
+
+    def _retire(self, pool: ProcessPoolExecutor, future: Future) -> None:
+        """
+        Takes the pool of a timed out job out of service, other jobs of the
+        pool keep running and only the timed out job fails.
+        """
+        with self._lock:
+            self._timed_out.setdefault(pool, set()).add(future)
+            retire = self._pool is pool
+            if retire:
+                self._pool = None
+                self.recycled += 1
+        if retire:
+            threading.Thread(target=self._drain, args=(pool,), daemon=True,
+                             name="compute-pool-drain").start()
+
+    def _drain(self, pool: ProcessPoolExecutor) -> None:
+        # Jobs that time out while draining stop being waited for
+        while True:
+            with self._lock:
+                others = self._pending.get(pool, set()) - self._timed_out.get(pool, set())
+            if not others:
+                break
+            wait(others, timeout=1.0)
+        # ProcessPoolExecutor cannot cancel a running job, stop its workers
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._pending.pop(pool, None)
+            self._timed_out.pop(pool, None)
+
+    @staticmethod
+    def _share(arrays: Dict[str, np.ndarray]) -> Tuple[Dict[str, ArrayRef], List[shared_memory.SharedMemory]]:
+        refs, blocks = {}, []
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise TypeError(f"Array {name} of dtype object cannot be shared")
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            blocks.append(block)
+            refs[name] = (block.name, array.shape, array.dtype.str)
+        return refs, blocks
+
+    async def run(self, func: Callable[..., Any], *args,
+                  arrays: Optional[Dict[str, np.ndarray]] = None,
+                  timeout: Optional[float] = None) -> Any:
+        """
+        Awaits ``func(arrays, *args)`` on the configured backend.
+
+        Args:
+            func (Callable): Module level function, picklable by reference.
+            *args: Small picklable arguments.
+            arrays (dict, optional): Name -> numeric array passed to ``func``.
+            timeout (float, optional): Seconds, the pool default when None.
+        """
+        arrays = arrays or {}
+        timeout = timeout or self.timeout
+        self.submitted += 1
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            if self.backend == "thread":
+                result = await asyncio.wait_for(
+                    self.executor.run(func, arrays, *args), timeout)
+            else:
+                refs, blocks = self._share(arrays)
+                self.shared_bytes += sum(block.size for block in blocks)
+                try:
+                    pool = self._process_pool()
+                    future = pool.submit(_run_job, func, refs, args)
+                    self._track(pool, future)
+                    try:
+                        result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+                    except asyncio.TimeoutError:
+                        self._retire(pool, future)
+                        raise
+                finally:
+                    for block in blocks:
+                        block.close()
+                        block.unlink()
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.busy_seconds += time.perf_counter() - started
+        self.completed += 1
+        return result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+            retired = [other for other in self._pending if other is not pool]
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        for other in retired:
+            # Still draining, their stuck workers would never finish
+            for process in list((getattr(other, "_processes", None) or {}).values()):
+                process.terminate()
+            other.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed + self.timeouts
+        return {
+            "backend": self.backend,
+            "workers": self.processes if self.backend == "process" else self.executor.max_workers,
+            "submitted": self.submitted,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+            "mean_seconds": round(self.busy_seconds / finished, 4) if finished else None,
+            "shared_bytes": self.shared_bytes,
+        }
+
+
+compute_pool = ComputePool()
+# Chart rendering, kept apart so renders do not queue behind calculations
+render_pool = ComputePool(processes=settings_api.render_workers, executor=render_executor)
@@ -0,0 +1,262 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings_api
+
+# Relative directories are resolved against the mlservice directory, like
+# the other artifacts, not against the working directory of the process
+ARTIFACTS_ROOT = os.path.abspath(os.path.join(__file__, "../../.."))
+
+STATE_FILE = "state.npz"
+MATRIX_FILE = "correlation.npy"
+SYMBOLS_FILE = "symbols.json"
+
+
+def resolve_directory(directory: str) -> str:
+    return os.path.join(ARTIFACTS_ROOT, directory)
+
+
+def _save_atomic(path: str, write) -> None:
+    # Readers never see a partially written file
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        write(file)
+    os.replace(temporary, path)
+
+
+class RollingCorrelation:
+    """
+    Pairwise return correlations of the symbol universe over the last
+    ``window`` dates, maintained from running sums.
+
+    For every pair (i, j) the sums run over the dates where both returns
+    exist: the count, the sums and sums of squares of each side and the sum
+    of products. Adding or removing a date is a rank one update of the N x N
+    sums, O(N^2) per date instead of O(N^2 * T) for a recomputation.
+
+    Args:
+        symbols (List[str]): Symbol of every row and column.
+        window (int): Number of most recent returns kept.
+    """
+
+    def __init__(self, symbols: List[str], window: int) -> None:
+        n = len(symbols)
+        self.symbols = list(symbols)
+        self.window = window
+        self.dates: List[str] = []
+        # Returns of the dates in the window, oldest first, NaN where missing
+        self.returns = np.empty((0, n))
+        # Closes of the most recent date, the base of the next return
+        self.last_closes = np.full(n, np.nan)
+        self.count = np.zeros((n, n))
+        # sums[i, j]: sum of the returns of i on dates where j also has one
+        self.sums = np.zeros((n, n))
+        self.squares = np.zeros((n, n))
+        self.products = np.zeros((n, n))
+        self.updates = 0
+        # Manifest data version of every symbol the sums were built from
+        self.data_versions: Optional[Dict[str, Optional[str]]] = None
+
+    @property
+    def last_date(self) -> Optional[str]:
+        return self.dates[-1] if self.dates else None
+
+    def _apply(self, returns: np.ndarray, sign: float) -> None:
+        present = (~np.isnan(returns)).astype(np.float64)
+        values = np.nan_to_num(returns)
+        self.count += sign * np.outer(present, present)
+        self.sums += sign * np.outer(values, present)
+        self.squares += sign * np.outer(values ** 2, present)
+        self.products += sign * np.outer(values, values)
+
+    def push(self, date: str, closes: np.ndarray) -> None:
+        """
+        Advances the window by the closes of ``date``, newer than every date
+        pushed before.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        if self.last_date is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                returns = closes / self.last_closes - 1
+            if len(self.returns) == self.window:
+                self._apply(self.returns[0], -1.0)
+                self.returns = self.returns[1:]
+                self.dates = self.dates[1:]
+            self._apply(returns, 1.0)
+            self.returns = np.vstack([self.returns, returns])
+            self.updates += 1
+        else:
+            # The first date only provides the base of the next return
+            self.dates = []
+        self.dates.append(date)
+        self.last_closes = closes
+
+    @classmethod
+    def from_closes(cls, symbols: List[str], dates: List[str], closes: np.ndarray,
+                    window: int) -> "RollingCorrelation":
+        """
+        Builds the state from the last ``window + 1`` rows of a dates x
+        symbols close matrix with matrix products instead of per date
+        updates.
+        """
+        state = cls(symbols, window)
+        closes = np.asarray(closes, dtype=np.float64)[-(window + 1):]
+        dates = list(dates)[-(window + 1):]
+        if len(closes) == 0:
+            return state
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = closes[1:] / closes[:-1] - 1
+        present = (~np.isnan(returns)).astype(np.float64)
+        values = np.nan_to_num(returns)
+        state.count = present.T @ present
+        state.sums = values.T @ present
+        state.squares = (values ** 2).T @ present
+        state.products = values.T @ values
+        state.returns = returns
+        state.dates = dates
+        state.last_closes = closes[-1]
+        return state
+
+    def correlation(self, min_periods: int) -> np.ndarray:
+        """
+        Returns the correlation matrix, NaN for pairs sharing fewer than
+        ``min_periods`` returns.
+        """
+        n = self.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = n * self.products - self.sums * self.sums.T
+            variance = n * self.squares - self.sums ** 2
+            matrix = covariance / np.sqrt(variance * variance.T)
+        matrix[(n < min_periods) | ~np.isfinite(matrix)] = np.nan
+        matrix = np.clip(matrix, -1, 1)
+        present = np.diag(n) >= min_periods
+        matrix[np.diag_indices_from(matrix)] = np.where(present, 1.0, np.nan)
+        return matrix
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        _save_atomic(os.path.join(directory, STATE_FILE), lambda file: np.savez(
+            file, symbols=np.array(self.symbols), dates=np.array(self.dates),
+            window=self.window, updates=self.updates, returns=self.returns,
+            last_closes=self.last_closes, count=self.count, sums=self.sums,
+            squares=self.squares, products=self.products,
+            data_versions=np.array([
+                (self.data_versions or {}).get(symbol) or "" for symbol in self.symbols]),
+            has_versions=self.data_versions is not None))
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["RollingCorrelation"]:
+        path = os.path.join(directory, STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            state = cls(data["symbols"].tolist(), int(data["window"]))
+            state.dates = data["dates"].tolist()
+            state.updates = int(data["updates"])
+            for name in ("returns", "last_closes", "count", "sums", "squares", "products"):
+                setattr(state, name, data[name])
+            # States saved before versions were recorded are rebuilt
+            if "has_versions" in data.files and bool(data["has_versions"]):
+                state.data_versions = {
+                    symbol: version or None
+                    for symbol, version in zip(state.symbols, data["data_versions"].tolist())}
+        return state
+
+
+def write_matrix(directory: str, symbols: List[str], matrix: np.ndarray, last_date: Optional[str]) -> None:
+    """
+    Writes the correlation matrix as float32 .npy, memory mapped by readers,
+    and the symbol of every row.
+    """
+    os.makedirs(directory, exist_ok=True)
+    _save_atomic(os.path.join(directory, SYMBOLS_FILE), lambda file: file.write(
+        json.dumps({"symbols": symbols, "last_date": last_date}).encode()))
+    _save_atomic(os.path.join(directory, MATRIX_FILE),
+                 lambda file: np.save(file, matrix.astype(np.float32)))
+
+
+class CorrelationMatrix:
+    """
+    Read side of the correlation matrix: the float32 file is memory mapped,
+    so a query touches only the rows it reads, and remapped when a newer
+    matrix is written.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = resolve_directory(directory)
+        self.matrix: Optional[np.ndarray] = None
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.last_date: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> Optional[np.ndarray]:
+        path = os.path.join(self.directory, MATRIX_FILE)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                with open(os.path.join(self.directory, SYMBOLS_FILE)) as file:
+                    meta = json.load(file)
+                self.matrix = np.load(path, mmap_mode="r")
+                self.symbols = meta["symbols"]
+                self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+                self.last_date = meta["last_date"]
+                self._mtime = mtime
+            return self.matrix
+
+    @property
+    def available(self) -> bool:
+        return self._current() is not None
+
+    def top_k(self, symbol: str, k: int, lowest: bool = False) -> List[Tuple[str, float]]:
+        """
+        Returns the ``k`` symbols most (or least) correlated with ``symbol``,
+        strongest first.
+
+        Raises:
+            KeyError: If the symbol is not in the matrix or has too few
+                returns in the window.
+        """
+        matrix = self._current()
+        if matrix is None or not self._has_returns(matrix, symbol):
+            raise KeyError(symbol)
+        i = self.index[symbol]
+        row = np.array(matrix[i], dtype=np.float64)
+        scores = -row if lowest else row.copy()
+        # The symbol itself and undefined pairs are never returned
+        scores[i] = -np.inf
+        scores[np.isnan(scores)] = -np.inf
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k == 0:
+            return []
+        # O(N) selection, only the k selected are sorted
+        selected = np.argpartition(-scores, k - 1)[:k]
+        selected = selected[np.argsort(-scores[selected], kind="stable")]
+        return [(self.symbols[j], round(float(row[j]), 4)) for j in selected]
+
+    def _has_returns(self, matrix: np.ndarray, symbol: str) -> bool:
+        # Stored symbols without enough returns in the window have a NaN row
+        return symbol in self.index and not np.isnan(matrix[self.index[symbol], self.index[symbol]])
+
+    def submatrix(self, symbols: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns the known symbols among ``symbols``, those with enough
+        returns in the window, and their correlations.
+        """
+        matrix = self._current()
+        if matrix is None:
+            return [], np.empty((0, 0))
+        known = [symbol for symbol in symbols if self._has_returns(matrix, symbol)]
+        rows = [self.index[symbol] for symbol in known]
+        return known, np.array(matrix[np.ix_(rows, rows)], dtype=np.float64)
+
+
+correlation_matrix = CorrelationMatrix(settings_api.correlation_dir)
@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from ..config import settings_api
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls off the event loop on a fixed size thread pool.
+
+    At most ``max_workers`` calls are submitted at a time, further callers
+    wait on the event loop without holding a thread, so a burst of requests
+    cannot grow an unbounded backlog inside the pool.
+    """
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name)
+            return self._executor
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Awaits ``func(*args, **kwargs)`` executed on the pool.
+
+        A thread cannot be interrupted, when the caller stops waiting, e.g.
+        on a timeout, the call keeps its slot until it returns.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        slots = self._slots
+        loop = asyncio.get_running_loop()
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            future = self._pool().submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release(slots, None)
+            raise
+        future.add_done_callback(lambda done: self._release_threadsafe(loop, slots, done))
+        # Cancelling the caller must not cancel the future, its callback
+        # releases the slot
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _release(self, slots: asyncio.Semaphore, future: Optional[Future]) -> None:
+        self.running -= 1
+        if future is None or future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        slots.release()
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop,
+                            slots: asyncio.Semaphore, future: Future) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release, slots, future)
+        except RuntimeError:
+            # The event loop is closed, nobody waits for the slot anymore
+            pass
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+        self._slots = None
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Blocking MongoDB reads
+data_executor = BoundedExecutor("mlservice-data", settings_api.data_executor_workers)
+# CPU bound indicator calculations
+compute_executor = BoundedExecutor("mlservice-compute", settings_api.compute_executor_workers)
+# Chart rendering, safe to run in parallel on Figure objects
+render_executor = BoundedExecutor("mlservice-render", settings_api.render_workers)
@@ -0,0 +1,319 @@
+import math
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pymongo import UpdateOne
+
+from ..config import settings_api
+from .indicator_store import IndicatorStore
+from .storage import get_write_concern
+
+NAN = float("nan")
+
+RSI_PERIOD = 14
+BAND_PERIOD = 20
+VOLATILITY_PERIOD = 20
+RANGE_PERIOD = 252
+
+
+class RollingWindow:
+    """
+    Ring buffer of the last ``size`` values with Welford's running mean and
+    variance, updated in O(1) as values enter and leave. NaN values occupy a
+    slot but are left out of the statistics.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.values: deque = deque(maxlen=size)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _add(self, x: float) -> None:
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def _remove(self, x: float) -> None:
+        if self.n == 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.n -= 1
+        self.mean = (old_mean * (self.n + 1) - x) / self.n
+        self.m2 = max(self.m2 - (x - old_mean) * (x - self.mean), 0.0)
+
+    def push(self, x: float) -> None:
+        if len(self.values) == self.values.maxlen:
+            oldest = self.values[0]
+            if not math.isnan(oldest):
+                self._remove(oldest)
+        self.values.append(x)
+        if not math.isnan(x):
+            self._add(x)
+
+    @property
+    def complete(self) -> bool:
+        """
+        True when the window is full and holds no NaN, as pandas requires
+        for a rolling statistic with the default min_periods.
+        """
+        return self.n == self.values.maxlen
+
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else NAN
+
+    def to_document(self) -> dict:
+        return {"values": list(self.values), "n": self.n,
+                "mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_document(cls, size: int, document: dict) -> "RollingWindow":
+        window = cls(size)
+        window.values.extend(document["values"])
+        window.n, window.mean, window.m2 = document["n"], document["mean"], document["m2"]
+        return window
+
+
+class MonotonicWindow:
+    """
+    Rolling maximum (or minimum) of the last ``size`` values, a monotonic
+    deque of (position, value) keeps every update amortized O(1).
+    """
+
+    def __init__(self, size: int, maximum: bool = True) -> None:
+        self.size = size
+        self.maximum = maximum
+        self.items: deque = deque()
+
+    def push(self, position: int, x: float) -> None:
+        if not math.isnan(x):
+            while self.items and (self.items[-1][1] <= x if self.maximum
+                                  else self.items[-1][1] >= x):
+                self.items.pop()
+            self.items.append((position, x))
+        while self.items and self.items[0][0] <= position - self.size:
+            self.items.popleft()
+
+    def value(self) -> float:
+        return self.items[0][1] if self.items else NAN
+
+    def to_document(self) -> list:
+        return [list(item) for item in self.items]
+
+    @classmethod
+    def from_document(cls, size: int, maximum: bool, items: list) -> "MonotonicWindow":
+        window = cls(size, maximum)
+        window.items.extend((int(position), value) for position, value in items)
+        return window
+
+
+def _rsi(avg_gain: float, avg_loss: float) -> float:
+    if avg_loss == 0:
+        return NAN if avg_gain == 0 else 100.0
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+class IndicatorState:
+    """
+    Compact state of a symbol's daily indicators, advanced one bar at a time.
+
+    Produces the same rows as the vectorized ``rolling_indicators`` of the
+    materialization stage, plus the Wilder smoothed RSI and the 252 day
+    high and low.
+    """
+
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+        self.last_date: Optional[str] = None
+        self.position = -1
+        self.prev_close = NAN
+        self.prev_raw_valid = False
+        self.first_close = NAN
+        self.gains: deque = deque(maxlen=RSI_PERIOD)
+        self.losses: deque = deque(maxlen=RSI_PERIOD)
+        self.wilder_gain = NAN
+        self.wilder_loss = NAN
+        self.closes = RollingWindow(BAND_PERIOD)
+        self.returns = RollingWindow(VOLATILITY_PERIOD)
+        self.highs = MonotonicWindow(RANGE_PERIOD, maximum=True)
+        self.lows = MonotonicWindow(RANGE_PERIOD, maximum=False)
+
+    def update(self, date: str, raw_close: float) -> dict:
+        """
+        Advances the state by the bar of ``date`` and returns its indicators.
+        """
+        raw_close = NAN if raw_close is None else float(raw_close)
+        raw_valid = not math.isnan(raw_close)
+        # ffill(limit=1): a missing close takes the previous one, once
+        close = raw_close if raw_valid or not self.prev_raw_valid else self.prev_close
+        self.position += 1
+
+        delta = close - self.prev_close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        self.gains.append(gain)
+        self.losses.append(loss)
+        if self.position == 0:
+            self.wilder_gain, self.wilder_loss = gain, loss
+        else:
+            self.wilder_gain += (gain - self.wilder_gain) / RSI_PERIOD
+            self.wilder_loss += (loss - self.wilder_loss) / RSI_PERIOD
+
+        self.returns.push(close / self.prev_close - 1 if self.position else NAN)
+        self.closes.push(close)
+        self.highs.push(self.position, close)
+        self.lows.push(self.position, close)
+        if math.isnan(self.first_close):
+            self.first_close = close
+
+        sma = self.closes.mean if self.closes.complete else NAN
+        std = self.closes.std() if self.closes.complete else NAN
+        row = {
+            "symbol": self.symbol,
+            "date": date,
+            "close": close,
+            "rsi_14": _rsi(sum(self.gains) / len(self.gains),
+                           sum(self.losses) / len(self.losses)),
+            "rsi_wilder_14": _rsi(self.wilder_gain, self.wilder_loss),
+            "sma_20": sma,
+            "bollinger_up": sma + 2 * std,
+            "bollinger_low": sma - 2 * std,
+            "volatility_20": (self.returns.std() * math.sqrt(252)
+                              if self.returns.complete else NAN),
+            "high_252": self.highs.value(),
+            "low_252": self.lows.value(),
+            "cumulative_return": (close / self.first_close - 1) * 100,
+        }
+
+        self.prev_close = close
+        self.prev_raw_valid = raw_valid
+        self.last_date = date
+        return row
+
+    def to_document(self) -> dict:
+        return {
+            "_id": self.symbol,
+            "last_date": self.last_date,
+            "position": self.position,
+            "prev_close": self.prev_close,
+            "prev_raw_valid": self.prev_raw_valid,
+            "first_close": self.first_close,
+            "gains": list(self.gains),
+            "losses": list(self.losses),
+            "wilder_gain": self.wilder_gain,
+            "wilder_loss": self.wilder_loss,
+            "closes": self.closes.to_document(),
+            "returns": self.returns.to_document(),
+            "highs": self.highs.to_document(),
+            "lows": self.lows.to_document(),
+            "updated_at": datetime.now(),
+        }
+
+    @classmethod
+    def from_document(cls, document: dict) -> "IndicatorState":
+        state = cls(document["_id"])
+        state.last_date = document["last_date"]
+        state.position = document["position"]
+        state.prev_close = document["prev_close"]
+        state.prev_raw_valid = document["prev_raw_valid"]
+        state.first_close = document["first_close"]
+        state.gains.extend(document["gains"])
+        state.losses.extend(document["losses"])
+        state.wilder_gain = document["wilder_gain"]
+        state.wilder_loss = document["wilder_loss"]
+        state.closes = RollingWindow.from_document(BAND_PERIOD, document["closes"])
+        state.returns = RollingWindow.from_document(VOLATILITY_PERIOD, document["returns"])
+        state.highs = MonotonicWindow.from_document(RANGE_PERIOD, True, document["highs"])
+        state.lows = MonotonicWindow.from_document(RANGE_PERIOD, False, document["lows"])
+        return state
+
+
+class IndicatorEngine:
+    """
+    Keeps the persisted indicator state of every symbol and appends the
+    daily indicator rows of new bars, so a daily update costs one step per
+    symbol instead of a pass over its whole history.
+
+    A symbol without state, or whose ingested bars are not strictly newer
+    than its state, is left for ``rebuild`` from its full history.
+    """
+
+    def __init__(self, db,
+                 collection_name: str = settings_api.indicator_state_collection) -> None:
+        self.collection = db[collection_name]
+        self.store = IndicatorStore(db)
+
+    def load(self, symbols: List[str]) -> Dict[str, IndicatorState]:
+        cursor = self.collection.find({"_id": {"$in": list(symbols)}})
+        return {document["_id"]: IndicatorState.from_document(document)
+                for document in cursor}
+
+    def save(self, states: List[IndicatorState]) -> None:
+        operations = [UpdateOne({"_id": state.symbol}, {"$set": state.to_document()},
+                                upsert=True) for state in states]
+        if operations:
+            self.collection.with_options(
+                write_concern=get_write_concern(settings_api.write_concern)
+            ).bulk_write(operations, ordered=False)
+
+    def invalidate(self, symbols: List[str]) -> None:
+        self.collection.delete_many({"_id": {"$in": list(symbols)}})
+
+    @staticmethod
+    def _stream(state: IndicatorState, dates: List[str], closes: List[float]) -> pd.DataFrame:
+        return pd.DataFrame([state.update(date, close) for date, close in zip(dates, closes)])
+
+    def advance(self, frames: Dict[str, pd.DataFrame]) -> List[str]:
+        """
+        Advances the state of every symbol by its newly ingested bars and
+        writes their indicator rows.
+
+        Args:
+            frames (dict): Symbol -> ingested bars with "Date" and "Close".
+
+        Returns:
+            List[str]: Symbols left without state, to be rebuilt.
+        """
+        states = self.load(list(frames))
+        advanced, rows, pending = [], [], []
+        for symbol, data in frames.items():
+            state = states.get(symbol)
+            if state is None:
+                pending.append(symbol)
+                continue
+            data = data.assign(Date=pd.to_datetime(data["Date"]).dt.strftime(
+                "%Y-%m-%d")).sort_values("Date")
+            if (data["Date"] <= state.last_date).any():
+                # Older bars change the history the state was built from
+                pending.append(symbol)
+                continue
+            rows.append(self._stream(state, data["Date"].tolist(), data["Close"].tolist()))
+            advanced.append(state)
+
+        if rows:
+            self.store.write_series(pd.concat(rows, ignore_index=True))
+        self.save(advanced)
+        self.invalidate([symbol for symbol in pending if symbol in states])
+        return pending
+
+    def rebuild(self, bars: pd.DataFrame) -> Tuple[pd.DataFrame, List[IndicatorState]]:
+        """
+        Streams the full history of symbols through fresh states.
+
+        Args:
+            bars (pd.DataFrame): "symbol", "_id" (date) and "Close" columns,
+                sorted by symbol and date.
+
+        Returns:
+            tuple: The indicator rows of every bar and the final states.
+        """
+        rows, states = [], []
+        for symbol, group in bars.groupby("symbol", sort=False):
+            state = IndicatorState(symbol)
+            rows.append(self._stream(state, group["_id"].tolist(), group["Close"].tolist()))
+            states.append(state)
+        return (pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()), states
@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+
+from ..config import settings_api
+from .storage import bulk_upsert_bars, ensure_index, get_write_concern
+
+# Look-backs materialized after every ingestion, as offsets from the anchor
+STANDARD_WINDOWS = {
+    "1M": pd.DateOffset(months=1),
+    "3M": pd.DateOffset(months=3),
+    "6M": pd.DateOffset(months=6),
+    "1Y": pd.DateOffset(years=1),
+    "YTD": None,
+}
+
+
+def window_start_date(window: str, anchor_date: str) -> str:
+    """
+    Returns the first date of a standard window ending at ``anchor_date``.
+
+    Args:
+        window (str): "1M", "3M", "6M", "1Y" or "YTD".
+        anchor_date (str): Last date of the window ("%Y-%m-%d").
+
+    Returns:
+        str: First date of the window ("%Y-%m-%d").
+    """
+    if window not in STANDARD_WINDOWS:
+        raise ValueError(
+            f"Unknown window {window}, expected one of {list(STANDARD_WINDOWS)}")
+    anchor = pd.Timestamp(anchor_date)
+    offset = STANDARD_WINDOWS[window]
+    start = anchor.replace(month=1, day=1) if offset is None else anchor - offset
+    return start.strftime("%Y-%m-%d")
+
+
+class IndicatorStore:
+    """
+    Derived collections written after ingestion.
+
+    Series: one document per symbol and day with the rolling indicators of
+    that day ("rsi_14", "sma_20", "bollinger_up", "bollinger_low",
+    "volatility_20", "cumulative_return").
+    Windows: one document per symbol and standard window with the summary
+    metrics from the window's "start_date", valid while the symbol's
+    "version" (data version of the manifest) is unchanged.
+    """
+
+    def __init__(self, db,
+                 series_collection: str = settings_api.indicators_collection,
+                 window_collection: str = settings_api.window_metrics_collection) -> None:
+        self.series = db[series_collection]
+        self.windows = db[window_collection]
+        ensure_index(self.series, [("symbol", ASCENDING), ("date", ASCENDING)],
+                     unique=True)
+        ensure_index(self.windows, [("symbol", ASCENDING), ("start_date", ASCENDING)])
+
+    def series_last_dates(self) -> Dict[str, str]:
+        """
+        Returns symbol -> last materialized date of the daily series.
+        """
+        cursor = self.series.aggregate([
+            {"$group": {"_id": "$symbol", "last_date": {"$max": "$date"}}}])
+        return {entry["_id"]: entry["last_date"] for entry in cursor}
+
+    def write_series(self, data: pd.DataFrame) -> int:
+        """
+        Upserts daily indicator rows keyed by "symbol" and "date".
+        """
+        if data.empty:
+            return 0
+        return bulk_upsert_bars(self.series, data, key_fields=("symbol", "date"))
+
+    def read_series(self, symbol: str, start_date: Optional[str] = None) -> pd.DataFrame:
+        query = {"symbol": symbol}
+        if start_date:
+            query["date"] = {"$gte": start_date}
+        cursor = self.series.find(query, {"_id": 0}).sort("date", ASCENDING)
+        return pd.DataFrame(list(cursor))
+
+    def window_versions(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Returns symbol -> (anchor date, version) of its materialized windows.
+        """
+        cursor = self.windows.find({}, {"symbol": 1, "anchor_date": 1, "version": 1})
+        return {entry["symbol"]: (entry["anchor_date"], entry.get("version"))
+                for entry in cursor}
+
+    def write_windows(self, symbol: str, anchor_date: str, version: Optional[str],
+                      metrics: Dict[str, Tuple[str, dict]]) -> None:
+        """
+        Replaces the window metrics of a symbol.
+
+        Args:
+            symbol (str): Stock symbol.
+            anchor_date (str): Last date of the windows.
+            version (str, optional): Data version of the symbol.
+            metrics (dict): Window -> (start date, metrics).
+        """
+        now = datetime.now()
+        operations: List[UpdateOne] = [
+            UpdateOne({"_id": f"{symbol}|{window}"}, {"$set": {
+                "symbol": symbol, "window": window, "start_date": start_date,
+                "anchor_date": anchor_date, "version": version,
+                "metrics": values, "updated_at": now,
+            }}, upsert=True)
+            for window, (start_date, values) in metrics.items()
+        ]
+        if operations:
+            self.windows.with_options(
+                write_concern=get_write_concern(settings_api.write_concern)
+            ).bulk_write(operations, ordered=False)
+
+    def lookup(self, symbol: str, start_date: str, version: Optional[str]) -> Optional[dict]:
+        """
+        Returns the materialized metrics of a symbol from ``start_date``, None
+        when no standard window starts there or it predates ``version``.
+        """
+        entry = self.windows.find_one(
+            {"symbol": symbol, "start_date": start_date, "version": version},
+            {"metrics": 1})
+        return entry["metrics"] if entry else None
@@ -0,0 +1,377 @@
+import warnings
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Every array is dates x symbols, dates in ascending order, so one plan
+# serves a single symbol (one column) and a whole price matrix alike.
+
+
+@dataclass(frozen=True)
+class Intermediate:
+    """
+    Array shared between indicators, computed once per plan from the price
+    fields and the intermediates it needs.
+    """
+    name: str
+    needs: Tuple[str, ...]
+    fields: Tuple[str, ...]
+    compute: Callable[..., object]
+
+
+@dataclass(frozen=True)
+class Indicator:
+    """
+    Indicator reduced to one value per symbol from intermediates.
+
+    Indicators with an ``aggregate`` can also be answered from the range
+    statistics MongoDB computes ("count", "first", "last", "max", "min",
+    "std" of the closes), without transferring the bars.
+    """
+    name: str
+    needs: Tuple[str, ...]
+    compute: Callable[..., np.ndarray]
+    description: str = ""
+    aggregate: Optional[Callable[[pd.DataFrame], np.ndarray]] = None
+
+
+INTERMEDIATES: Dict[str, Intermediate] = {}
+INDICATORS: Dict[str, Indicator] = {}
+
+# Metrics returned by /metrics when no indicators are requested
+DEFAULT_INDICATORS = [
+    "max_value", "min_value", "standard_deviation", "price_interval",
+    "percentage_change", "volatility", "rsi", "bollinger_up", "bollinger_low",
+    "sharpe_ratio",
+]
+
+
+def intermediate(name: str, needs: Sequence[str] = (), fields: Sequence[str] = ()):
+    """
+    Registers an intermediate computed by ``func(*needs, *fields)``.
+    """
+    def register(func):
+        INTERMEDIATES[name] = Intermediate(name, tuple(needs), tuple(fields), func)
+        return func
+    return register
+
+
+def indicator(name: str, needs: Sequence[str], description: str = "",
+              aggregate: Optional[Callable[[pd.DataFrame], np.ndarray]] = None):
+    """
+    Registers an indicator computed by ``func(*needs)``, and optionally by
+    ``aggregate(stats)`` from the database range statistics.
+    """
+    def register(func):
+        INDICATORS[name] = Indicator(name, tuple(needs), func, description, aggregate)
+        return func
+    return register
+
+
+def _last_valid(series: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(series)
+    rows = len(series) - 1 - valid[::-1].argmax(axis=0)
+    return series[rows, np.arange(series.shape[1])]
+
+
+def _ewm(series: np.ndarray, **kwargs) -> np.ndarray:
+    return pd.DataFrame(series).ewm(adjust=False, **kwargs).mean().to_numpy()
+
+
+def _rsi(gain: np.ndarray, loss: np.ndarray) -> np.ndarray:
+    return 100 - 100 / (1 + gain / loss)
+
+
+# Intermediates
+
+@intermediate("close", fields=["Close"])
+def _close(close):
+    # ffill(limit=1): a missing close takes the previous one, once
+    previous = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    missing = np.isnan(close) & ~np.isnan(previous)
+    return np.where(missing, previous, close)
+
+
+@intermediate("count", ["close"])
+def _count(close):
+    return (~np.isnan(close)).sum(axis=0)
+
+
+@intermediate("max", ["close"])
+def _max(close):
+    return np.nanmax(close, axis=0)
+
+
+@intermediate("min", ["close"])
+def _min(close):
+    return np.nanmin(close, axis=0)
+
+
+@intermediate("delta", ["close"])
+def _delta(close):
+    return np.diff(close, axis=0, prepend=np.nan)
+
+
+@intermediate("returns", ["close"])
+def _returns(close):
+    return close[1:] / close[:-1] - 1
+
+
+@intermediate("returns_std", ["returns"])
+def _returns_std(returns):
+    return np.nanstd(returns, axis=0, ddof=1)
+
+
+@intermediate("rsi_sums", ["delta"])
+def _rsi_sums(delta):
+    # Simple moving average of gains and losses over the last 14 changes
+    window = delta[-14:]
+    return (np.where(window > 0, window, 0).sum(axis=0),
+            np.where(window < 0, -window, 0).sum(axis=0))
+
+
+@intermediate("band_20", ["close"])
+def _band_20(close):
+    if len(close) < 20:
+        return None
+    window = close[-20:]
+    return window.mean(axis=0), window.std(axis=0, ddof=1)
+
+
+@intermediate("ema_12", ["close"])
+def _ema_12(close):
+    return _ewm(close, span=12)
+
+
+@intermediate("ema_26", ["close"])
+def _ema_26(close):
+    return _ewm(close, span=26)
+
+
+@intermediate("macd_line", ["ema_12", "ema_26"])
+def _macd_line(ema_12, ema_26):
+    return ema_12 - ema_26
+
+
+@intermediate("macd_signal_line", ["macd_line"])
+def _macd_signal_line(macd_line):
+    return _ewm(macd_line, span=9)
+
+
+@intermediate("true_range", ["close"], fields=["High", "Low"])
+def _true_range(close, high, low):
+    previous = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    return np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+
+
+@intermediate("running_max", ["close"])
+def _running_max(close):
+    return np.fmax.accumulate(close, axis=0)
+
+
+# Indicators
+
+@indicator("max_value", ["max"], aggregate=lambda stats: stats["max"])
+def _max_value(maximum):
+    return maximum
+
+
+@indicator("min_value", ["min"], aggregate=lambda stats: stats["min"])
+def _min_value(minimum):
+    return minimum
+
+
+@indicator("standard_deviation", ["close"], aggregate=lambda stats: stats["std"])
+def _standard_deviation(close):
+    return np.nanstd(close, axis=0, ddof=1)
+
+
+@indicator("price_interval", ["max", "min"],
+           aggregate=lambda stats: stats["max"] - stats["min"])
+def _price_interval(maximum, minimum):
+    return maximum - minimum
+
+
+@indicator("percentage_change", ["close"], "Change from the first to the last close, percent",
+           aggregate=lambda stats: (stats["last"] - stats["first"]) / stats["first"] * 100)
+def _percentage_change(close):
+    valid = ~np.isnan(close)
+    first = close[valid.argmax(axis=0), np.arange(close.shape[1])]
+    return (_last_valid(close) - first) / first * 100
+
+
+@indicator("bar_count", ["count"], "Number of closes",
+           aggregate=lambda stats: stats["count"])
+def _bar_count(count):
+    return count
+
+
+@indicator("first_close", ["close"], aggregate=lambda stats: stats["first"])
+def _first_close(close):
+    valid = ~np.isnan(close)
+    return close[valid.argmax(axis=0), np.arange(close.shape[1])]
+
+
+@indicator("last_close", ["close"], aggregate=lambda stats: stats["last"])
+def _last_close(close):
+    return _last_valid(close)
+
+
+@indicator("volatility", ["returns_std", "count"])
+def _volatility(returns_std, count):
+    return returns_std * np.sqrt(count)
+
+
+@indicator("sharpe_ratio", ["returns", "returns_std"], "Annualized, zero risk free rate")
+def _sharpe_ratio(returns, returns_std):
+    return np.where(returns_std != 0,
+                    np.nanmean(returns, axis=0) / returns_std * np.sqrt(252), np.nan)
+
+
+@indicator("rsi", ["rsi_sums"], "14 day RSI of simple average gains and losses")
+def _rsi_indicator(rsi_sums):
+    return _rsi(*rsi_sums)
+
+
+@indicator("bollinger_up", ["band_20", "count"], "Upper band of the last 20 closes, 0 when unavailable")
+def _bollinger_up(band_20, count):
+    if band_20 is None:
+        return np.zeros(len(count))
+    return np.nan_to_num(band_20[0] + 2 * band_20[1], nan=0)
+
+
+@indicator("bollinger_low", ["band_20", "count"], "Lower band of the last 20 closes, 0 when unavailable")
+def _bollinger_low(band_20, count):
+    if band_20 is None:
+        return np.zeros(len(count))
+    return np.nan_to_num(band_20[0] - 2 * band_20[1], nan=0)
+
+
+@indicator("ema_12", ["ema_12"], "12 day exponential moving average")
+def _ema_12_indicator(ema_12):
+    return _last_valid(ema_12)
+
+
+@indicator("ema_26", ["ema_26"], "26 day exponential moving average")
+def _ema_26_indicator(ema_26):
+    return _last_valid(ema_26)
+
+
+@indicator("macd", ["macd_line"], "EMA 12 minus EMA 26")
+def _macd(macd_line):
+    return _last_valid(macd_line)
+
+
+@indicator("macd_signal", ["macd_signal_line"], "9 day EMA of the MACD")
+def _macd_signal(macd_signal_line):
+    return _last_valid(macd_signal_line)
+
+
+@indicator("macd_histogram", ["macd_line", "macd_signal_line"])
+def _macd_histogram(macd_line, macd_signal_line):
+    return _last_valid(macd_line - macd_signal_line)
+
+
+@indicator("atr_14", ["true_range"], "14 day Wilder average true range")
+def _atr_14(true_range):
+    return _last_valid(_ewm(true_range, alpha=1 / 14))
+
+
+@indicator("max_drawdown", ["close", "running_max"], "Largest fall from a previous peak, percent")
+def _max_drawdown(close, running_max):
+    return np.nanmin(close / running_max - 1, axis=0) * 100
+
+
+class IndicatorPlan:
+    """
+    Resolves requested indicators into the intermediates they need, in
+    dependency order, so every intermediate is computed once and shared.
+
+    Args:
+        names (Iterable[str], optional): Indicators to compute, the default
+            metrics when None.
+
+    Raises:
+        ValueError: If an indicator is not registered.
+    """
+
+    def __init__(self, names: Optional[Iterable[str]] = None) -> None:
+        self.indicators = list(names) if names else list(DEFAULT_INDICATORS)
+        unknown = [name for name in self.indicators if name not in INDICATORS]
+        if unknown:
+            raise ValueError(
+                f"Unknown indicators {unknown}, expected any of {sorted(INDICATORS)}")
+
+        self.steps: List[str] = []
+        for name in self.indicators:
+            for need in INDICATORS[name].needs:
+                self._visit(need, set())
+        self.fields = sorted({field for step in self.steps
+                              for field in INTERMEDIATES[step].fields})
+
+    def _visit(self, name: str, path: set) -> None:
+        if name in self.steps:
+            return
+        if name in path:
+            raise ValueError(f"Intermediate {name} depends on itself")
+        for need in INTERMEDIATES[name].needs:
+            self._visit(need, path | {name})
+        self.steps.append(name)
+
+    @property
+    def pushdown(self) -> bool:
+        """
+        True when every planned indicator can be answered by the database
+        range statistics.
+        """
+        return all(INDICATORS[name].aggregate is not None for name in self.indicators)
+
+    def compute_aggregates(self, stats: pd.DataFrame, symbols: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Computes the planned indicators from database range statistics.
+
+        Args:
+            stats (pd.DataFrame): Range statistics indexed by symbol, see
+                ``BarStorage.aggregate_stats``.
+            symbols (List[str]): Symbols to return values for, in order.
+
+        Returns:
+            dict: Indicator name -> one value per symbol, NaN for symbols
+                without statistics.
+        """
+        stats = stats.reindex(symbols)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {name: np.asarray(INDICATORS[name].aggregate(stats), dtype=np.float64)
+                    for name in self.indicators}
+
+    def compute(self, prices: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Computes the planned indicators.
+
+        Args:
+            prices (dict): Price field -> dates x symbols float array, one
+                entry for every field in ``self.fields``.
+
+        Returns:
+            dict: Indicator name -> one value per symbol.
+        """
+        values: Dict[str, object] = {}
+        # Symbols without prices yield NaN, not warnings
+        with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for step in self.steps:
+                spec = INTERMEDIATES[step]
+                values[step] = spec.compute(
+                    *[values[need] for need in spec.needs],
+                    *[np.asarray(prices[field], dtype=np.float64) for field in spec.fields])
+            return {name: INDICATORS[name].compute(*[values[need] for need in INDICATORS[name].needs])
+                    for name in self.indicators}
+
+
+def available_indicators() -> Dict[str, str]:
+    """
+    Returns the name and description of every registered indicator.
+    """
+    return {name: spec.description for name, spec in sorted(INDICATORS.items())}
@@ -0,0 +1,70 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from ..config import settings_api
+
+
+class MongoLease:
+    """
+    Lock shared by every worker and replica through a MongoDB document.
+
+    The holder owns the lock until it releases it or until the lease expires,
+    so a crashed holder never blocks the others for longer than ``ttl``.
+    Used as a context manager the lease is renewed in the background while
+    held, so long runs keep it.
+    """
+
+    def __init__(self, db, name: str, ttl_seconds: int = settings_api.ingestion_lease_seconds,
+                 collection_name: str = settings_api.lease_collection) -> None:
+        self.collection = db[collection_name]
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop_renewal = threading.Event()
+
+    def acquire(self) -> bool:
+        """
+        Takes or extends the lease, returns False if another owner holds it.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.find_one_and_update(
+                {"_id": self.name,
+                 "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + self.ttl,
+                          "acquired_at": now}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            # The lease document exists and is held by someone else
+            return False
+
+    def release(self) -> None:
+        self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+    def holder(self) -> Optional[str]:
+        lease = self.collection.find_one({"_id": self.name})
+        return lease["owner"] if lease else None
+
+    def _renew(self) -> None:
+        while not self._stop_renewal.wait(self.ttl.total_seconds() / 3):
+            if not self.acquire():
+                break
+
+    def __enter__(self) -> bool:
+        acquired = self.acquire()
+        if acquired:
+            self._stop_renewal.clear()
+            threading.Thread(target=self._renew, daemon=True).start()
+        return acquired
+
+    def __exit__(self, *exc) -> None:
+        self._stop_renewal.set()
+        self.release()
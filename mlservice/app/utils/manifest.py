@@ -0,0 +1,267 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+
+from ..config import settings_api
+from .storage import ensure_index, get_write_concern
+
+
+def frame_checksum(data: pd.DataFrame) -> str:
+    """
+    Returns a checksum of the bars a provider returned for a symbol.
+    """
+    return format(
+        int(pd.util.hash_pandas_object(data, index=False).sum()) & (2**64 - 1), "016x")
+
+
+class IngestionManifest:
+    """
+    One document per symbol recording the state of its ingestion:
+    "last_date" (most recent stored bar), "row_count", "checksum" of the last
+    provider response, "status" of the last run ("ok", "empty", "failed"),
+    "error", "last_checked" (date of the last run), "revision" (bumped by
+    every write of bars) and "updated_at".
+
+    Keeps incremental date ranges and freshness checks to a single read of
+    this collection instead of a query per symbol collection.
+    """
+
+    def __init__(self, db, collection_name: str = settings_api.manifest_collection) -> None:
+        self.collection = db[collection_name]
+        ensure_index(self.collection, [("last_date", ASCENDING)])
+
+    def entries(self) -> pd.DataFrame:
+        """
+        Returns the manifest of every symbol, indexed by symbol.
+        """
+        data = pd.DataFrame(list(self.collection.find()), columns=[
+            "_id", "last_date", "row_count", "checksum", "status", "error",
+            "last_checked", "updated_at"])
+        return data.rename(columns={"_id": "symbol"}).set_index("symbol")
+
+    def last_dates(self) -> Dict[str, Optional[str]]:
+        """
+        Returns symbol -> last ingested date for every symbol in the manifest.
+        """
+        cursor = self.collection.find({}, {"last_date": 1})
+        return {entry["_id"]: entry.get("last_date") for entry in cursor}
+
+    def last_date(self, symbol: str) -> Optional[str]:
+        """
+        Returns the last ingested date of a symbol, its data version.
+        """
+        entry = self.collection.find_one({"_id": symbol}, {"last_date": 1})
+        return entry.get("last_date") if entry else None
+
+    @staticmethod
+    def _data_version(entry: dict) -> Optional[str]:
+        if not entry.get("last_date"):
+            return None
+        return f"{entry['last_date']}.{entry.get('revision', 0)}"
+
+    def data_version(self, symbol: str) -> Optional[str]:
+        """
+        Returns the data version of a symbol, None when it has no bars.
+
+        Changes with every write of its bars, including bars written before
+        the last date by backfills and gap re-fetches.
+        """
+        entry = self.collection.find_one({"_id": symbol}, {"last_date": 1, "revision": 1})
+        return self._data_version(entry) if entry else None
+
+    def data_versions(self) -> Dict[str, Optional[str]]:
+        """
+        Returns symbol -> data version for every symbol in the manifest.
+        """
+        cursor = self.collection.find({}, {"last_date": 1, "revision": 1})
+        return {entry["_id"]: self._data_version(entry) for entry in cursor}
+
+    def latest_date(self) -> Optional[str]:
+        """
+        Returns the most recent date ingested for any symbol.
+        """
+        entry = self.collection.find_one(
+            {"last_date": {"$ne": None}}, {"last_date": 1}, sort=[("last_date", -1)])
+        return entry["last_date"] if entry else None
+
+    @staticmethod
+    def _recheck_cutoff(recheck_days: int) -> str:
+        return (datetime.now() - timedelta(days=recheck_days)).strftime("%Y-%m-%d")
+
+    def unavailable_symbols(self, recheck_days: int = settings_api.empty_recheck_days) -> Set[str]:
+        """
+        Returns symbols the provider had no bars for at all when checked
+        less than ``recheck_days`` ago, they are not due for another try.
+        """
+        cursor = self.collection.find({
+            "last_date": None, "status": "empty",
+            "last_checked": {"$gt": self._recheck_cutoff(recheck_days)},
+        }, {"_id": 1})
+        return {entry["_id"] for entry in cursor}
+
+    def stale_symbols(self, expected_date: str,
+                      recheck_days: int = settings_api.empty_recheck_days) -> pd.DataFrame:
+        """
+        Returns the manifest of symbols whose last ingested date is before
+        ``expected_date`` or whose last run failed. Symbols without any data
+        are left out until they are due for another try.
+        """
+        entries = self.entries()
+        # Columns without any date are float NaN, compare them as strings
+        last_checked = entries["last_checked"].fillna("")
+        behind = entries["last_date"].isna() | (entries["last_date"].fillna("") < expected_date)
+        unavailable = (entries["last_date"].isna() & (entries["status"] == "empty")
+                       & (last_checked > self._recheck_cutoff(recheck_days)))
+        return entries[(behind & ~unavailable) | (entries["status"] == "failed")]
+
+    def update_operation(self, symbol: str, status: str,
+                         data: Optional[pd.DataFrame] = None,
+                         previous_last_date: Optional[str] = None,
+                         error: Optional[str] = None,
+                         record_status: bool = True) -> UpdateOne:
+        """
+        Builds the manifest update of a symbol after an ingestion run.
+
+        Args:
+            symbol (str): Stock symbol.
+            status (str): "ok", "empty" or "failed".
+            data (pd.DataFrame, optional): Bars written, with a "Date" column.
+            previous_last_date (str, optional): Last date before this run,
+                bars after it are counted as new rows.
+            error (str, optional): Error message of a failed run.
+            record_status (bool): Record the run as the symbol's last
+                ingestion. False for gap re-fetches, which only record the
+                written bars and leave status, error and checksum as they are.
+        """
+        update = {
+            "$set": {"updated_at": datetime.now()},
+            "$setOnInsert": {"last_date": None},
+        }
+        if record_status:
+            update["$set"].update({
+                "status": status, "error": error,
+                "last_checked": datetime.now().strftime("%Y-%m-%d")})
+        if data is not None and not data.empty:
+            dates = pd.to_datetime(data["Date"]).dt.strftime("%Y-%m-%d")
+            new_rows = int((dates > previous_last_date).sum()
+                           ) if previous_last_date else len(dates)
+            if record_status:
+                update["$set"]["checksum"] = frame_checksum(data)
+            # $max keeps the latest date when older ranges are backfilled
+            update["$max"] = {"last_date": dates.max()}
+            update["$inc"] = {"row_count": new_rows}
+            if status == "ok":
+                update["$inc"]["revision"] = 1
+            del update["$setOnInsert"]
+        return UpdateOne({"_id": symbol}, update, upsert=True)
+
+    def write(self, operations: List[UpdateOne]) -> None:
+        """
+        Applies manifest updates with one unordered bulk write.
+        """
+        if operations:
+            self.collection.with_options(
+                write_concern=get_write_concern(settings_api.write_concern)
+            ).bulk_write(operations, ordered=False)
+
+    def rebuild(self, storage, symbols: Optional[List[str]] = None) -> int:
+        """
+        Sets last date and row count from the bars stored in ``storage``, for
+        databases ingested before the manifest existed and after backfills.
+
+        Args:
+            storage: Bar storage of the stock database.
+            symbols (List[str], optional): Symbols to rebuild, all when None.
+
+        Returns:
+            int: Number of symbols recorded.
+        """
+        stats = storage.stats()
+        if symbols is not None:
+            stats = stats[stats["symbol"].isin(symbols)]
+        operations = [
+            UpdateOne({"_id": symbol}, {
+                "$set": {"last_date": last_date, "row_count": int(row_count),
+                         "updated_at": datetime.now()},
+                "$setOnInsert": {"status": "ok", "error": None},
+            }, upsert=True)
+            for symbol, last_date, row_count in zip(
+                stats["symbol"], stats["last_date"], stats["row_count"])
+        ]
+        self.write(operations)
+        return len(operations)
+
+
+class UnavailableRanges:
+    """
+    Missing ranges of a symbol the provider returned no bars for, one
+    document per (symbol, start, end), so trading days it can never supply
+    (suspensions, halts) are not re-fetched on every validation run.
+    """
+
+    def __init__(self, db, collection_name: str = settings_api.unavailable_ranges_collection) -> None:
+        self.collection = db[collection_name]
+        ensure_index(self.collection, [("last_checked", ASCENDING)])
+
+    @staticmethod
+    def _key(symbol: str, start_date: str, end_date: str) -> str:
+        return f"{symbol}|{start_date}|{end_date}"
+
+    def recent(self, recheck_days: int = settings_api.empty_recheck_days) -> Set[Tuple[str, str, str]]:
+        """
+        Returns the (symbol, start, end) ranges checked less than
+        ``recheck_days`` ago, they are not due for another try.
+        """
+        cursor = self.collection.find({
+            "last_checked": {"$gt": IngestionManifest._recheck_cutoff(recheck_days)}})
+        return {(entry["symbol"], entry["start_date"], entry["end_date"])
+                for entry in cursor}
+
+    def record(self, ranges: List[Tuple[str, str, str]]) -> None:
+        now = datetime.now()
+        operations = [
+            UpdateOne({"_id": self._key(symbol, start_date, end_date)}, {"$set": {
+                "symbol": symbol, "start_date": start_date, "end_date": end_date,
+                "last_checked": now.strftime("%Y-%m-%d"), "updated_at": now,
+            }}, upsert=True)
+            for symbol, start_date, end_date in ranges
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+
+class BackfillCheckpoints:
+    """
+    Date chunks of a backfill already ingested, one document per
+    (symbol, chunk start, chunk end), so an interrupted backfill resumes
+    with the chunks it has not completed.
+    """
+
+    def __init__(self, db, collection_name: str = settings_api.backfill_collection) -> None:
+        self.collection = db[collection_name]
+        ensure_index(self.collection, [("symbol", ASCENDING)])
+
+    @staticmethod
+    def _key(symbol: str, start_date: str, end_date: str) -> str:
+        return f"{symbol}|{start_date}|{end_date}"
+
+    def completed(self, symbols: List[str]) -> Set[Tuple[str, str, str]]:
+        """
+        Returns the (symbol, start, end) chunks completed for the symbols.
+        """
+        cursor = self.collection.find({"symbol": {"$in": symbols}})
+        return {(entry["symbol"], entry["start_date"], entry["end_date"])
+                for entry in cursor}
+
+    def mark_done(self, symbols: List[str], start_date: str, end_date: str) -> None:
+        operations = [
+            UpdateOne({"_id": self._key(symbol, start_date, end_date)}, {"$set": {
+                "symbol": symbol, "start_date": start_date, "end_date": end_date,
+                "updated_at": datetime.now(),
+            }}, upsert=True)
+            for symbol in symbols
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
@@ -0,0 +1,152 @@
+import os.path as path
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+import pandas as pd
+import yfinance as yf
+
+from ..config import settings_api
+from .exception import CustomException
+from .logger import logging
+
+# yf.download is not thread-safe: every call resets the module level
+# yfinance.shared._DFS and waits until it holds one frame per ticker of the
+# call, so concurrent calls mix or lose each other's results. Downloads run
+# one batch at a time, the tickers of a batch on yfinance's own threads.
+_DOWNLOAD_LOCK = threading.Lock()
+
+
+def split_wide_frame(wide: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Splits a wide (Price, Ticker) column frame into one frame per symbol.
+
+    Args:
+        wide (pd.DataFrame): Frame indexed by date with a two level column
+            index, price fields on level "Price" and symbols on level "Ticker".
+
+    Returns:
+        Dict[str, pd.DataFrame]: Symbol -> frame with a "Date" column and one
+            column per price field. Symbols without any data are left out.
+    """
+    if wide.empty:
+        return {}
+
+    # One stack moves every symbol into the row index, rows where a symbol
+    # had no bar at all are dropped in the same pass.
+    long = wide.stack(level="Ticker", future_stack=True).dropna(how="all")
+    long.columns.name = None
+
+    return {
+        symbol: frame.droplevel("Ticker").reset_index()
+        for symbol, frame in long.groupby(level="Ticker", sort=False)
+    }
+
+
+class PriceProvider(ABC):
+    """
+    Source of daily price bars for many symbols at once.
+    """
+
+    @abstractmethod
+    def fetch(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        """
+        Fetches daily bars for the given symbols.
+
+        Args:
+            symbols (List[str]): Stock symbols (tickers).
+            start_date (str): First date to fetch, inclusive ("%Y-%m-%d").
+            end_date (str): Last date to fetch, exclusive ("%Y-%m-%d").
+
+        Returns:
+            Dict[str, pd.DataFrame]: Symbol -> frame with a "Date" column and
+                Open, High, Low, Close, Volume. Symbols without data are left out.
+        """
+
+
+class YFinanceProvider(PriceProvider):
+    """
+    Fetches bars from Yahoo Finance, ``batch_size`` tickers per request
+    downloaded on ``threads`` threads.
+    """
+
+    def __init__(self, batch_size: int = settings_api.provider_batch_size,
+                 threads: int = settings_api.provider_threads) -> None:
+        self.batch_size = batch_size
+        self.threads = threads
+
+    def fetch(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        frames = {}
+        for i in range(0, len(symbols), self.batch_size):
+            batch = symbols[i:i + self.batch_size]
+            with _DOWNLOAD_LOCK:
+                wide = yf.download(batch, start=start_date, end=end_date,
+                                   auto_adjust=True, group_by="column",
+                                   progress=False, threads=self.threads,
+                                   multi_level_index=True)
+            frames.update(split_wide_frame(wide))
+        return frames
+
+
+class FileProvider(PriceProvider):
+    """
+    Replays recorded bars from ``<directory>/<symbol>.parquet`` or
+    ``<directory>/<symbol>.csv`` files, so ingestion can run without network.
+    """
+
+    def __init__(self, directory: str = settings_api.price_fixtures_dir) -> None:
+        if not directory:
+            raise ValueError("Fixtures directory is not configured.")
+        self.directory = directory
+
+    def _read(self, symbol: str) -> pd.DataFrame:
+        parquet_file = path.join(self.directory, f"{symbol}.parquet")
+        csv_file = path.join(self.directory, f"{symbol}.csv")
+        if path.exists(parquet_file):
+            return pd.read_parquet(parquet_file)
+        if path.exists(csv_file):
+            return pd.read_csv(csv_file, parse_dates=["Date"])
+        return pd.DataFrame()
+
+    def fetch(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        frames = {}
+        for symbol in symbols:
+            data = self._read(symbol)
+            if data.empty:
+                continue
+            dates = pd.to_datetime(data["Date"])
+            data = data[(dates >= start_date) & (dates < end_date)]
+            if not data.empty:
+                frames[symbol] = data.reset_index(drop=True)
+        return frames
+
+    def record(self, frames: Dict[str, pd.DataFrame], file_format: str = "csv") -> None:
+        """
+        Stores frames returned by another provider as fixtures of this one.
+
+        Args:
+            frames (Dict[str, pd.DataFrame]): Output of ``PriceProvider.fetch``.
+            file_format (str): "csv" or "parquet".
+        """
+        for symbol, data in frames.items():
+            file_path = path.join(self.directory, f"{symbol}.{file_format}")
+            if file_format == "parquet":
+                data.to_parquet(file_path, index=False)
+            else:
+                data.to_csv(file_path, index=False)
+
+
+def get_price_provider(name: str = settings_api.price_provider) -> PriceProvider:
+    """
+    Returns the price provider configured by name ("yfinance" or "file").
+    """
+    try:
+        if name == "yfinance":
+            return YFinanceProvider()
+        if name == "file":
+            return FileProvider()
+        raise ValueError(f"Unknown price provider: {name}")
+    except Exception as e:
+        logging.error(f"Error creating price provider {name}: {e}")
+        raise CustomException(e, sys)
@@ -0,0 +1,149 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..config import settings_api
+from .storage import get_write_concern
+
+MODEL_ID = "stock_clusters"
+
+
+@dataclass
+class RecommendationModel:
+    """
+    Fitted clustering of the symbol universe and the nearest peers of every
+    symbol inside its cluster, so a recommendation is a dictionary lookup.
+    """
+    features: List[str]
+    symbols: List[str]
+    labels: List[int]
+    centers: np.ndarray
+    # Imputation and scaling parameters of every feature
+    medians: np.ndarray
+    means: np.ndarray
+    stds: np.ndarray
+    # Symbol -> symbols of the same cluster, nearest first
+    peers: Dict[str, List[str]]
+    k: int
+    silhouette: float
+    start_date: str
+    data_version: Optional[str] = None
+    trained_at: datetime = field(default_factory=datetime.now)
+
+    def __post_init__(self) -> None:
+        self._clusters = dict(zip(self.symbols, self.labels))
+
+    def cluster(self, symbol: str) -> Optional[int]:
+        return self._clusters.get(symbol)
+
+    def recommend(self, symbol: str, count: int) -> Optional[List[str]]:
+        """
+        Returns the ``count`` nearest symbols of the cluster of ``symbol``,
+        None when the symbol was not clustered.
+        """
+        peers = self.peers.get(symbol)
+        return None if peers is None else peers[:count]
+
+    def to_document(self) -> dict:
+        return {
+            "_id": MODEL_ID,
+            "features": self.features,
+            "symbols": self.symbols,
+            "labels": [int(label) for label in self.labels],
+            "centers": self.centers.tolist(),
+            "medians": self.medians.tolist(),
+            "means": self.means.tolist(),
+            "stds": self.stds.tolist(),
+            # Symbols contain dots, stored as pairs rather than field names
+            "peers": [[symbol, peers] for symbol, peers in self.peers.items()],
+            "k": self.k,
+            "silhouette": self.silhouette,
+            "start_date": self.start_date,
+            "data_version": self.data_version,
+            "trained_at": self.trained_at,
+        }
+
+    @classmethod
+    def from_document(cls, document: dict) -> "RecommendationModel":
+        return cls(
+            features=document["features"],
+            symbols=document["symbols"],
+            labels=document["labels"],
+            centers=np.array(document["centers"], dtype=np.float64),
+            medians=np.array(document["medians"], dtype=np.float64),
+            means=np.array(document["means"], dtype=np.float64),
+            stds=np.array(document["stds"], dtype=np.float64),
+            peers={symbol: peers for symbol, peers in document["peers"]},
+            k=document["k"],
+            silhouette=document["silhouette"],
+            start_date=document["start_date"],
+            data_version=document.get("data_version"),
+            trained_at=document["trained_at"],
+        )
+
+
+class RecommendationModelStore:
+    """
+    Persists the fitted recommendation model as a single document.
+    """
+
+    def __init__(self, db,
+                 collection_name: str = settings_api.recommendation_collection) -> None:
+        self.collection = db[collection_name]
+
+    def save(self, model: RecommendationModel) -> None:
+        self.collection.with_options(
+            write_concern=get_write_concern(settings_api.write_concern)
+        ).replace_one({"_id": MODEL_ID}, model.to_document(), upsert=True)
+
+    def load(self) -> Optional[RecommendationModel]:
+        document = self.collection.find_one({"_id": MODEL_ID})
+        return RecommendationModel.from_document(document) if document else None
+
+    def trained_at(self) -> Optional[datetime]:
+        document = self.collection.find_one({"_id": MODEL_ID}, {"trained_at": 1})
+        return document["trained_at"] if document else None
+
+
+class ActiveModel:
+    """
+    The model serving recommendations in this process.
+
+    Loaded at start up and replaced after training. Workers that did not
+    train pick up a newer stored model at most every ``refresh_seconds``.
+    """
+
+    def __init__(self, refresh_seconds: float) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.model: Optional[RecommendationModel] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def set(self, model: Optional[RecommendationModel]) -> None:
+        self.model = model
+        self._checked = time.monotonic()
+
+    def needs_refresh(self) -> bool:
+        return time.monotonic() - self._checked >= self.refresh_seconds
+
+    def refresh(self, db) -> Optional[RecommendationModel]:
+        """
+        Loads the stored model when it is newer than the active one.
+        """
+        with self._lock:
+            if not self.needs_refresh():
+                return self.model
+            store = RecommendationModelStore(db)
+            trained_at = store.trained_at()
+            if trained_at is not None and (
+                    self.model is None or trained_at != self.model.trained_at):
+                self.model = store.load()
+            self._checked = time.monotonic()
+            return self.model
+
+
+active_model = ActiveModel(settings_api.recommendation_refresh_seconds)
@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Selects the points of a line to keep with Largest-Triangle-Three-Buckets
+    downsampling.
+
+    The first and last points are kept. The points in between are split into
+    ``max_points - 2`` buckets, and each bucket keeps the point forming the
+    largest triangle with the point kept in the previous bucket and the
+    average of the next bucket. Peaks and troughs survive, unlike plain
+    decimation.
+
+    Args:
+        x (np.ndarray): Ascending x coordinates, without NaN.
+        y (np.ndarray): y coordinates, without NaN.
+        max_points (int): Number of points to keep, at least 3.
+
+    Returns:
+        np.ndarray: Ascending indices of the kept points.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket i spans edges[i]:edges[i + 1], the first and last point excluded
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle areas, the constant factor does not change the argmax
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(areas.argmax())
+        kept[i + 1] = previous
+    return kept
+
+
+def _values(array: np.ndarray, decimals: int, delta: bool) -> List[Optional[float]]:
+    array = np.round(array, decimals)
+    if delta:
+        # Differences between present values, a missing value stays missing
+        valid = ~np.isnan(array)
+        array[valid] = np.round(np.diff(array[valid], prepend=0.0), decimals)
+    # JSON has no NaN, missing values are null
+    return [None if np.isnan(value) else float(value) for value in array]
+
+
+def encode_series(arrays: Dict[str, np.ndarray], max_points: Optional[int] = None,
+                  delta: bool = False, decimals: int = 4) -> dict:
+    """
+    Builds the columnar payload of ``/charts/series``.
+
+    Dates are sent as days since 1970-01-01. With ``delta`` every column
+    holds its first value followed by the differences between consecutive
+    values, a cumulative sum skipping the nulls restores it.
+
+    Args:
+        arrays (dict): "dates" (datetime64[D]) and one float array per field,
+            the first field drives downsampling.
+        max_points (int, optional): Downsample to this many points with LTTB.
+        delta (bool): Delta encode dates and values.
+        decimals (int): Values are rounded to this many decimals.
+
+    Returns:
+        dict: "dates", "values" (field -> column), "points", "total_points"
+            and "delta".
+    """
+    dates = np.asarray(arrays["dates"]).astype("datetime64[D]").astype(np.int64)
+    fields = [name for name in arrays if name != "dates"]
+    total = len(dates)
+
+    if max_points and fields:
+        # Points without a value of the driving field are left out
+        valid = np.flatnonzero(~np.isnan(arrays[fields[0]]))
+        rows = valid[lttb_indices(dates[valid], arrays[fields[0]][valid], max_points)]
+    else:
+        rows = np.arange(total)
+
+    kept_dates = dates[rows]
+    if delta and len(kept_dates):
+        kept_dates = np.diff(kept_dates, prepend=0)
+    return {
+        "dates": kept_dates.tolist(),
+        "values": {name: _values(np.asarray(arrays[name], dtype=np.float64)[rows], decimals, delta)
+                   for name in fields},
+        "points": len(rows),
+        "total_points": total,
+        "delta": delta,
+    }
+
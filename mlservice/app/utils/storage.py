@@ -0,0 +1,534 @@
+import sys
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid
+from pymongo.write_concern import WriteConcern
+
+from ..config import settings_api
+from .exception import CustomException
+from .logger import logging
+
+# Collections of the stock database whose name starts with "_" hold
+# bookkeeping data, never the bars of a symbol.
+RESERVED_PREFIX = "_"
+
+# Indexes already ensured by this process, components are created per
+# request and should not send createIndexes every time.
+_ensured_indexes: Set[tuple] = set()
+
+
+def ensure_index(collection, keys: List[Tuple[str, int]], **kwargs) -> None:
+    """
+    Creates an index once per process.
+    """
+    key = (collection.full_name, tuple(keys))
+    if key not in _ensured_indexes:
+        collection.create_index(keys, **kwargs)
+        _ensured_indexes.add(key)
+
+
+def frame_to_documents(data: pd.DataFrame) -> List[dict]:
+    """
+    Converts a DataFrame into MongoDB documents, one per row.
+
+    Builds the documents from whole column arrays, which is considerably
+    faster than DataFrame.to_dict(orient="records") for long frames.
+
+    Args:
+        data (pd.DataFrame): Frame to convert.
+
+    Returns:
+        List[dict]: Documents keyed by column name.
+    """
+    columns = [str(column) for column in data.columns]
+    # tolist converts numpy scalars into python types bson can encode
+    values = [data[column].tolist() for column in data.columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def bulk_upsert_bars(collection, data: pd.DataFrame,
+                     key_fields: Sequence[str] = ("_id",),
+                     batch_size: int = settings_api.write_batch_size,
+                     write_concern: str = settings_api.write_concern) -> int:
+    """
+    Upserts price bars keyed by ``key_fields`` with unordered bulk writes.
+
+    Bars already stored with the same values are matched but not modified,
+    so writing an overlapping date range again is effectively a no-op.
+
+    Args:
+        collection: MongoDB collection the bars are written to.
+        data (pd.DataFrame): Bars, including the key columns.
+        key_fields (Sequence[str]): Columns identifying a bar.
+        batch_size (int): Number of bars sent per bulk write.
+        write_concern (str): "w" option of the write concern, a number or a
+            tag such as "majority".
+
+    Returns:
+        int: Number of bars inserted or changed.
+    """
+    keys = frame_to_documents(data[list(key_fields)])
+    documents = frame_to_documents(data.drop(columns=list(key_fields)))
+    operations = [
+        UpdateOne(key, {"$set": document}, upsert=True)
+        for key, document in zip(keys, documents)
+    ]
+
+    collection = collection.with_options(
+        write_concern=get_write_concern(write_concern))
+
+    written = 0
+    for i in range(0, len(operations), batch_size):
+        result = collection.bulk_write(
+            operations[i:i + batch_size], ordered=False)
+        written += result.upserted_count + result.modified_count
+    return written
+
+
+def get_write_concern(write_concern: str) -> WriteConcern:
+    """
+    Builds a write concern from its "w" option given as a string.
+    """
+    w = int(write_concern) if write_concern.isdigit() else write_concern
+    return WriteConcern(w=w)
+
+
+@dataclass
+class PriceColumns:
+    """
+    Bars of one symbol as contiguous arrays in ascending date order.
+
+    dates: datetime64[D] array of the bar dates.
+    values: field name -> float64 array aligned with ``dates``.
+    """
+    symbol: str
+    dates: np.ndarray
+    values: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.values[name]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the bars as a frame with an "_id" ("%Y-%m-%d") column.
+        """
+        data = pd.DataFrame(self.values)
+        data.insert(0, "_id", np.datetime_as_string(self.dates, unit="D"))
+        return data
+
+
+STATS_COLUMNS = ["count", "first", "last", "max", "min", "std"]
+
+
+def _stats_group(field: str, key) -> dict:
+    """
+    $group stage of the range statistics, documents sorted by date.
+    """
+    value = f"${field}"
+    return {"$group": {
+        "_id": key, "count": {"$sum": 1},
+        "first": {"$first": value}, "last": {"$last": value},
+        "max": {"$max": value}, "min": {"$min": value},
+        "std": {"$stdDevSamp": value},
+    }}
+
+
+def _stats_frame(documents: List[dict]) -> pd.DataFrame:
+    data = pd.DataFrame(documents, columns=["_id"] + STATS_COLUMNS)
+    data = data.rename(columns={"_id": "symbol"}).set_index("symbol")
+    return data.astype(np.float64)
+
+
+def _to_columns(symbol: str, documents: List[dict], date_field: str,
+                fields: Sequence[str]) -> PriceColumns:
+    """
+    Assembles projected documents into per field arrays.
+    """
+    dates = np.array([document[date_field] for document in documents],
+                     dtype="datetime64[D]")
+    values = {
+        name: np.fromiter((document.get(name, np.nan) for document in documents),
+                          dtype=np.float64, count=len(documents))
+        for name in fields
+    }
+    return PriceColumns(symbol, dates, values)
+
+
+class BarStorage(ABC):
+    """
+    Layout of daily price bars in the stock database.
+
+    Bars are read back as a frame with a "symbol" column, an "_id" column
+    holding the "%Y-%m-%d" date and one column per price field.
+    """
+
+    def __init__(self, db) -> None:
+        self.db = db
+
+    @abstractmethod
+    def symbols(self) -> List[str]:
+        """
+        Returns every symbol having bars in the storage.
+        """
+
+    @abstractmethod
+    def last_date(self, symbol: str) -> Optional[str]:
+        """
+        Returns the most recent stored date of a symbol, None if it has no bars.
+        """
+
+    @abstractmethod
+    def stats(self) -> pd.DataFrame:
+        """
+        Returns "symbol", "last_date" and "row_count" of every stored symbol.
+        """
+
+    @abstractmethod
+    def write(self, symbol: str, data: pd.DataFrame) -> int:
+        """
+        Stores bars of a symbol.
+
+        Args:
+            symbol (str): Stock symbol.
+            data (pd.DataFrame): Bars with a "Date" column.
+
+        Returns:
+            int: Number of bars inserted or changed.
+        """
+
+    @abstractmethod
+    def read(self, symbols: Optional[List[str]] = None, start_date: Optional[str] = None,
+             end_date: Optional[str] = None, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Reads bars of many symbols.
+
+        Args:
+            symbols (List[str], optional): Symbols to read, all when None.
+            start_date (str, optional): First date, inclusive ("%Y-%m-%d").
+            end_date (str, optional): Last date, exclusive ("%Y-%m-%d").
+            fields (List[str], optional): Price fields to read, all when None.
+
+        Returns:
+            pd.DataFrame: Bars sorted by symbol and date.
+        """
+
+    @abstractmethod
+    def read_columns(self, symbol: str, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     fields: Sequence[str] = ("Close",)) -> PriceColumns:
+        """
+        Reads only ``fields`` of a symbol's bars, in ascending date order.
+
+        Args:
+            symbol (str): Stock symbol.
+            start_date (str, optional): First date, inclusive ("%Y-%m-%d").
+            end_date (str, optional): Last date, exclusive ("%Y-%m-%d").
+            fields (Sequence[str]): Price fields to read.
+
+        Returns:
+            PriceColumns: Dates and one float64 array per field.
+        """
+
+    @abstractmethod
+    def aggregate_stats(self, symbols: List[str], start_date: Optional[str] = None,
+                        end_date: Optional[str] = None, field: str = "Close") -> pd.DataFrame:
+        """
+        Computes range statistics of a price field inside MongoDB, so only
+        one row per symbol is transferred instead of every bar.
+
+        Args:
+            symbols (List[str]): Symbols to aggregate.
+            start_date (str, optional): First date, inclusive ("%Y-%m-%d").
+            end_date (str, optional): Last date, exclusive ("%Y-%m-%d").
+            field (str): Price field, "Close" by default.
+
+        Returns:
+            pd.DataFrame: "count", "first", "last", "max", "min" and "std"
+                (sample) of the non-missing values, indexed by symbol.
+        """
+
+    @abstractmethod
+    def read_last(self, days: int) -> pd.DataFrame:
+        """
+        Reads the bars of the last ``days`` trading days.
+        """
+
+
+class PerSymbolStorage(BarStorage):
+    """
+    One collection per symbol, "_id" holding the "%Y-%m-%d" date of the bar.
+    """
+
+    def symbols(self) -> List[str]:
+        return sorted(
+            name for name in self.db.list_collection_names()
+            if not name.startswith((RESERVED_PREFIX, "system."))
+        )
+
+    def last_date(self, symbol: str) -> Optional[str]:
+        most_recent_document = self.db[symbol].find_one(
+            {}, {"_id": 1}, sort=[("_id", DESCENDING)])
+        return most_recent_document["_id"] if most_recent_document else None
+
+    def stats(self) -> pd.DataFrame:
+        return pd.DataFrame([
+            {
+                "symbol": symbol,
+                "last_date": self.last_date(symbol),
+                "row_count": self.db[symbol].estimated_document_count(),
+            }
+            for symbol in self.symbols()
+        ], columns=["symbol", "last_date", "row_count"])
+
+    def write(self, symbol: str, data: pd.DataFrame) -> int:
+        data = data.copy()
+        data["_id"] = pd.to_datetime(data["Date"]).dt.strftime("%Y-%m-%d")
+        data.drop(columns=["Date"], inplace=True)
+        return bulk_upsert_bars(self.db[symbol], data)
+
+    def _read_symbol(self, symbol: str, query: dict, projection: Optional[dict],
+                     limit: int = 0) -> pd.DataFrame:
+        cursor = self.db[symbol].find(query, projection).sort(
+            "_id", DESCENDING).limit(limit)
+        data = pd.DataFrame(list(cursor))
+        if not data.empty:
+            data.insert(0, "symbol", symbol)
+            data.insert(1, "_id", data.pop("_id"))
+        return data
+
+    def _concat(self, frames: List[pd.DataFrame]) -> pd.DataFrame:
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).sort_values(
+            ["symbol", "_id"], ignore_index=True)
+
+    def read(self, symbols: Optional[List[str]] = None, start_date: Optional[str] = None,
+             end_date: Optional[str] = None, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        date_query = {}
+        if start_date:
+            date_query["$gte"] = start_date
+        if end_date:
+            date_query["$lt"] = end_date
+        query = {"_id": date_query} if date_query else {}
+        projection = {field: 1 for field in fields} if fields else None
+
+        return self._concat([
+            self._read_symbol(symbol, query, projection)
+            for symbol in (symbols or self.symbols())
+        ])
+
+    def read_columns(self, symbol: str, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     fields: Sequence[str] = ("Close",)) -> PriceColumns:
+        date_query = {}
+        if start_date:
+            date_query["$gte"] = start_date
+        if end_date:
+            date_query["$lt"] = end_date
+        query = {"_id": date_query} if date_query else {}
+
+        cursor = self.db[symbol].find(
+            query, {name: 1 for name in fields}).sort("_id", ASCENDING)
+        return _to_columns(symbol, list(cursor), "_id", fields)
+
+    def aggregate_stats(self, symbols: List[str], start_date: Optional[str] = None,
+                        end_date: Optional[str] = None, field: str = "Close") -> pd.DataFrame:
+        # NaN sorts below every number, $gt -inf skips missing values
+        match = {field: {"$gt": float("-inf")}}
+        if start_date or end_date:
+            match["_id"] = {}
+            if start_date:
+                match["_id"]["$gte"] = start_date
+            if end_date:
+                match["_id"]["$lt"] = end_date
+
+        documents = []
+        for symbol in symbols:
+            documents.extend(self.db[symbol].aggregate([
+                {"$match": match},
+                {"$sort": {"_id": ASCENDING}},
+                _stats_group(field, symbol),
+            ]))
+        return _stats_frame(documents)
+
+    def read_last(self, days: int) -> pd.DataFrame:
+        return self._concat([
+            self._read_symbol(symbol, {}, None, limit=days)
+            for symbol in self.symbols()
+        ])
+
+
+class UnifiedStorage(BarStorage):
+    """
+    A single collection keyed by (symbol, date), "date" holding a native
+    datetime. Optionally created as a MongoDB time-series collection.
+    """
+
+    def __init__(self, db, collection_name: str = settings_api.bars_collection,
+                 timeseries: bool = False) -> None:
+        super().__init__(db)
+        self.timeseries = timeseries
+        self.collection = db[collection_name]
+        self._ensure_collection(collection_name)
+
+    def _ensure_collection(self, collection_name: str) -> None:
+        if (self.collection.full_name, ()) in _ensured_indexes:
+            return
+        if self.timeseries:
+            try:
+                self.db.create_collection(collection_name, timeseries={
+                    "timeField": "date",
+                    "metaField": "symbol",
+                    "granularity": "hours",
+                })
+            except CollectionInvalid:
+                # Already exists
+                pass
+            ensure_index(self.collection,
+                         [("symbol", ASCENDING), ("date", ASCENDING)])
+        else:
+            ensure_index(self.collection,
+                         [("symbol", ASCENDING), ("date", ASCENDING)], unique=True)
+        _ensured_indexes.add((self.collection.full_name, ()))
+
+    def symbols(self) -> List[str]:
+        return sorted(self.collection.distinct("symbol"))
+
+    def last_date(self, symbol: str) -> Optional[str]:
+        most_recent_document = self.collection.find_one(
+            {"symbol": symbol}, {"date": 1}, sort=[("date", DESCENDING)])
+        if not most_recent_document:
+            return None
+        return most_recent_document["date"].strftime("%Y-%m-%d")
+
+    def stats(self) -> pd.DataFrame:
+        data = pd.DataFrame(list(self.collection.aggregate([
+            {"$group": {"_id": "$symbol", "last_date": {"$max": "$date"},
+                        "row_count": {"$sum": 1}}},
+        ])), columns=["_id", "last_date", "row_count"])
+        data = data.rename(columns={"_id": "symbol"})
+        data["last_date"] = pd.to_datetime(
+            data["last_date"]).dt.strftime("%Y-%m-%d")
+        return data
+
+    def write(self, symbol: str, data: pd.DataFrame) -> int:
+        data = data.rename(columns={"Date": "date"})
+        data["date"] = pd.to_datetime(data["date"])
+        data.insert(0, "symbol", symbol)
+
+        if not self.timeseries:
+            return bulk_upsert_bars(self.collection, data,
+                                    key_fields=("symbol", "date"))
+
+        # Time-series collections do not support upserts, only the dates not
+        # stored yet are inserted. Bars of stored dates are left unchanged.
+        stored = self.collection.find({"symbol": symbol, "date": {
+            "$gte": data["date"].min(), "$lte": data["date"].max()}}, {"_id": 0, "date": 1})
+        data = data[~data["date"].isin([document["date"] for document in stored])]
+        if data.empty:
+            return 0
+        collection = self.collection.with_options(
+            write_concern=get_write_concern(settings_api.write_concern))
+        result = collection.insert_many(frame_to_documents(data), ordered=False)
+        return len(result.inserted_ids)
+
+    def _to_frame(self, cursor) -> pd.DataFrame:
+        data = pd.DataFrame(list(cursor))
+        if data.empty:
+            return data
+        data.insert(1, "_id", data.pop("date").dt.strftime("%Y-%m-%d"))
+        return data.sort_values(["symbol", "_id"], ignore_index=True)
+
+    def read(self, symbols: Optional[List[str]] = None, start_date: Optional[str] = None,
+             end_date: Optional[str] = None, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        query = {}
+        if symbols:
+            query["symbol"] = {"$in": symbols}
+        date_query = {}
+        if start_date:
+            date_query["$gte"] = datetime.strptime(start_date, "%Y-%m-%d")
+        if end_date:
+            date_query["$lt"] = datetime.strptime(end_date, "%Y-%m-%d")
+        if date_query:
+            query["date"] = date_query
+
+        projection = {"_id": 0}
+        if fields:
+            projection.update({"symbol": 1, "date": 1})
+            projection.update({field: 1 for field in fields})
+
+        return self._to_frame(self.collection.find(query, projection))
+
+    def read_columns(self, symbol: str, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     fields: Sequence[str] = ("Close",)) -> PriceColumns:
+        query = {"symbol": symbol}
+        date_query = {}
+        if start_date:
+            date_query["$gte"] = datetime.strptime(start_date, "%Y-%m-%d")
+        if end_date:
+            date_query["$lt"] = datetime.strptime(end_date, "%Y-%m-%d")
+        if date_query:
+            query["date"] = date_query
+
+        projection = {"_id": 0, "date": 1}
+        projection.update({name: 1 for name in fields})
+        cursor = self.collection.find(query, projection).sort("date", ASCENDING)
+        return _to_columns(symbol, list(cursor), "date", fields)
+
+    def aggregate_stats(self, symbols: List[str], start_date: Optional[str] = None,
+                        end_date: Optional[str] = None, field: str = "Close") -> pd.DataFrame:
+        # NaN sorts below every number, $gt -inf skips missing values
+        match = {"symbol": {"$in": list(symbols)}, field: {"$gt": float("-inf")}}
+        if start_date or end_date:
+            match["date"] = {}
+            if start_date:
+                match["date"]["$gte"] = datetime.strptime(start_date, "%Y-%m-%d")
+            if end_date:
+                match["date"]["$lt"] = datetime.strptime(end_date, "%Y-%m-%d")
+
+        return _stats_frame(list(self.collection.aggregate([
+            {"$match": match},
+            {"$sort": {"symbol": ASCENDING, "date": ASCENDING}},
+            _stats_group(field, "$symbol"),
+        ])))
+
+    def read_last(self, days: int) -> pd.DataFrame:
+        # The first date of the last ``days`` trading days of the universe
+        last_dates = list(self.collection.aggregate([
+            {"$group": {"_id": "$date"}},
+            {"$sort": {"_id": DESCENDING}},
+            {"$limit": days},
+        ]))
+        if not last_dates:
+            return pd.DataFrame()
+        query = {"date": {"$gte": last_dates[-1]["_id"]}}
+        return self._to_frame(self.collection.find(query, {"_id": 0}))
+
+
+def get_storage(db, layout: str = settings_api.storage_layout) -> BarStorage:
+    """
+    Returns the bar storage of the stock database for the configured layout,
+    "per_symbol", "unified" or "timeseries".
+    """
+    try:
+        if layout == "per_symbol":
+            return PerSymbolStorage(db)
+        if layout == "unified":
+            return UnifiedStorage(db)
+        if layout == "timeseries":
+            return UnifiedStorage(db, timeseries=True)
+        raise ValueError(f"Unknown storage layout: {layout}")
+    except Exception as e:
+        logging.error(f"Error creating storage {layout}: {e}")
+        raise CustomException(e, sys)
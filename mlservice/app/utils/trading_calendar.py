@@ -0,0 +1,117 @@
+import os.path as path
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Optional, Set
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from ..config import settings_api
+from .exception import CustomException
+from .logger import logging
+
+BASE_DATA = path.abspath(path.join(__file__, "../../../artifacts/base_data"))
+
+
+@dataclass
+class TradingCalendarConfig:
+    """
+    Configuration of an exchange calendar.
+
+    Holidays and half days are read from a CSV with "Date", "Type"
+    ("holiday" or "half_day") columns; the exchange timezone comes from the
+    Market reference data. The holiday file lists the published Borsa Istanbul
+    closures and has to be extended when the next year's list is announced.
+    """
+    market_name: str = settings_api.market_name
+    market_file: str = path.join(BASE_DATA, "market_data.csv")
+    holidays_file: str = path.join(BASE_DATA, "bist_holidays.csv")
+    open_time: time = time(10, 0)
+    close_time: time = time(18, 10)
+    half_day_close_time: time = time(12, 40)
+    timezone: str = field(init=False)
+    holidays: Set[date] = field(init=False)
+    half_days: Set[date] = field(init=False)
+
+    def __post_init__(self):
+        try:
+            markets = pd.read_csv(self.market_file)
+            market = markets[markets["Name"] == self.market_name]
+            if market.empty:
+                raise ValueError(f"Market {self.market_name} not found.")
+            self.timezone = market["Timezone"].iloc[0]
+
+            closures = pd.read_csv(self.holidays_file, parse_dates=["Date"])
+            days = closures["Date"].dt.date
+            self.holidays = set(days[closures["Type"] == "holiday"])
+            self.half_days = set(days[closures["Type"] == "half_day"])
+        except Exception as e:
+            logging.error(f"Error reading trading calendar: {e}")
+            raise CustomException(f"Error reading trading calendar: {e}", sys)
+
+
+class TradingCalendar:
+    """
+    Trading sessions of an exchange: weekends, holidays and half days in the
+    exchange's own timezone.
+    """
+
+    def __init__(self, config: Optional[TradingCalendarConfig] = None) -> None:
+        self.config = config or TradingCalendarConfig()
+        self.tz = ZoneInfo(self.config.timezone)
+
+    def now(self) -> datetime:
+        """
+        Returns the current time in the exchange timezone.
+        """
+        return datetime.now(self.tz)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.config.holidays
+
+    def session_close(self, day: date) -> datetime:
+        """
+        Returns the closing time of the session on ``day``, exchange timezone.
+        """
+        close_time = (self.config.half_day_close_time
+                      if day in self.config.half_days else self.config.close_time)
+        return datetime.combine(day, close_time, tzinfo=self.tz)
+
+    def trading_days(self, start_date, end_date) -> pd.DatetimeIndex:
+        """
+        Returns every trading day between the two dates, both inclusive.
+        """
+        return pd.bdate_range(start_date, end_date, freq="C",
+                              holidays=sorted(self.config.holidays))
+
+    def last_close(self, now: Optional[datetime] = None, delay: timedelta = timedelta(0)) -> datetime:
+        """
+        Returns the close of the most recent session that ended at least
+        ``delay`` before ``now``.
+        """
+        now = (now or self.now()).astimezone(self.tz)
+        day = now.date()
+        while not (self.is_trading_day(day) and self.session_close(day) + delay <= now):
+            day -= timedelta(days=1)
+        return self.session_close(day)
+
+    def next_close(self, now: Optional[datetime] = None, delay: timedelta = timedelta(0)) -> datetime:
+        """
+        Returns the close of the next session ending more than ``delay``
+        after ``now``.
+        """
+        now = (now or self.now()).astimezone(self.tz)
+        day = now.date()
+        while not (self.is_trading_day(day) and self.session_close(day) + delay > now):
+            day += timedelta(days=1)
+        return self.session_close(day)
+
+
+@lru_cache(maxsize=None)
+def get_trading_calendar() -> TradingCalendar:
+    """
+    Returns the calendar of the configured market, read once per process.
+    """
+    return TradingCalendar()
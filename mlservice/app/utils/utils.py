@@ -1,79 +1,142 @@
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
-import datetime as dt
 from .logger import logging
 from .exception import CustomException
+from .price_providers import YFinanceProvider
+from .manifest import IngestionManifest
+from .storage import PriceColumns, get_storage
+from .trading_calendar import get_trading_calendar
+from ..config import settings_api
 import sys
+from typing import Dict, List, Optional, Sequence, Tuple
 from pymongo import MongoClient
 import numpy as np
 
 
-def get_data_from_yfinance(symbol: str, start_date: str, end_date: str):
+def get_data_from_yfinance(symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
     # Includes start, excludes end date
-    start_date = datetime.strptime(start_date, '%Y-%m-%d')
-    end_date = datetime.strptime(end_date, '%Y-%m-%d')
     try:
         # Fetch historical stock data for the specified symbol and date range from Yahoo Finance
-        stock_data = yf.download(symbol, start=start_date, end=end_date)
-        
-        stock_data.columns = stock_data.columns.droplevel(1)
-        stock_data = stock_data.iloc[1:].copy()
-        stock_data.reset_index(inplace=True)
-        stock_data.columns.name =None
-
-        return stock_data
+        frames = YFinanceProvider().fetch([symbol], start_date, end_date)
+        return frames.get(symbol, pd.DataFrame())
     except Exception as e:
         print(
             f"Error fetching data for {symbol} from {start_date} to {end_date}: {e}")
 
 
-def get_historical_data(mongo_uri: str, symbol: str, start_date: str) -> pd.DataFrame:
+def get_historical_data(client: MongoClient, symbol: str, start_date: str) -> pd.DataFrame:
     """
     Retrieves historical data for a specific stock symbol from MongoDB.
 
     Args:
-        mongo_uri (str): MongoDB connection URI.
+        client (MongoClient): Shared MongoDB client.
         symbol (str): Stock symbol (ticker) to retrieve data for.
         start_date (str): Data to be retrieved from date
 
     Returns:
-        pd.DataFrame: DataFrame containing the historical data for the specified symbol.
+        pd.DataFrame: DataFrame containing the historical data for the specified
+            symbol, in ascending date order.
     """
-    with MongoClient(mongo_uri) as client:
-        try:
-            # Connect to MongoDB and select the collection
-            db = client.stockdata
-            collection = db[symbol]
-            query = {"_id": {"$gte": start_date}}
+    try:
+        # Select the storage of the stock database
+        storage = get_storage(client.stockdata)
+
+        # Retrieve the documents of the symbol, oldest first
+        df = storage.read([symbol], start_date)
+        if not df.empty:
+            df = df.drop(columns=["symbol"])
+
+        return df
+
+    except Exception as e:
+        logging.error(
+            f"Error retrieving historical data for {symbol}: {e}")
+        raise CustomException(
+            f"Error retrieving historical data for {symbol}: {e}", sys)
+
+
+def load_price_columns(client: MongoClient, symbol: str, start_date: str,
+                       fields: Sequence[str] = ("Close",)) -> PriceColumns:
+    """
+    Loads only the requested price fields of a symbol as contiguous arrays.
+
+    Only ``fields`` are sent by MongoDB and the bars come back in ascending
+    date order, first element the oldest price and last element the latest.
+
+    Args:
+        client (MongoClient): Shared MongoDB client.
+        symbol (str): Stock symbol (ticker) to retrieve data for.
+        start_date (str): Data to be retrieved from date
+        fields (Sequence[str]): Price fields to load, "Close" by default.
+
+    Returns:
+        PriceColumns: Dates and one float64 array per field.
+    """
+    try:
+        return get_storage(client.stockdata).read_columns(
+            symbol, start_date, fields=fields)
+    except Exception as e:
+        logging.error(
+            f"Error retrieving historical data for {symbol}: {e}")
+        raise CustomException(
+            f"Error retrieving historical data for {symbol}: {e}", sys)
 
-            # Retrieve the last N documents for the given symbol
-            cursor = collection.find(query).sort("_id", -1)
 
-            # Convert cursor to list of documents
-            data_list = list(cursor)
+def load_price_panel(client: MongoClient, symbols: List[str], start_date: str,
+                     end_date: Optional[str] = None,
+                     field: str = "Close") -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """
+    Loads one price field of many symbols with a single query, aligned on
+    the union of their trading dates.
 
-            # Convert the selected documents into a DataFrame
-            df = pd.DataFrame(data_list)
+    Args:
+        client (MongoClient): Shared MongoDB client.
+        symbols (List[str]): Stock symbols to load.
+        start_date (str): First date, inclusive ("%Y-%m-%d").
+        end_date (str, optional): Last date, exclusive ("%Y-%m-%d").
+        field (str): Price field, "Close" by default.
+
+    Returns:
+        tuple: ({"dates": datetime64[D] array, field: dates x symbols array,
+            NaN where a symbol has no bar}, symbol of every column). Symbols
+            without bars are left out.
+    """
+    try:
+        bars = get_storage(client.stockdata).read(symbols, start_date, end_date, fields=[field])
+        if bars.empty:
+            return {"dates": np.array([], dtype="datetime64[D]"),
+                    field: np.empty((0, 0))}, []
+        matrix = bars.pivot(index="_id", columns="symbol", values=field).sort_index()
+        # Columns in the requested order
+        matrix = matrix[[symbol for symbol in symbols if symbol in matrix.columns]]
+        return ({"dates": pd.to_datetime(matrix.index).to_numpy().astype("datetime64[D]"),
+                 field: np.ascontiguousarray(matrix.to_numpy(dtype=np.float64))},
+                [str(column) for column in matrix.columns])
+    except Exception as e:
+        logging.error(f"Error retrieving price panel of {len(symbols)} symbols: {e}")
+        raise CustomException(
+            f"Error retrieving price panel of {len(symbols)} symbols: {e}", sys)
 
-            return df
 
-        except Exception as e:
-            logging.error(
-                f"Error retrieving historical data for {symbol}: {e}")
-            raise CustomException(
-                f"Error retrieving historical data for {symbol}: {e}", sys)
-        finally:
-            client.close()
+def expected_last_date() -> str:
+    """
+    Returns the date of the most recent session whose bars should already be
+    ingested, ``ingestion_delay_minutes`` after its close on the market calendar.
+    """
+    calendar = get_trading_calendar()
+    delay = timedelta(minutes=settings_api.ingestion_delay_minutes)
+    return calendar.last_close(delay=delay).strftime("%Y-%m-%d")
 
 
-def is_up_to_date(mongo_uri: str) -> bool:
+def is_up_to_date(client: MongoClient) -> bool:
     """returns true if db is up to date
     returns false if db is not up to date
 
+    Reads the ingestion manifest of every symbol at once, the database is up
+    to date when no symbol is behind the expected date or failed its last run.
 
     Args:
-        mongo_uri (str): mongo connetion string
+        client (MongoClient): shared mongo client
 
     Raises:
         CustomException: _description_
@@ -84,31 +147,21 @@ def is_up_to_date(mongo_uri: str) -> bool:
 
     try:
         # If database not exist or empty return false
-
-        with MongoClient(mongo_uri) as client:
-            if "stockdata" not in client.list_database_names():
-                return False
-            static_symbol = "ASELS.IS"
-            db = client.stockdata
-            collection = db[static_symbol]
-            cursor = collection.find().sort("_id", -1).limit(1)
-            data = list(cursor)
-
-            entry_date = data[0]["_id"]
-            hour_now = datetime.now().time()
-            today = datetime.today()
-            yesterday = today - timedelta(days=1)
-
-            # saat 18.15 ile 23.59 arasındaysa son entry bugünün tarihi olacak
-            if hour_now > dt.time(18, 15) and hour_now < dt.time(0, 0):
-                return entry_date == today.strftime("%Y-%m-%d")
-            # saat 00.00 ile 18.14 arasındaysa son entry dünün tarihi olacak
-            else:
-                return entry_date == yesterday.strftime("%Y-%m-%d")
+        if "stockdata" not in client.list_database_names():
+            return False
+        manifest = IngestionManifest(client.stockdata)
+        if manifest.latest_date() is None:
+            return False
+
+        expected_date = expected_last_date()
+        stale = manifest.stale_symbols(expected_date)
+        if not stale.empty:
+            logging.warning(
+                f"{len(stale)} symbols are behind {expected_date}: "
+                f"{list(stale.index)}")
+        return stale.empty
     except Exception as e:
         raise CustomException(e, sys)
-    finally:
-        client.close()
 
 
 def sanitize_for_json(data):
@@ -125,30 +178,13 @@ def sanitize_for_json(data):
         return data
 
 
-def get_data_as_data_frame(mongo_uri, days) -> pd.DataFrame:
-
-    with MongoClient(mongo_uri) as client:
-        try:
-            database = client.stockdata
-            all_data = []
-            for collection_name in database.list_collection_names():
-                collection = database[collection_name]
-                # Fetch last 365 entries
-                last_entries = list(
-                    collection.find()
-                    .sort("_id", -1)  # Sort by `_id` in descending order
-                    .limit(days)
-                )
-                # Add collection name to each document
-                for entry in last_entries:
-                    entry['collection_name'] = collection_name
-                    all_data.append(entry)
-
-            # Convert to Pandas DataFrame
-            df = pd.DataFrame(all_data)
-            return df
-        except Exception:
-            raise CustomException(
-                f"Error retrieving historical data", sys)
-        finally:
-            client.close()
+def get_data_as_data_frame(client: MongoClient, days) -> pd.DataFrame:
+
+    try:
+        # Last `days` entries of every symbol in a single frame
+        df = get_storage(client.stockdata).read_last(days)
+        df = df.rename(columns={"symbol": "collection_name"})
+        return df
+    except Exception:
+        raise CustomException(
+            f"Error retrieving historical data", sys)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Settings without defaults, the tests never connect to them
+os.environ.setdefault("mongo_url", "mongodb://localhost:27017")
+os.environ.setdefault("app_host", "127.0.0.1")
+os.environ.setdefault("app_port", "8000")
+
+# Run from any directory, the app package is imported as "app"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app.utils.clustering import impute_and_scale, kmeans, select_k, silhouette_score
+
+
+def make_blobs(sizes=(30, 40, 25), seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0.0, 0.0, 0.0], [10.0, 10.0, 0.0], [0.0, 10.0, 10.0]])
+    points = np.vstack([center + rng.normal(0, 0.5, (size, 3))
+                        for center, size in zip(centers, sizes)])
+    labels = np.repeat(np.arange(len(sizes)), sizes)
+    return points, labels
+
+
+def reference_silhouette(points: np.ndarray, labels: np.ndarray) -> float:
+    scores = []
+    for i, point in enumerate(points):
+        distances = np.linalg.norm(points - point, axis=1)
+        own = labels == labels[i]
+        if own.sum() == 1:
+            scores.append(0.0)
+            continue
+        intra = distances[own].sum() / (own.sum() - 1)
+        nearest = min(distances[labels == other].mean()
+                      for other in np.unique(labels) if other != labels[i])
+        scores.append((nearest - intra) / max(nearest, intra))
+    return float(np.mean(scores))
+
+
+def same_partition(labels: np.ndarray, expected: np.ndarray) -> bool:
+    pairs = set(zip(labels.tolist(), expected.tolist()))
+    return len(pairs) == len(set(labels.tolist())) == len(set(expected.tolist()))
+
+
+def test_kmeans_recovers_separable_blobs():
+    points, expected = make_blobs()
+    centers, labels, inertia = kmeans(points, 3, seed=1)
+    assert same_partition(labels, expected)
+    assert centers.shape == (3, 3)
+    assert inertia == pytest.approx(sum(
+        ((points[labels == k] - centers[k]) ** 2).sum() for k in range(3)))
+
+
+def test_select_k_picks_the_number_of_blobs():
+    points, expected = make_blobs()
+    k, _, labels, score = select_k(points, range(2, 7), seed=1)
+    assert k == 3 and same_partition(labels, expected)
+    assert score > 0.8
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_silhouette_matches_the_definition(seed):
+    points, _ = make_blobs(seed=seed)
+    labels = np.random.default_rng(seed).integers(0, 4, len(points))
+    # A singleton cluster scores 0
+    labels[0] = 4
+    assert silhouette_score(points, labels) == pytest.approx(
+        reference_silhouette(points, labels), abs=1e-9)
+
+
+def test_impute_and_scale():
+    features = np.array([[1.0, np.nan, 5.0], [2.0, 4.0, 5.0],
+                         [3.0, 6.0, 5.0], [np.inf, 8.0, 5.0]])
+    scaled, medians, means, stds = impute_and_scale(features, clip=1.0)
+
+    np.testing.assert_allclose(medians, [2.0, 6.0, 5.0])
+    filled = np.array([[1.0, 6.0, 5.0], [2.0, 4.0, 5.0], [3.0, 6.0, 5.0], [2.0, 8.0, 5.0]])
+    np.testing.assert_allclose(means, filled.mean(axis=0))
+    # A constant column is centered, not divided by zero
+    assert stds[2] == 1.0 and np.all(scaled[:, 2] == 0)
+    np.testing.assert_allclose(scaled, np.clip((filled - means) / stds, -1.0, 1.0))
+    # Outliers are clipped
+    assert np.abs(scaled).max() == 1.0
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.correlation import CorrelationMatrix, RollingCorrelation, write_matrix
+
+WINDOW = 40
+MIN_PERIODS = 15
+
+
+def make_closes(days: int = 120, symbols: int = 6, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0, 0.01, (days, 1))
+    returns = common * np.linspace(-1, 1, symbols) + rng.normal(0, 0.01, (days, symbols))
+    closes = 100 * np.cumprod(1 + returns, axis=0)
+    closes[rng.random(closes.shape) < 0.05] = np.nan
+    # Listed late, and without any bar in the window
+    closes[:100, 4] = np.nan
+    closes[-60:, 5] = np.nan
+    return pd.DataFrame(closes, index=pd.bdate_range("2024-01-02", periods=days).strftime("%Y-%m-%d"),
+                        columns=[f"S{i}.IS" for i in range(symbols)])
+
+
+def expected_correlation(closes: pd.DataFrame) -> np.ndarray:
+    returns = closes.pct_change(fill_method=None).iloc[-WINDOW:]
+    return returns.corr(min_periods=MIN_PERIODS).to_numpy()
+
+
+def test_from_closes_matches_pandas():
+    closes = make_closes()
+    state = RollingCorrelation.from_closes(
+        list(closes.columns), list(closes.index), closes.to_numpy(), WINDOW)
+    np.testing.assert_allclose(state.correlation(MIN_PERIODS), expected_correlation(closes),
+                               atol=1e-9, equal_nan=True)
+
+
+def test_pushed_dates_match_pandas():
+    closes = make_closes()
+    split = 70
+    state = RollingCorrelation.from_closes(
+        list(closes.columns), list(closes.index[:split]), closes.to_numpy()[:split], WINDOW)
+    for date, row in zip(closes.index[split:], closes.to_numpy()[split:]):
+        state.push(date, row)
+
+    # The window's returns and the date of the first return's base close
+    assert state.dates == list(closes.index[-(WINDOW + 1):]) and len(state.returns) == WINDOW
+    assert state.updates == len(closes) - split
+    np.testing.assert_allclose(state.correlation(MIN_PERIODS), expected_correlation(closes),
+                               atol=1e-8, equal_nan=True)
+
+
+def test_state_round_trips(tmp_path):
+    closes = make_closes()
+    state = RollingCorrelation.from_closes(
+        list(closes.columns), list(closes.index), closes.to_numpy(), WINDOW)
+    state.data_versions = {symbol: "2024-06-14.3" for symbol in closes.columns}
+    state.data_versions["S5.IS"] = None
+    state.save(str(tmp_path))
+
+    loaded = RollingCorrelation.load(str(tmp_path))
+    assert loaded.symbols == state.symbols and loaded.dates == state.dates
+    assert loaded.data_versions == state.data_versions
+    np.testing.assert_array_equal(loaded.correlation(MIN_PERIODS), state.correlation(MIN_PERIODS))
+
+
+def test_matrix_queries(tmp_path):
+    closes = make_closes()
+    state = RollingCorrelation.from_closes(
+        list(closes.columns), list(closes.index), closes.to_numpy(), WINDOW)
+    matrix = state.correlation(MIN_PERIODS)
+    write_matrix(str(tmp_path), state.symbols, matrix, state.last_date)
+    reader = CorrelationMatrix(str(tmp_path))
+    assert reader.available and reader.last_date == closes.index[-1]
+
+    top = reader.top_k("S0.IS", 3)
+    row = matrix[0].astype(np.float32)
+    candidates = sorted(((float(row[j]), symbol) for j, symbol in enumerate(state.symbols)
+                         if j != 0 and not np.isnan(row[j])), reverse=True)
+    assert [symbol for symbol, _ in top] == [symbol for _, symbol in candidates[:3]]
+    lowest = reader.top_k("S0.IS", 1, lowest=True)
+    assert lowest[0][0] == candidates[-1][1]
+
+    # S5.IS has no returns in the window, it is unknown rather than uncorrelated
+    with pytest.raises(KeyError):
+        reader.top_k("S5.IS", 3)
+    known, submatrix = reader.submatrix(["S1.IS", "S5.IS", "MISSING.IS", "S0.IS"])
+    assert known == ["S1.IS", "S0.IS"]
+    np.testing.assert_allclose(submatrix, matrix[np.ix_([1, 0], [1, 0])], atol=1e-6)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.components.stage04indicator_materialization import rolling_indicators
+from app.utils.indicator_engine import IndicatorEngine, IndicatorState
+
+COLUMNS = ["close", "rsi_14", "rsi_wilder_14", "sma_20", "bollinger_up", "bollinger_low",
+           "volatility_20", "high_252", "low_252", "cumulative_return"]
+
+
+def make_bars(symbols=("A.IS", "B.IS"), days=400, seed=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i, symbol in enumerate(symbols):
+        dates = pd.bdate_range("2023-01-02", periods=days - 50 * i).strftime("%Y-%m-%d")
+        closes = 100 + rng.normal(0, 1, len(dates)).cumsum()
+        # Single and consecutive missing closes exercise ffill(limit=1)
+        closes[[5, 60, 61, 200]] = np.nan
+        frames.append(pd.DataFrame({"symbol": symbol, "_id": dates, "Close": closes}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def assert_same_rows(actual: pd.DataFrame, expected: pd.DataFrame) -> None:
+    assert actual["symbol"].tolist() == expected["symbol"].tolist()
+    assert actual["date"].tolist() == expected["date"].tolist()
+    np.testing.assert_allclose(actual[COLUMNS].to_numpy(dtype=np.float64),
+                               expected[COLUMNS].to_numpy(dtype=np.float64),
+                               rtol=1e-8, atol=1e-8, equal_nan=True)
+
+
+@pytest.fixture
+def engine() -> IndicatorEngine:
+    mongomock = pytest.importorskip("mongomock")
+    return IndicatorEngine(mongomock.MongoClient().stockdata)
+
+
+def test_rebuild_matches_rolling_indicators(engine):
+    bars = make_bars()
+    rows, states = engine.rebuild(bars)
+    assert [state.symbol for state in states] == ["A.IS", "B.IS"]
+    assert_same_rows(rows, rolling_indicators(bars).reset_index(drop=True))
+
+
+def test_persisted_state_continues_the_series():
+    bars = make_bars(symbols=("A.IS",))
+    split = 300
+    state = IndicatorState("A.IS")
+    for date, close in zip(bars["_id"][:split], bars["Close"][:split]):
+        state.update(date, close)
+
+    restored = IndicatorState.from_document(state.to_document())
+    rows = pd.DataFrame([restored.update(date, close) for date, close
+                         in zip(bars["_id"][split:], bars["Close"][split:])])
+    expected = rolling_indicators(bars).iloc[split:].reset_index(drop=True)
+    assert_same_rows(rows, expected)
+
+
+def test_advance_appends_rows_and_rejects_older_bars(engine):
+    bars = make_bars(symbols=("A.IS",))
+    rows, states = engine.rebuild(bars.iloc[:-10])
+    engine.store.write_series(rows)
+    engine.save(states)
+
+    new_bars = bars.iloc[-10:].rename(columns={"_id": "Date"})
+    assert engine.advance({"A.IS": new_bars}) == []
+    stored = engine.store.read_series("A.IS")
+    assert_same_rows(stored, rolling_indicators(bars).reset_index(drop=True))
+
+    # Bars older than the state change its history, the symbol is rebuilt
+    assert engine.advance({"A.IS": new_bars.iloc[:1]}) == ["A.IS"]
+    assert engine.load(["A.IS"]) == {}
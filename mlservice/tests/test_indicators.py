@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.components.stage02get_data import compute_matrix_metrics, compute_metrics
+from app.utils.indicators import DEFAULT_INDICATORS, INDICATORS, INTERMEDIATES, IndicatorPlan
+
+
+def baseline_metrics(closes: pd.Series) -> dict:
+    """
+    The default metrics as calculated before the indicator registry.
+    """
+    returns = closes.pct_change().dropna()
+    delta = closes.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
+    sma_20 = closes.rolling(window=20).mean().iloc[-1]
+    std_20 = closes.rolling(window=20).std().iloc[-1]
+    return {
+        "max_value": closes.max(),
+        "min_value": closes.min(),
+        "standard_deviation": closes.std(),
+        "price_interval": closes.max() - closes.min(),
+        "percentage_change": (closes.iloc[-1] - closes.iloc[0]) / closes.iloc[0] * 100,
+        "volatility": returns.std() * np.sqrt(len(closes)),
+        "rsi": 100 - (100 / (1 + gain / loss)).iloc[-1],
+        "bollinger_up": sma_20 + 2 * std_20,
+        "bollinger_low": sma_20 - 2 * std_20,
+        "sharpe_ratio": returns.mean() / returns.std() * np.sqrt(252),
+    }
+
+
+def random_closes(length: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100 + rng.normal(0, 1, length).cumsum()
+
+
+@pytest.mark.parametrize("length", [30, 250])
+def test_default_metrics_match_the_baseline(length):
+    closes = random_closes(length)
+    metrics = compute_metrics("A.IS", "2024-01-02", {"Close": closes})
+    assert metrics["symbol"] == "A.IS" and metrics["from_date"] == "2024-01-02"
+    for name, expected in baseline_metrics(pd.Series(closes)).items():
+        assert metrics[name] == round(expected, 3), name
+
+
+def test_plan_orders_shared_intermediates_once():
+    plan = IndicatorPlan(["macd_histogram", "macd", "ema_12"])
+    assert plan.steps == ["close", "ema_12", "ema_26", "macd_line", "macd_signal_line"]
+    for i, step in enumerate(plan.steps):
+        assert set(INTERMEDIATES[step].needs) <= set(plan.steps[:i])
+    assert plan.fields == ["Close"]
+    assert IndicatorPlan(["atr_14"]).fields == ["Close", "High", "Low"]
+
+
+def test_plan_rejects_unknown_indicators():
+    with pytest.raises(ValueError):
+        IndicatorPlan(["rsi", "not_an_indicator"])
+
+
+def test_matrix_columns_match_single_symbols():
+    # Right aligned histories of different lengths, NaN padded at the top
+    lengths = [250, 120, 40]
+    closes = np.full((max(lengths), len(lengths)), np.nan)
+    for i, length in enumerate(lengths):
+        closes[-length:, i] = random_closes(length, seed=i)
+    highs, lows = closes + 1, closes - 1
+    symbols = ["A.IS", "B.IS", "C.IS"]
+    indicators = sorted(INDICATORS)
+
+    batch = compute_matrix_metrics({"Close": closes, "High": highs, "Low": lows},
+                                   symbols, "2024-01-02", indicators)
+    for i, symbol in enumerate(symbols):
+        rows = ~np.isnan(closes[:, i])
+        single = compute_metrics(symbol, "2024-01-02", {
+            "Close": closes[rows, i], "High": highs[rows, i], "Low": lows[rows, i]}, indicators)
+        assert batch[symbol] == single
+
+
+def test_aggregates_match_the_bars():
+    plan = IndicatorPlan([name for name, spec in INDICATORS.items() if spec.aggregate])
+    assert plan.pushdown and not IndicatorPlan(DEFAULT_INDICATORS).pushdown
+    closes = np.column_stack([random_closes(60, seed=1), random_closes(60, seed=2)])
+    symbols = ["A.IS", "B.IS"]
+    frame = pd.DataFrame(closes, columns=symbols)
+    stats = pd.DataFrame({
+        "count": frame.count(), "first": frame.iloc[0], "last": frame.iloc[-1],
+        "max": frame.max(), "min": frame.min(), "std": frame.std()})
+
+    aggregated = plan.compute_aggregates(stats, symbols + ["MISSING.IS"])
+    computed = plan.compute({"Close": closes})
+    for name in plan.indicators:
+        np.testing.assert_allclose(aggregated[name][:2], computed[name], rtol=1e-9)
+        assert np.isnan(aggregated[name][2])
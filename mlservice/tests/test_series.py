@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.utils.series import encode_series, lttb_indices
+
+
+def make_arrays(length: int = 500, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2022-01-03") + np.arange(length)
+    close = 100 + rng.normal(0, 1, length).cumsum()
+    return {"dates": dates, "Close": close, "Volume": rng.integers(0, 1000, length).astype(float)}
+
+
+@pytest.mark.parametrize("max_points", [3, 10, 97])
+def test_lttb_keeps_endpoints_and_one_point_per_bucket(max_points):
+    y = make_arrays()["Close"]
+    x = np.arange(len(y), dtype=np.float64)
+    kept = lttb_indices(x, y, max_points)
+
+    assert len(kept) == max_points
+    assert kept[0] == 0 and kept[-1] == len(y) - 1
+    assert np.all(np.diff(kept) > 0)
+    edges = np.linspace(1, len(y) - 1, max_points - 1).astype(np.int64)
+    for i, index in enumerate(kept[1:-1]):
+        assert edges[i] <= index < edges[i + 1]
+
+
+def test_lttb_keeps_peaks():
+    y = np.zeros(1000)
+    y[437], y[811] = 50.0, -50.0
+    kept = lttb_indices(np.arange(1000, dtype=np.float64), y, 20)
+    assert 437 in kept and 811 in kept
+
+
+def test_lttb_returns_every_point_when_not_downsampling():
+    x = np.arange(10, dtype=np.float64)
+    np.testing.assert_array_equal(lttb_indices(x, x, 10), np.arange(10))
+    np.testing.assert_array_equal(lttb_indices(x, x, 2), np.arange(10))
+
+
+def test_delta_encoding_round_trips():
+    arrays = make_arrays()
+    arrays["Close"][[3, 4, 250]] = np.nan
+    plain = encode_series(arrays, decimals=4)
+    encoded = encode_series(arrays, delta=True, decimals=4)
+
+    assert encoded["delta"] and encoded["points"] == encoded["total_points"] == 500
+    assert np.cumsum(encoded["dates"]).tolist() == plain["dates"]
+    for name, column in encoded["values"].items():
+        present = [value is not None for value in column]
+        assert present == [value is not None for value in plain["values"][name]]
+        restored = np.cumsum([value for value in column if value is not None])
+        expected = [value for value in plain["values"][name] if value is not None]
+        np.testing.assert_allclose(restored, expected, atol=1e-6)
+
+
+def test_downsampling_skips_missing_driving_values():
+    arrays = make_arrays()
+    arrays["Close"][:10] = np.nan
+    payload = encode_series(arrays, max_points=50)
+
+    assert payload["points"] == 50 and payload["total_points"] == 500
+    assert None not in payload["values"]["Close"]
+    first_day = (arrays["dates"][10] - np.datetime64("1970-01-01")).astype(int)
+    assert payload["dates"][0] == first_day
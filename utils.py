@@ -6,20 +6,30 @@ import yfinance as yf
 from pymongo import MongoClient
 
 
-def get_data_from_yfinance(symbol: str, start_date: str, end_date: str):
+def get_data_from_yfinance(symbols: list, start_date: str, end_date: str) -> dict:
+    """downloads many tickers with one request, returns symbol -> frame with a Date column"""
     # Includes start, excludes end date
     start_date = datetime.strptime(start_date, "%Y-%m-%d")
     end_date = datetime.strptime(end_date, "%Y-%m-%d")
     try:
-        # Fetch historical stock data for the specified symbol and date range from Yahoo Finance
-        stock_data = yf.download(symbol, start=start_date, end=end_date)
-
-        # Reset the index and format the '_id' field as a string
-        stock_data.reset_index(inplace=True)
-
-        return stock_data
+        # Fetch historical stock data for every symbol, tickers downloaded in parallel
+        stock_data = yf.download(symbols, start=start_date, end=end_date,
+                                 group_by="column", multi_level_index=True,
+                                 progress=False, threads=True)
+        if stock_data.empty:
+            return {}
+
+        # Move the tickers into the row index in one step, dropping dates a ticker has no bar on
+        stock_data = stock_data.stack(level="Ticker", future_stack=True).dropna(how="all")
+        stock_data.columns.name = None
+
+        return {
+            symbol: frame.droplevel("Ticker").reset_index()
+            for symbol, frame in stock_data.groupby(level="Ticker", sort=False)
+        }
     except Exception as e:
-        print(f"Error fetching data for {symbol} from {start_date} to {end_date}: {e}")
+        print(f"Error fetching data for {symbols} from {start_date} to {end_date}: {e}")
+        return {}
 
 
 def create_update_collections(
@@ -29,6 +39,10 @@ def create_update_collections(
     client = MongoClient(connection_string)
     db = client[database]
 
+    # Symbols needing the same date range are downloaded together
+    tomorrow = datetime.now() + timedelta(days=1)
+    end_date = tomorrow.strftime("%Y-%m-%d")
+    groups = {}
     for symbol in symbols_list:
 
         collection = db[symbol]
@@ -38,31 +52,29 @@ def create_update_collections(
             most_recent_date = datetime.strptime(most_recent_id, "%Y-%m-%d")
             one_day_later = most_recent_date + timedelta(days=1)
             start_date = one_day_later.strftime("%Y-%m-%d")
-
-            now = datetime.now()
-            tomorrow = now + timedelta(days=1)
-            end_date = tomorrow.strftime("%Y-%m-%d")
         else:
             start_date = "2015-01-01"
-            tomorrow = datetime.now() + timedelta(days=1)
-            end_date = tomorrow.strftime("%Y-%m-%d")
+        groups.setdefault(start_date, []).append(symbol)
 
-        data = get_data_from_yfinance(symbol, start_date, end_date)
+    for start_date, symbols in groups.items():
+        frames = get_data_from_yfinance(symbols, start_date, end_date)
 
-        if data.empty:
-            print(f"No data retrieved for {symbol}")
-            continue
+        for symbol in symbols:
+            data = frames.get(symbol)
+            if data is None or data.empty:
+                print(f"No data retrieved for {symbol}")
+                continue
 
-        data["_id"] = pd.to_datetime(data["Date"]).dt.strftime("%Y-%m-%d")
+            data["_id"] = pd.to_datetime(data["Date"]).dt.strftime("%Y-%m-%d")
 
-        # Drop the original 'Date' column
-        data = data.drop(columns=["Date"])
+            # Drop the original 'Date' column
+            data = data.drop(columns=["Date"])
 
-        # Convert the DataFrame to a list of dictionaries
-        data_list = data.to_dict(orient="records")
+            # Convert the DataFrame to a list of dictionaries
+            data_list = data.to_dict(orient="records")
 
-        # Insert the data into the MongoDB collection
-        collection.insert_many(data_list)
+            # Insert the data into the MongoDB collection
+            db[symbol].insert_many(data_list)
 
     client.close()
 